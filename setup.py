@@ -15,6 +15,10 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/cameronmcphail/systemrobustness",
     packages=setuptools.find_packages(),
+    extras_require={
+        # Compiled single-pass kernels for the classic metrics
+        "numba": ["numba"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
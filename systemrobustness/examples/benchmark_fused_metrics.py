@@ -0,0 +1,55 @@
+"""Compares the fused kernels with the NumPy transformations
+
+Times each classic robustness metric in `common_metrics` with the NumPy
+backend (chained T1, T2 and T3 transformations) and, if Numba is
+installed, the numba backend (single-pass fused kernels, see
+`metrics.fused`). The first call with the numba backend compiles the
+kernels, so it is made before timing.
+"""
+
+import functools
+import timeit
+import numpy as np
+
+from systemrobustness.robustness.metrics import common_metrics, fused
+
+METRICS = [
+    'maximin',
+    'maximax',
+    'hurwicz',
+    'laplace',
+    'minimax_regret',
+    'percentile_regret',
+    'mean_variance',
+    'starrs_domain']
+
+
+def time_metric(metric, f, backend, repeats=5):
+    """Gets the best time of a robustness metric with a backend"""
+    R_metric = functools.partial(metric, f, maximise=False)
+    with fused.use_backend(backend):
+        R_metric()
+        return min(timeit.repeat(R_metric, number=1, repeat=repeats))
+
+
+def benchmark(shapes=((100, 10000), (2000, 1000), (50, 200000))):
+    """Prints the time of each metric with each available backend"""
+    backends = ['numpy'] if fused.numba is None else ['numpy', 'numba']
+    if fused.numba is None:
+        print('Numba is not installed, so only the NumPy backend is timed')
+    rng = np.random.default_rng(0)
+    for shape in shapes:
+        f = rng.normal(size=shape)
+        print('\nf of shape {} (ms)'.format(shape))
+        print('{:<20}'.format('metric') + ''.join(
+            '{:>10}'.format(backend) for backend in backends))
+        for name in METRICS:
+            times = [
+                time_metric(getattr(common_metrics, name), f, backend)
+                for backend in backends]
+            print('{:<20}'.format(name) + ''.join(
+                '{:>10.2f}'.format(1e3 * t) for t in times))
+
+
+if __name__ == '__main__':
+    benchmark()
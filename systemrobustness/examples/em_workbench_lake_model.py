@@ -228,12 +228,13 @@ def optimize_lake_problem(use_original_R_metrics=False, demo=True):
     # We will just look at the vulnerability ('max_P') for this example
     f = np.reshape(results[1]['max_P'], newshape=(-1, n_scenarios))
     # Split the results into the different sets of scenarios
-    split_f = np.split(f, n_sets, axis=1)
-    # Calculate robustness for each set of scenarios
-    # Note that each split_f[set_idx] is a 2D array, with each row being
-    # a decision alternative, and each column a scenario
+    split_f = np.stack(np.split(f, n_sets, axis=1))
+    # Calculate robustness for each set of scenarios in one call
+    # Note that split_f is a 3D array of shape (n_sets, m, n), with each
+    # row of a set being a decision alternative, and each column a
+    # scenario, so R has shape (n_sets, m)
     R_metric = get_custom_R_metrics()[0]
-    R = [R_metric(split_f[set_idx]) for set_idx in range(n_sets)]
+    R = R_metric(split_f)
     R = np.transpose(R)
 
     # Calculate similarity in robustness from different scenario sets
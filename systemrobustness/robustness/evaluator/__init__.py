@@ -1,2 +1,6 @@
 """Functions to help evaluate Robustness"""
-from .calc import f_to_R
+from .calc import f_to_R, build_f_cube, prepare_f_df, PreparedF
+from .streaming import f_to_R_streaming
+from .incremental import IncrementalR
+from .cache import RCache
+from .cube_store import save_cube, open_cube, create_cube
@@ -0,0 +1,223 @@
+"""Caches robustness values on disk.
+
+Robustness values are stored as '.npy' files, named by a hash of the
+performance values and a canonical description of the robustness
+metric (the function, and any arguments such as `maximise`), and the
+floating point type set by `dtype_policy` if any. Repeated
+calculations with the same performance values and robustness metric
+(e.g. in notebooks, or after a restart) load the stored values instead.
+
+The least recently used files are removed when the total size of the
+cache is larger than a given size.
+"""
+
+import functools
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+from ..metrics import custom_R_metric
+from ..metrics.transforms.precision import get_dtype_policy
+
+
+class RCache:
+    """A content-addressed on-disk cache of robustness values.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to store the cached robustness values in.
+        Created if it does not exist.
+    max_bytes : int, optional
+        The maximum total size of the cached files. The least recently
+        used files are removed when this is exceeded.
+        (The default is 1e9, i.e. 1 GB).
+
+    Examples
+    --------
+    >>> cache = RCache('./R_cache')
+    >>> R = cache.evaluate(common_metrics.maximin, f, maximise=False)
+    >>> cached_maximin = cache.cached(common_metrics.maximin)
+    >>> R = cached_maximin(f, maximise=False)
+    >>> R = f_to_R(f_df, R_dict, cache=cache)
+    """
+    def __init__(self, directory, max_bytes=int(1e9)):
+        """Initialize the cache
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def evaluate(self, func, f, **kwargs):
+        """Calculates robustness, or loads it if previously calculated.
+
+        Parameters
+        ----------
+        func : func
+            The robustness metric function
+        f : numpy.ndarray, shape=(m, n)
+            Performance values, f, for m decision alternatives
+            and n scenarios.
+        **kwargs
+            Keyword arguments for `func`
+
+        Returns
+        -------
+        numpy.ndarray, shape=(m, ) OR float
+            The robustness values returned by `func`
+        """
+        key = self.key(func, f, kwargs)
+        R = self.load(key)
+        if R is None:
+            R = func(f, **kwargs)
+            self.save(key, R)
+        return R
+
+    def cached(self, func):
+        """Wraps a robustness metric function so that it uses the cache.
+
+        Parameters
+        ----------
+        func : func
+            The robustness metric function
+
+        Returns
+        -------
+        func
+            A function with the same arguments as `func`
+        """
+        @functools.wraps(func)
+        def cached_func(f, **kwargs):
+            return self.evaluate(func, f, **kwargs)
+        return cached_func
+
+    def key(self, func, f, kwargs):
+        """Gets the cache key for a robustness calculation.
+
+        Parameters
+        ----------
+        func : func
+            The robustness metric function
+        f : numpy.ndarray, shape=(m, n)
+            Performance values
+        kwargs : dict
+            Keyword arguments for `func`
+
+        Returns
+        -------
+        str
+            A hash of the performance values, `func`, `kwargs` and the
+            active `dtype_policy`
+        """
+        h = hashlib.blake2b(digest_size=20)
+        h.update(describe(func).encode())
+        h.update(describe(kwargs).encode())
+        h.update(describe(np.asarray(f)).encode())
+        policy = get_dtype_policy()
+        if policy is not None:
+            # The type that the robustness values are calculated in
+            h.update('dtype_policy({})'.format(np.dtype(policy)).encode())
+        return h.hexdigest()
+
+    def load(self, key):
+        """Loads cached robustness values, or None if not in the cache"""
+        path = self._path(key)
+        try:
+            R = np.load(path, allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        # Mark as recently used
+        os.utime(path)
+        return R[()] if R.ndim == 0 else R
+
+    def save(self, key, R):
+        """Saves robustness values to the cache"""
+        # Write to a temporary file first, so that other processes
+        # never load a partially written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp_file:
+            np.save(tmp_file, np.asarray(R), allow_pickle=False)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used files until within max_bytes"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.npy'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Removes all cached robustness values"""
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.npy'):
+                    os.remove(entry.path)
+
+    def _path(self, key):
+        """Gets the file path for a cache key"""
+        return os.path.join(self.directory, key + '.npy')
+
+
+def describe(obj):
+    """Canonical description of a robustness metric or its arguments.
+
+    Functions are described by their module and name, and arrays by
+    their dtype, shape and a hash of their values, so that equal
+    metrics and arguments always have the same description.
+
+    Parameters
+    ----------
+    obj : object
+        A function, `custom_R_metric`, `functools.partial`, array,
+        dict, list, tuple or scalar
+
+    Returns
+    -------
+    str
+        The description
+
+    Raises
+    ------
+    TypeError
+        If `obj` cannot be described reliably, e.g. a lambda function.
+    """
+    if isinstance(obj, functools.partial):
+        return 'partial({}, {}, {})'.format(
+            describe(obj.func), describe(obj.args), describe(obj.keywords))
+    if isinstance(obj, custom_R_metric):
+        return 'custom_R_metric({}, {}, {})'.format(
+            describe(obj.t1_func), describe(obj.t2_func),
+            describe(obj.t3_func))
+    if isinstance(obj, (np.ndarray, np.generic)):
+        array = np.ascontiguousarray(obj)
+        h = hashlib.blake2b(array.view(np.uint8).reshape(-1), digest_size=20)
+        return 'array({}, {}, {})'.format(
+            array.dtype.str, array.shape, h.hexdigest())
+    if isinstance(obj, dict):
+        return '{' + ', '.join(
+            '{}: {}'.format(describe(key), describe(obj[key]))
+            for key in sorted(obj, key=repr)) + '}'
+    if isinstance(obj, (list, tuple)):
+        return '{}({})'.format(
+            type(obj).__name__, ', '.join(describe(item) for item in obj))
+    if obj is None or isinstance(obj, (bool, int, float, complex, str)):
+        return '{}({!r})'.format(type(obj).__name__, obj)
+    if callable(obj) and hasattr(obj, '__qualname__'):
+        if '<' in obj.__qualname__:
+            raise TypeError(
+                'Cannot cache {!r}, use a named function'.format(obj))
+        return '{}.{}'.format(obj.__module__, obj.__qualname__)
+    raise TypeError('Cannot describe {!r} for caching'.format(obj))
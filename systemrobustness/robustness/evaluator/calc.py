@@ -1,9 +1,26 @@
 """Helper functions for calculating robustness from performance values"""
 
+import functools
+import os
 import numpy as np
+import pandas as pd
 
+from . import parallel
+from ..metrics import common_metrics, custom_R_metric, t1, t2, t3
+from ..metrics.classic_metrics import CLASSIC_METRICS
+from ..metrics.transforms.precision import get_dtype_policy, working_dtype
 
-def f_to_R(f_df, R_dict):
+
+def f_to_R(
+        f_df,
+        R_dict,
+        validate=True,
+        executor=None,
+        n_workers=None,
+        chunk_size=None,
+        nan_policy='propagate',
+        return_coverage=False,
+        cache=None):
     """Calculates robustness from performance values.
 
     Uses a set of performance values, `f`, determined from simulations
@@ -13,13 +30,15 @@ def f_to_R(f_df, R_dict):
 
     Parameters
     ----------
-    f_df : pandas.DataFrame
+    f_df : pandas.DataFrame or PreparedF
         A dataframe of performance values, `f`, with indexes for the
         scenario, `s`, and decision alternative, `l`.
         Must include any other variables to be used during calculation
         of robustness (referred to as 'varX_name' below).
         Columns: `['s_idx', 'l_idx', '<f1_name>', '<f2_name>', ...,
                    '<var1_name>', '<var2_name>', ...]`
+        OR the same values already prepared with `prepare_f_df`, in
+        which case no DataFrame handling is repeated.
     R_dict : dict of dict
         A mapping of robustness metric (`R`) names to information
         about those robustness metrics including
@@ -29,7 +48,10 @@ def f_to_R(f_df, R_dict):
             whether the aim of that performance metric is to be maximised
         'threshold': None or string
             the name of the column in `f_df` containing thresholds
-            OR None if not using a threshold or threshold is given in kwargs
+            OR None if not using a threshold or threshold is given in kwargs.
+            Thresholds that are constant, or depend only on the scenario
+            or only on the decision alternative, are passed in compact
+            broadcastable form (see `compact_threshold`)
         'func': func
             the robustness metric function
         'kwargs': dict
@@ -40,6 +62,46 @@ def f_to_R(f_df, R_dict):
         Note that all performance metric names must be listed here.
         E.g. `{'<R1_name>': {'f': <f1_name>, 'maximise': <bool>, 'threshold': None, 'func': <func>, 'kwargs': {'kwarg1': <arg>}},
                '<R2_name>': {'f': <f1_name>, 'maximise': <bool>, 'threshold': 'critical', 'func': <func>, 'kwargs': {}}, ...}`
+    validate : bool, optional
+        Whether to check that every (s_idx, l_idx) pair appears exactly
+        once in `f_df`. Ignored if `f_df` is already prepared.
+        (The default is True. Use False only if the pipeline producing
+        `f_df` already guarantees a complete grid without duplicates).
+    executor : None, str or concurrent.futures.Executor, optional
+        How to run the robustness calculations. 'thread' or 'process'
+        runs each metric for each block of decision alternatives on a
+        pool of threads or processes (with the performance values in
+        shared memory), as does an existing Executor. Metrics that may
+        compare decision alternatives are calculated for all of them
+        at once (see `splits_alternatives`).
+        (The default is None, which runs the calculations serially).
+        Robustness metric functions must be picklable for processes.
+    n_workers : int, optional
+        The number of workers if `executor` is 'thread' or 'process'.
+        (The default is None, which uses the number of CPUs).
+    chunk_size : int, optional
+        The number of decision alternatives in each block when using
+        an `executor`.
+        (The default is None, which splits the decision alternatives
+        into one block per worker).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle missing (s_idx, l_idx) pairs and NaN performance
+        values (e.g. from failed simulations).
+        (The default is 'propagate', which requires a complete grid of
+        (s_idx, l_idx) pairs and leaves NaN values to each robustness
+        metric. 'omit' allows missing pairs, treating them as NaN, and
+        passes `nan_policy='omit'` to each robustness metric so that
+        robustness is calculated from the scenarios that completed).
+    return_coverage : bool, optional
+        Whether to also return the scenario coverage of each decision
+        alternative.
+        (The default is False).
+    cache : RCache, optional
+        A cache of robustness values. Robustness values are loaded from
+        the cache if they have been calculated before for the same
+        performance values and robustness metric, otherwise they are
+        calculated and saved to the cache.
+        (The default is None, which does not use a cache).
 
     Returns
     -------
@@ -48,47 +110,603 @@ def f_to_R(f_df, R_dict):
         decision alternative, `l`, and a column for the performance
         metric name, ``f_name``.
         Columns: `['l_idx', 'f_name', '<R1_name>', '<R2_name>', ...]`
+    coverage : dict, optional
+        Only returned if `return_coverage`. The fraction of scenarios
+        with a performance value (that is not NaN) for each decision
+        alternative, numpy.ndarray, shape=(l, ), for each robustness
+        metric in `R_dict` (see `PreparedF.coverage`).
     """
-    # Extract the names of the f metrics
-    f_metrics = [R_dict[R_name]['f'] for R_name in R_dict]
-    df_cols = [col for col in f_df.columns]
-    # Check that the same metrics are in f_maximise
-    for f_metric in f_metrics:
-        assert f_metric in df_cols
+    assert nan_policy in ['propagate', 'omit']
+    if isinstance(f_df, PreparedF):
+        prepared = f_df
+    else:
+        prepared = prepare_f_df(
+            f_df,
+            columns=get_R_dict_columns(R_dict),
+            validate=validate,
+            allow_missing=(nan_policy == 'omit'),
+            dtype=performance_dtype(f_df, R_dict))
 
-    # Sort dataframe to ensure consistency
-    f_df = sort_f_df(f_df)
-
-    # Get the scenario and decision alternative idxs, and
-    # check that the s_idx and l_idx indexes are valid.
-    s_idxs, l_idxs = get_f_df_details(f_df)
+    if executor is not None:
+        R = _f_to_R_parallel(
+            prepared, R_dict, executor, n_workers, chunk_size, nan_policy,
+            cache)
+        return (R, _coverage(prepared, R_dict)) if return_coverage else R
 
     # Loop through performance metrics
     R = {}
     for R_metric in R_dict:
-        f_metric = R_dict[R_metric]['f']
-        # Check that required data exists
-        kwargs = R_dict[R_metric]['kwargs']
-        if R_dict[R_metric]['threshold'] is not None:
-            assert R_dict[R_metric]['threshold'] in df_cols
-            if 't1_kwargs' not in kwargs:
-                kwargs['t1_kwargs'] = {}
-            kwargs['t1_kwargs']['threshold'] = np.reshape(
-                f_df.iloc[:, f_df.columns.get_loc(R_dict[R_metric]['threshold'])].values,
-                newshape=(l_idxs.size, s_idxs.size))
-        f = np.reshape(
-            f_df.iloc[:, f_df.columns.get_loc(f_metric)].values,
-            newshape=(l_idxs.size, s_idxs.size))
-        kwargs['maximise'] = R_dict[R_metric]['maximise']
-        R[R_metric] = R_dict[R_metric]['func'](f, **kwargs)
+        func = R_dict[R_metric]['func']
+        f = prepared[R_dict[R_metric]['f']]
+        kwargs = metric_kwargs(prepared, R_dict[R_metric], nan_policy)
+        if cache is not None:
+            R[R_metric] = cache.evaluate(func, f, **kwargs)
+        else:
+            R[R_metric] = func(f, **kwargs)
+    if return_coverage:
+        return R, _coverage(prepared, R_dict)
     return R
 
 
+def _coverage(prepared, R_dict):
+    """Gets the scenario coverage for each robustness metric"""
+    return {
+        R_metric: prepared.coverage(R_dict[R_metric]['f'])
+        for R_metric in R_dict}
+
+
+def _f_to_R_parallel(
+        prepared, R_dict, executor, n_workers, chunk_size, nan_policy,
+        cache):
+    """Calculates robustness for blocks of decision alternatives in parallel.
+
+    See `f_to_R`. Gives identical results to the serial calculation.
+    """
+    n_l = prepared.l_idxs.size
+    if chunk_size is None:
+        n_blocks = n_workers or os.cpu_count()
+    else:
+        n_blocks = -(-n_l // chunk_size)
+    blocks = parallel.split_alternatives(n_l, n_blocks)
+
+    R = {}
+    tasks = []
+    n_tasks = {}
+    keys = {}
+    for R_metric in R_dict:
+        f_metric = R_dict[R_metric]['f']
+        threshold = R_dict[R_metric]['threshold']
+        assert threshold is None or threshold in prepared.columns
+        kwargs = metric_kwargs(prepared, R_dict[R_metric], nan_policy)
+        if cache is not None:
+            # The same key as for the serial calculation
+            keys[R_metric] = cache.key(
+                R_dict[R_metric]['func'], prepared[f_metric], kwargs)
+            cached_R = cache.load(keys[R_metric])
+            if cached_R is not None:
+                R[R_metric] = cached_R
+                continue
+        threshold_values = (
+            None if threshold is None
+            else kwargs['t1_kwargs']['threshold'])
+        if np.ndim(threshold_values) == 2 and threshold_values.shape[0] > 1:
+            # Thresholds for each decision alternative are sliced for
+            # each block by the tasks
+            kwargs = metric_kwargs(
+                prepared, dict(R_dict[R_metric], threshold=None), nan_policy)
+        else:
+            threshold = None
+        if not splits_alternatives(R_dict[R_metric]['func']):
+            # Only parallel across metrics
+            metric_blocks = [(0, n_l)]
+        else:
+            metric_blocks = blocks
+        if len(metric_blocks) > 1 and needs_best_f(R_dict[R_metric]['func']):
+            # Each block must be compared to the best decision
+            # alternative across all blocks
+            kwargs = add_best_f(
+                R_dict[R_metric]['func'],
+                kwargs,
+                best_f(
+                    prepared[f_metric],
+                    R_dict[R_metric]['maximise'],
+                    nan_policy=nan_policy))
+        n_tasks[R_metric] = len(metric_blocks)
+        for l_start, l_stop in metric_blocks:
+            block = slice(l_start, l_stop)
+            tasks.append({
+                'func': block_func(R_dict[R_metric]['func'], n_l, block),
+                'kwargs': block_kwargs(kwargs, n_l, block),
+                'f_pos': prepared.columns.index(f_metric),
+                'threshold_pos': (
+                    None if threshold is None
+                    else prepared.columns.index(threshold)),
+                'l_start': l_start,
+                'l_stop': l_stop,
+                'dtype_policy': get_dtype_policy()})
+
+    results = parallel.run_R_tasks(
+        prepared.cube, tasks, executor=executor, n_workers=n_workers)
+
+    start = 0
+    for R_metric in n_tasks:
+        R_blocks = results[start:start + n_tasks[R_metric]]
+        start += n_tasks[R_metric]
+        if len(R_blocks) == 1:
+            R[R_metric] = R_blocks[0]
+        else:
+            R[R_metric] = np.concatenate(
+                [np.reshape(R_block, (-1, )) for R_block in R_blocks])
+        if cache is not None:
+            cache.save(keys[R_metric], R[R_metric])
+    return {R_metric: R[R_metric] for R_metric in R_dict}
+
+
+def metric_kwargs(prepared, spec, nan_policy='propagate'):
+    """Builds the keyword arguments for one robustness calculation.
+
+    Builds new dicts rather than modifying `spec`, so that an `R_dict`
+    can be reused (including by concurrent calls to `f_to_R`) and does
+    not keep the threshold values alive after the calculation.
+
+    Parameters
+    ----------
+    prepared : PreparedF
+        The prepared performance and threshold values
+    spec : dict
+        The information about one robustness metric (i.e. a value of
+        `R_dict`, see `f_to_R`)
+    nan_policy : {'propagate', 'omit'}, optional
+        Passed to the robustness metric if not 'propagate'.
+        (The default is 'propagate').
+
+    Returns
+    -------
+    dict
+        Keyword arguments for `spec['func']`
+    """
+    assert spec['f'] in prepared.columns
+    kwargs = dict(spec['kwargs'])
+    if spec['threshold'] is not None:
+        assert spec['threshold'] in prepared.columns
+        kwargs['t1_kwargs'] = dict(kwargs.get('t1_kwargs') or {})
+        kwargs['t1_kwargs']['threshold'] = compact_threshold(
+            prepared[spec['threshold']])
+    kwargs['maximise'] = spec['maximise']
+    if nan_policy != 'propagate':
+        kwargs['nan_policy'] = nan_policy
+    return kwargs
+
+
+def compact_threshold(threshold, block_size=65536):
+    """Gets threshold values in their most compact broadcastable form.
+
+    Thresholds often depend only on the scenario (e.g. a critical value
+    for each scenario) or are constant, so do not need an (l, s) array.
+
+    Parameters
+    ----------
+    threshold : np.ndarray, shape=(l, s)
+        The threshold for each decision alternative and scenario
+    block_size : int, optional
+        The number of values compared at a time, which limits the
+        memory used to check the threshold values.
+        (The default is 65536).
+
+    Returns
+    -------
+    float OR np.ndarray, shape=(1, s) or (l, 1) or (l, s)
+        The threshold values, which broadcast to shape (l, s): a float
+        if constant, OR one value for each scenario, OR one value for
+        each decision alternative, OR `threshold` if the values depend
+        on both.
+    """
+    threshold = np.asarray(threshold)
+    if threshold.ndim != 2 or threshold.size == 0:
+        return threshold
+    per_scenario = per_alternative = True
+    n_rows = max(1, block_size // threshold.shape[1])
+    for start in range(0, threshold.shape[0], n_rows):
+        block = threshold[start:start + n_rows]
+        per_scenario = per_scenario and np.array_equal(
+            block, np.broadcast_to(threshold[:1], block.shape))
+        per_alternative = per_alternative and np.array_equal(
+            block, np.broadcast_to(block[:, :1], block.shape))
+        if not (per_scenario or per_alternative):
+            return threshold
+    if per_scenario and per_alternative:
+        return float(threshold[0, 0])
+    # Copies, so that the (l, s) values are not kept alive
+    if per_scenario:
+        return np.array(threshold[:1])
+    return np.array(threshold[:, :1])
+
+
+def splits_alternatives(func):
+    """Checks if a robustness metric can be calculated in blocks.
+
+    A metric can be calculated for blocks of decision alternatives
+    separately if the robustness of each decision alternative depends
+    only on its own performance values, or on the best performance
+    value in each scenario (see `needs_best_f`). This is known for the
+    common metrics and custom metrics of the package's transformations.
+    Other functions may compare decision alternatives, so are only
+    split into blocks if they have a `per_alternative` attribute that
+    is True.
+
+    Parameters
+    ----------
+    func : func
+        The robustness metric function (see `f_to_R`)
+
+    Returns
+    -------
+    bool
+        True if the robustness metric can be calculated in blocks of
+        decision alternatives
+    """
+    while isinstance(func, functools.partial):
+        func = func.func
+    if getattr(func, 'per_alternative', False):
+        return True
+    if isinstance(func, custom_R_metric):
+        return all(
+            getattr(transform, '__module__', None) in [
+                t1.__name__, t2.__name__, t3.__name__]
+            for transform in [func.t1_func, func.t2_func, func.t3_func])
+    return func in [
+        getattr(common_metrics, name) for name in CLASSIC_METRICS]
+
+
+def block_kwargs(kwargs, n_l, block):
+    """Slices the per-alternative arrays of kwargs to a block.
+
+    Arrays with at least 2 dimensions and a value for each decision
+    alternative (e.g. a threshold of shape (l, 1)) are sliced, including
+    those in nested dicts such as `t1_kwargs`. Other values, e.g. for
+    each scenario, are shared by every block.
+
+    Parameters
+    ----------
+    kwargs : dict
+        Keyword arguments for a robustness metric
+    n_l : int
+        Number of decision alternatives
+    block : slice
+        The decision alternatives of the block
+
+    Returns
+    -------
+    dict
+        A copy of `kwargs` for the decision alternatives of the block
+    """
+    if block == slice(0, n_l):
+        return kwargs
+    block_values = {}
+    for name, value in kwargs.items():
+        if isinstance(value, dict):
+            value = block_kwargs(value, n_l, block)
+        elif (isinstance(value, np.ndarray) and value.ndim >= 2
+                and value.shape[0] == n_l):
+            value = value[block]
+        block_values[name] = value
+    return block_values
+
+
+def block_func(func, n_l, block):
+    """Slices the per-alternative arrays of a partial's keywords to a block.
+
+    See `block_kwargs`.
+
+    Parameters
+    ----------
+    func : func
+        The robustness metric function (see `f_to_R`)
+    n_l : int
+        Number of decision alternatives
+    block : slice
+        The decision alternatives of the block
+
+    Returns
+    -------
+    func
+        `func`, or a copy of it if it is a `functools.partial`
+    """
+    if not isinstance(func, functools.partial):
+        return func
+    return functools.partial(
+        block_func(func.func, n_l, block), *func.args,
+        **block_kwargs(func.keywords, n_l, block))
+
+
+def needs_best_f(func):
+    """Checks if a robustness metric needs the best f in each scenario.
+
+    Parameters
+    ----------
+    func : func
+        The robustness metric function (see `f_to_R`)
+
+    Returns
+    -------
+    bool
+        True if the robustness metric uses `t1.regret_from_best_da`,
+        which compares every decision alternative in a scenario.
+    """
+    while isinstance(func, functools.partial):
+        func = func.func
+    if isinstance(func, custom_R_metric):
+        return func.t1_func is t1.regret_from_best_da
+    return func in [
+        common_metrics.minimax_regret,
+        common_metrics.percentile_regret]
+
+
+def add_best_f(func, kwargs, best_f_values):
+    """Copies kwargs, adding best_f where the metric func expects it.
+
+    Parameters
+    ----------
+    func : func
+        The robustness metric function, for which `needs_best_f`
+    kwargs : dict
+        Keyword arguments for `func`
+    best_f_values : numpy.ndarray, shape=(s, )
+        The best performance value in each scenario
+
+    Returns
+    -------
+    dict
+        A copy of `kwargs` including `best_f_values`
+    """
+    kwargs = dict(kwargs)
+    while isinstance(func, functools.partial):
+        func = func.func
+    if isinstance(func, custom_R_metric):
+        kwargs['t1_kwargs'] = dict(kwargs.get('t1_kwargs') or {})
+        kwargs['t1_kwargs']['best_f'] = best_f_values
+    else:
+        kwargs['best_f'] = best_f_values
+    return kwargs
+
+
+def best_f(f, maximise, nan_policy='propagate'):
+    """Gets the best performance value in each scenario.
+
+    Parameters
+    ----------
+    f : numpy.ndarray, shape=(l, s)
+        Performance values
+    maximise : bool
+        Is the performance metric to be maximised or minimised.
+    nan_policy : {'propagate', 'omit'}, optional
+        Whether NaN values are propagated or ignored.
+        (The default is 'propagate').
+
+    Returns
+    -------
+    numpy.ndarray, shape=(s, )
+        The best performance value in each scenario, in the units of f
+    """
+    if nan_policy == 'omit':
+        reduce = np.fmax.reduce if maximise else np.fmin.reduce
+        return reduce(f, axis=0)
+    return np.amax(f, axis=0) if maximise else np.amin(f, axis=0)
+
+
+def get_R_dict_columns(R_dict):
+    """Gets the columns of f_df referenced by R_dict.
+
+    Parameters
+    ----------
+    R_dict : dict of dict
+        A mapping of robustness metric (`R`) names to information
+        about those robustness metrics (see `f_to_R`)
+
+    Returns
+    -------
+    list of str
+        The performance and threshold column names, without repeats,
+        in the order they are first referenced
+    """
+    columns = []
+    for R_metric in R_dict:
+        for key in ['f', 'threshold']:
+            column = R_dict[R_metric][key]
+            if column is not None and column not in columns:
+                columns.append(column)
+    return columns
+
+
+class PreparedF:
+    """Performance values prepared for repeated robustness calculations.
+
+    Holds every column needed from `f_df` in a single contiguous
+    (k, l, s) array, so that `f_to_R` can be called many times (e.g.
+    with different `R_dict`s) without handling the DataFrame again.
+    Create with `prepare_f_df`.
+
+    Attributes
+    ----------
+    cube : numpy.ndarray, shape=(k, l, s)
+        The values of each of the k columns for each decision
+        alternative and scenario
+    columns : list of str
+        The column name of each of the k slices of `cube`
+    s_idxs : numpy.ndarray, shape=(s, )
+        The scenario label (`s_idx`) of each scenario position
+    l_idxs : numpy.ndarray, shape=(l, )
+        The decision alternative label (`l_idx`) of each decision
+        alternative position
+    """
+    def __init__(self, cube, columns, s_idxs, l_idxs):
+        """Initialize the prepared performance values
+        """
+        self.cube = cube
+        self.columns = list(columns)
+        self.s_idxs = s_idxs
+        self.l_idxs = l_idxs
+        self._column_pos = {
+            column: pos for pos, column in enumerate(self.columns)}
+
+    def __getitem__(self, column):
+        """Gets the (l, s) array of values for a column"""
+        return self.cube[self._column_pos[column]]
+
+    def coverage(self, column):
+        """Gets the fraction of scenarios with a value for a column.
+
+        Parameters
+        ----------
+        column : str
+            The column name
+
+        Returns
+        -------
+        numpy.ndarray, shape=(l, )
+            The fraction of scenarios where the value of `column` is
+            not NaN, for each decision alternative
+        """
+        values = self[column]
+        return np.count_nonzero(~np.isnan(values), axis=1) / values.shape[1]
+
+    @property
+    def s_map(self):
+        """dict: Mapping of each scenario label to its position"""
+        return {label: pos for pos, label in enumerate(self.s_idxs.tolist())}
+
+    @property
+    def l_map(self):
+        """dict: Mapping of each decision alternative label to its position"""
+        return {label: pos for pos, label in enumerate(self.l_idxs.tolist())}
+
+
+def prepare_f_df(
+        f_df,
+        columns=None,
+        validate=True,
+        allow_missing=False,
+        dtype=None):
+    """Materialises columns of f_df once for use with f_to_R.
+
+    Parameters
+    ----------
+    f_df : pandas.DataFrame
+        A dataframe of performance values, `f`, with indexes for the
+        scenario, `s`, and decision alternative, `l`.
+        Columns: `['s_idx', 'l_idx', '<f1_name>', '<f2_name>', ...]`
+    columns : list of str, optional
+        The performance and threshold columns to prepare.
+        (The default is None, which prepares every column other than
+        's_idx' and 'l_idx'. See also `get_R_dict_columns`).
+    validate : bool, optional
+        Whether to check that every (s_idx, l_idx) pair appears exactly
+        once in `f_df`.
+        (The default is True).
+    allow_missing : bool, optional
+        Whether (s_idx, l_idx) pairs may be missing when validating.
+        Missing values are NaN.
+        (The default is False).
+    dtype : numpy.dtype, optional
+        The floating point type of the prepared values.
+        (The default is None, which is the widest of the types that
+        each column is converted to, see `column_dtype`).
+
+    Returns
+    -------
+    PreparedF
+        The prepared performance values
+    """
+    if columns is None:
+        columns = [
+            col for col in f_df.columns if col not in ['s_idx', 'l_idx']]
+    for column in columns:
+        assert column in f_df.columns
+    s_codes, l_codes, s_idxs, l_idxs = factorize_f_df(f_df)
+    if validate:
+        check_f_grid(
+            s_codes, l_codes, s_idxs.size, l_idxs.size,
+            allow_missing=allow_missing)
+    if dtype is None:
+        dtype = functools.reduce(
+            np.promote_types,
+            [column_dtype(f_df[column]) for column in columns],
+            np.dtype(np.float32))
+    cube = np.full(
+        (len(columns), l_idxs.size, s_idxs.size), np.nan, dtype=dtype)
+    # One column at a time, so that columns of different types are each
+    # converted to floating point rather than to a common (object) type
+    for pos, column in enumerate(columns):
+        cube[pos, l_codes, s_codes] = f_df[column].to_numpy(
+            dtype=dtype, na_value=np.nan)
+    return PreparedF(cube, columns, s_idxs, l_idxs)
+
+
+def column_dtype(column):
+    """Gets the floating point type to prepare a column of f_df in.
+
+    Floating point columns keep their type, but at least float32.
+    Booleans and integers of at most 16 bits, which float32 holds
+    exactly, are float32, and other columns are float64.
+
+    Parameters
+    ----------
+    column : pandas.Series
+        A performance or threshold column of f_df
+
+    Returns
+    -------
+    numpy.dtype
+        The floating point type for the column
+    """
+    # The NumPy type of pandas' nullable types, e.g. 'Int64' and 'boolean'
+    dtype = getattr(column.dtype, 'numpy_dtype', column.dtype)
+    if not isinstance(dtype, np.dtype):
+        return np.dtype(np.float64)
+    if np.issubdtype(dtype, np.floating):
+        return np.promote_types(dtype, np.float32)
+    if dtype == bool or (
+            np.issubdtype(dtype, np.integer) and dtype.itemsize <= 2):
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+def performance_dtype(f_df, R_dict):
+    """Gets the floating point type to prepare f_df in for R_dict.
+
+    The working type (see `precision.working_dtype`) of the performance
+    columns. Thresholds are compared with performance values in that
+    type (see `t1.satisfice`), so are prepared in it too rather than
+    up-casting float32 performance values to float64.
+
+    Parameters
+    ----------
+    f_df : pandas.DataFrame
+        A dataframe of performance values (see `f_to_R`)
+    R_dict : dict of dict
+        A mapping of robustness metric (`R`) names to information
+        about those robustness metrics (see `f_to_R`)
+
+    Returns
+    -------
+    numpy.dtype
+        The floating point type for `prepare_f_df`
+    """
+    dtype = functools.reduce(
+        np.promote_types,
+        [column_dtype(f_df[R_dict[R_metric]['f']]) for R_metric in R_dict],
+        np.dtype(np.float32))
+    return working_dtype(dtype)
+
+
 def sort_f_df(f_df):
-    """Sorts f_df by s_idx first then by l_idx.
+    """Sorts f_df by l_idx first then by s_idx.
+
+    E.g. for decision alternative 0, see all scenarios in order,
+    then decision alternative 1, decision alternative 2, etc.
 
-    E.g. for scenario 0, see all decision alternatives in order,
-    then scenario 1, scenario 2, etc.
+    Not required by `f_to_R`, which places each row in the performance
+    cube by its labels (see `build_f_cube`), but useful for display.
 
     Parameters
     ----------
@@ -96,17 +714,22 @@ def sort_f_df(f_df):
         A dataframe of performance values, `f`, with indexes for the
         scenario, `s`, and decision alternative, `l`.
         Columns: `['s_idx', 'l_idx', '<f1_name>', '<f2_name>', ...]`
+
+    Returns
+    -------
+    pandas.DataFrame
+        A sorted copy of `f_df`.
     """
-    # This will sort first by s_idx then by l_idx, both from 0 to ...
-    f_df.sort_values(['l_idx', 's_idx'], ascending=[True, True])
+    # This will sort first by l_idx then by s_idx, both from 0 to ...
+    f_df = f_df.sort_values(['l_idx', 's_idx'], ascending=[True, True])
     return f_df
 
 
-def get_f_df_details(f_df):
+def get_f_df_details(f_df, validate=True):
     """Gets the unique s_idx and l_idx values in f_df.
 
     Also checks that for each s_idx, each unique l_idx exists
-    (and vice versa).
+    (and vice versa), and that no (s_idx, l_idx) pair is repeated.
 
     Parameters
     ----------
@@ -114,23 +737,112 @@ def get_f_df_details(f_df):
         A dataframe of performance values, `f`, with indexes for the
         scenario, `s`, and decision alternative, `l`.
         Columns: `['s_idx', 'l_idx', '<f1_name>', '<f2_name>', ...]`
+    validate : bool, optional
+        Whether to check the (s_idx, l_idx) pairs.
+        (The default is True, False skips the check for trusted input).
 
     Returns
     -------
-    s_idxs : list of int
-        Number of scenario (`s`) idxs
-    l_idxs : list of int
-        List decision alternative (`l`) idxs
+    s_idxs : numpy.ndarray
+        The unique scenario (`s`) idxs, sorted
+    l_idxs : numpy.ndarray
+        The unique decision alternative (`l`) idxs, sorted
     """
-    # Check that df is sorted
-    f_df = sort_f_df(f_df)
+    s_codes, l_codes, s_idxs, l_idxs = factorize_f_df(f_df)
+    if validate:
+        check_f_grid(s_codes, l_codes, s_idxs.size, l_idxs.size)
+    return s_idxs, l_idxs
 
-    s_idxs = f_df['s_idx'].unique()
-    l_idxs = f_df['l_idx'].unique()
 
-    for s_idx in s_idxs:
-        relevant_rows = f_df.loc[f_df['s_idx'] == s_idx]
-        relevant_l_idxs = relevant_rows['l_idx'].values
-        assert np.allclose(relevant_l_idxs, l_idxs)
+def check_f_grid(s_codes, l_codes, n_s, n_l, allow_missing=False):
+    """Checks that every (s, l) pair appears exactly once.
 
-    return s_idxs, l_idxs
+    Counts the occurrences of each (s, l) pair in a single pass.
+
+    Parameters
+    ----------
+    s_codes, l_codes : numpy.ndarray, shape=(N, ), dtype=int
+        The scenario and decision alternative position of each row
+        of `f_df` (see `factorize_f_df`)
+    n_s, n_l : int
+        Number of scenarios and decision alternatives
+    allow_missing : bool, optional
+        Whether (s, l) pairs may be missing, i.e. only check for
+        duplicates.
+        (The default is False).
+
+    Raises
+    ------
+    AssertionError
+        If any (s, l) pair is missing or duplicated.
+    """
+    pair_codes = np.asarray(l_codes, dtype=np.int64) * n_s + s_codes
+    counts = np.bincount(pair_codes, minlength=n_s * n_l)
+    n_duplicates = np.count_nonzero(counts > 1)
+    n_missing = np.count_nonzero(counts == 0)
+    assert n_duplicates == 0, (
+        '{} (s_idx, l_idx) pairs appear more than once'.format(n_duplicates))
+    assert allow_missing or n_missing == 0, (
+        '{} (s_idx, l_idx) pairs are missing'.format(n_missing))
+
+
+def factorize_f_df(f_df):
+    """Maps the s_idx and l_idx labels of f_df to cube positions.
+
+    Labels can be any hashable values (e.g. non-contiguous ints or
+    strings). Positions follow the sorted order of the unique labels,
+    but only the unique labels are sorted, not the rows of `f_df`.
+
+    Parameters
+    ----------
+    f_df : pandas.DataFrame
+        A dataframe of performance values, `f`, with indexes for the
+        scenario, `s`, and decision alternative, `l`.
+        Columns: `['s_idx', 'l_idx', '<f1_name>', '<f2_name>', ...]`
+
+    Returns
+    -------
+    s_codes : numpy.ndarray, shape=(N, ), dtype=int
+        The scenario position of each row of `f_df`
+    l_codes : numpy.ndarray, shape=(N, ), dtype=int
+        The decision alternative position of each row of `f_df`
+    s_labels : numpy.ndarray, shape=(s, )
+        The scenario label at each scenario position
+    l_labels : numpy.ndarray, shape=(l, )
+        The decision alternative label at each decision alternative
+        position
+    """
+    s_codes, s_labels = pd.factorize(f_df['s_idx'], sort=True)
+    l_codes, l_labels = pd.factorize(f_df['l_idx'], sort=True)
+    return s_codes, l_codes, np.asarray(s_labels), np.asarray(l_labels)
+
+
+def build_f_cube(f_df, column):
+    """Builds an (l, s) performance cube from a column of f_df.
+
+    The rows of `f_df` do not need to be sorted. Each value is placed
+    directly into its position in a preallocated array, so the cost is
+    O(N) in the number of rows.
+
+    Parameters
+    ----------
+    f_df : pandas.DataFrame
+        A dataframe of performance values, `f`, with indexes for the
+        scenario, `s`, and decision alternative, `l`.
+        Columns: `['s_idx', 'l_idx', '<f1_name>', '<f2_name>', ...]`
+    column : str
+        The name of the column to place in the cube
+
+    Returns
+    -------
+    f : numpy.ndarray, shape=(l, s)
+        The values of `column` for each decision alternative and
+        scenario. Positions without a value are NaN.
+    s_map : dict
+        Mapping of each scenario label (`s_idx`) to its column in `f`
+    l_map : dict
+        Mapping of each decision alternative label (`l_idx`) to its
+        row in `f`
+    """
+    prepared = prepare_f_df(f_df, columns=[column], validate=False)
+    return prepared[column], prepared.s_map, prepared.l_map
@@ -0,0 +1,167 @@
+"""Stores performance cubes on disk for memory-mapped access.
+
+A cube file holds the (k, l, s) performance and threshold values of a
+`PreparedF` (see `prepare_f_df`) so that it can be opened with
+`numpy.memmap` instead of being parsed into a DataFrame. Only the pages
+that are used are read, and processes that open the same file share one
+copy in the operating system's page cache.
+
+The file format is:
+    - the magic bytes b'SRCUBE' and a format version (2 bytes);
+    - the length of the header (8 bytes, little-endian unsigned int);
+    - the header, UTF-8 JSON with the 'dtype', 'shape', 'columns',
+      's_idxs' and 'l_idxs' of the cube and the 'offset' of the data;
+    - padding so that the data starts on a page boundary; and
+    - the data, a C-ordered little-endian array of shape (k, l, s).
+"""
+
+import json
+import struct
+import numpy as np
+
+from .calc import PreparedF, prepare_f_df
+
+MAGIC = b'SRCUBE'
+VERSION = 1
+# Data starts on a multiple of this, so that it is page aligned
+ALIGNMENT = 4096
+
+
+def create_cube(path, columns, s_idxs, l_idxs, dtype=np.float64):
+    """Creates a cube file, filled with NaN, to be written to in place.
+
+    Useful for building a cube that is too large to hold in memory,
+    e.g. by writing the results of each simulation as they complete.
+
+    Parameters
+    ----------
+    path : str
+        The path of the cube file
+    columns : list of str
+        The performance and threshold column names
+    s_idxs : array_like, shape=(s, )
+        The scenario labels (ints, floats or strs)
+    l_idxs : array_like, shape=(l, )
+        The decision alternative labels (ints, floats or strs)
+    dtype : numpy.dtype, optional
+        A floating point data type.
+        (The default is numpy.float64).
+
+    Returns
+    -------
+    PreparedF
+        The prepared performance values, with a writable numpy.memmap
+        as the cube
+    """
+    dtype = np.dtype(dtype).newbyteorder('<')
+    assert np.issubdtype(dtype, np.floating), 'dtype must be floating point'
+    s_idxs = np.asarray(s_idxs)
+    l_idxs = np.asarray(l_idxs)
+    shape = (len(columns), l_idxs.size, s_idxs.size)
+    header = {
+        'dtype': dtype.str,
+        'shape': list(shape),
+        'columns': list(columns),
+        's_idxs': s_idxs.tolist(),
+        'l_idxs': l_idxs.tolist()}
+    # The offset is part of the header, so allow for its digits
+    header_size = len(json.dumps(dict(header, offset=0)).encode()) + 20
+    offset = -(-(len(MAGIC) + 10 + header_size) // ALIGNMENT) * ALIGNMENT
+    header['offset'] = offset
+    header_bytes = json.dumps(header).encode().ljust(header_size)
+    with open(path, 'wb') as cube_file:
+        cube_file.write(MAGIC)
+        cube_file.write(struct.pack('<HQ', VERSION, len(header_bytes)))
+        cube_file.write(header_bytes)
+        cube_file.truncate(offset + int(np.prod(shape)) * dtype.itemsize)
+    prepared = open_cube(path, mode='r+')
+    prepared.cube[...] = np.nan
+    return prepared
+
+
+def save_cube(path, f, columns=None, validate=True):
+    """Saves performance values as a cube file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the cube file
+    f : PreparedF or pandas.DataFrame
+        The prepared performance values, OR a dataframe of performance
+        values (see `prepare_f_df`)
+    columns : list of str, optional
+        The columns of `f` to save.
+        (The default is None, which saves every column).
+    validate : bool, optional
+        Whether to check that every (s_idx, l_idx) pair appears exactly
+        once if `f` is a DataFrame (see `prepare_f_df`).
+        (The default is True).
+    """
+    if not isinstance(f, PreparedF):
+        f = prepare_f_df(f, columns=columns, validate=validate)
+    if columns is None:
+        columns = f.columns
+    prepared = create_cube(
+        path, columns, f.s_idxs, f.l_idxs, dtype=f.cube.dtype)
+    # One column at a time, to limit memory use
+    for column in columns:
+        prepared[column][...] = f[column]
+    prepared.cube.flush()
+
+
+def open_cube(path, mode='r'):
+    """Opens a cube file without reading the performance values.
+
+    Parameters
+    ----------
+    path : str
+        The path of the cube file
+    mode : {'r', 'r+', 'c'}, optional
+        The `numpy.memmap` mode: read-only, read-write or
+        copy-on-write.
+        (The default is 'r').
+
+    Returns
+    -------
+    PreparedF
+        The prepared performance values, with a numpy.memmap as the
+        cube. Can be passed directly to `f_to_R`, or sliced
+        (e.g. `prepared['f1'][l_start:l_stop]`) for robustness metric
+        functions.
+    """
+    assert mode in ['r', 'r+', 'c']
+    header = read_header(path)
+    cube = np.memmap(
+        path,
+        dtype=np.dtype(header['dtype']),
+        mode=mode,
+        offset=header['offset'],
+        shape=tuple(header['shape']))
+    return PreparedF(
+        cube,
+        header['columns'],
+        np.asarray(header['s_idxs']),
+        np.asarray(header['l_idxs']))
+
+
+def read_header(path):
+    """Reads the header of a cube file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the cube file
+
+    Returns
+    -------
+    dict
+        The 'dtype', 'shape', 'columns', 's_idxs', 'l_idxs' and
+        'offset' of the cube
+    """
+    with open(path, 'rb') as cube_file:
+        assert cube_file.read(len(MAGIC)) == MAGIC, (
+            '{} is not a cube file'.format(path))
+        version, header_size = struct.unpack('<HQ', cube_file.read(10))
+        assert version == VERSION, (
+            'Unsupported cube file version: {}'.format(version))
+        return json.loads(cube_file.read(header_size).decode())
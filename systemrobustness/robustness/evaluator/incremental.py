@@ -0,0 +1,300 @@
+"""Updates robustness as scenarios or decision alternatives are added.
+
+Keeps sufficient statistics for each decision alternative so that the
+classic robustness metrics (see `metrics.common_metrics`) can be
+updated rather than recalculated from all performance values:
+    - running worst- and best-cases (maximin, maximax, hurwicz);
+    - count, mean and sum of squared deviations (see
+      `metrics.transforms.moments.Moments`) (laplace, mean_variance);
+    - the number of scenarios meeting a threshold (starrs_domain);
+    - the best performance in each scenario and the running worst
+      regret (minimax_regret);
+    - the sorted performance values of each decision alternative
+      (percentile_skew, percentile_kurtosis, undesirable_deviations);
+      and
+    - the sorted regret of each decision alternative
+      (percentile_regret).
+All statistics except the sorted values are updated in time
+proportional to the new performance values. New scenarios are merged
+into the sorted values of all decision alternatives at once, which
+moves every sorted value, so adding k scenarios to m decision
+alternatives with n scenarios costs O(m(n + k)) time (plus
+O(mk log k) to sort the new values). When new decision alternatives
+change the best performance in some scenarios, only the regret of those
+scenarios is replaced in the sorted regret, moving the values between
+its old and new positions.
+"""
+
+import numpy as np
+
+from ..metrics import common_metrics, t1, t2, t3
+from ..metrics.transforms.moments import Moments
+
+
+class IncrementalR:
+    """Robustness that can be updated with new scenarios or alternatives.
+
+    Gives the same results as the functions in `metrics.common_metrics`
+    for all of the performance values added so far (with the default
+    `best_f` of `minimax_regret` and `percentile_regret`). NaN values
+    are not supported.
+
+    Parameters
+    ----------
+    f : numpy.ndarray, shape=(m, n)
+        Performance values, f, for m decision alternatives
+        and n scenarios.
+    maximise : bool, optional
+        Is the performance metric to be maximised or minimised.
+        (The default is True, which implies high values of f are better
+        than low values of f).
+    threshold : float, optional
+        The threshold used by `starrs_domain` (see `t1.satisfice`).
+        (The default is 0.0).
+    accept_equal : bool, optional
+        Whether an f value equal to the threshold is acceptable
+        (see `t1.satisfice`).
+        (The default is True).
+    """
+    def __init__(self, f, maximise=True, threshold=0.0, accept_equal=True):
+        """Initialize the statistics from the first performance values
+        """
+        self.maximise = maximise
+        self.threshold = threshold
+        self.accept_equal = accept_equal
+        _f = _prepare(f, maximise)
+        # Buffers are over-allocated so that appending is amortised
+        self._f = _GrowingArray(_f)
+        self._sorted_f = _GrowingArray(np.sort(_f, axis=1))
+        self._best_s = np.amax(_f, axis=0)
+        self._sorted_regret = _GrowingArray(np.sort(_f - self._best_s, axis=1))
+        self._worst = np.amin(_f, axis=1)
+        self._best = np.amax(_f, axis=1)
+        self._moments = Moments.from_f(_f)
+        self._n_satisficed = np.sum(self._satisfice(_f), axis=1)
+        self._worst_regret = np.amin(_f - self._best_s, axis=1)
+
+    @property
+    def shape(self):
+        """tuple: The number of decision alternatives and scenarios"""
+        return self._f.shape
+
+    def add_scenarios(self, f):
+        """Adds the performance of each decision alternative in new scenarios.
+
+        Merging the new values into the sorted values of each decision
+        alternative costs O(m(n + k)) time for n existing scenarios; the
+        other statistics are updated in O(mk) time.
+
+        Parameters
+        ----------
+        f : numpy.ndarray, shape=(m, k)
+            Performance values, f, for the m decision alternatives
+            and k new scenarios.
+        """
+        _f = _prepare(f, self.maximise)
+        assert _f.shape[0] == self.shape[0]
+        best_s = np.amax(_f, axis=0)
+        self._worst = np.minimum(self._worst, np.amin(_f, axis=1))
+        self._best = np.maximum(self._best, np.amax(_f, axis=1))
+        self._moments.update(_f)
+        self._n_satisficed += np.sum(self._satisfice(_f), axis=1)
+        self._worst_regret = np.minimum(
+            self._worst_regret, np.amin(_f - best_s, axis=1))
+        self._best_s = np.concatenate((self._best_s, best_s))
+        self._f.append(_f, axis=1)
+        self._sorted_f.merge(np.sort(_f, axis=1))
+        self._sorted_regret.merge(np.sort(_f - best_s, axis=1))
+
+    def add_alternatives(self, f):
+        """Adds the performance of new decision alternatives in each scenario.
+
+        Parameters
+        ----------
+        f : numpy.ndarray, shape=(k, n)
+            Performance values, f, for k new decision alternatives
+            and the n scenarios.
+        """
+        _f = _prepare(f, self.maximise)
+        assert _f.shape[1] == self.shape[1]
+        # Regret of existing decision alternatives only changes in
+        # scenarios where a new decision alternative is the best, and
+        # can only get worse, so only those scenarios are checked.
+        best_s = np.maximum(self._best_s, np.amax(_f, axis=0))
+        changed = best_s > self._best_s
+        if np.any(changed):
+            changed_f = self._f.array[:, changed]
+            self._worst_regret = np.minimum(
+                self._worst_regret,
+                np.amin(changed_f - best_s[changed], axis=1))
+            if 2 * np.count_nonzero(changed) > self.shape[1]:
+                # Most values change, so re-sorting (in place) is quicker
+                self._sorted_regret.array[:] = np.sort(
+                    self._f.array - best_s, axis=1)
+            else:
+                self._sorted_regret.replace_values(
+                    np.sort(changed_f - self._best_s[changed], axis=1),
+                    np.sort(changed_f - best_s[changed], axis=1))
+        self._best_s = best_s
+        self._worst = np.concatenate((self._worst, np.amin(_f, axis=1)))
+        self._best = np.concatenate((self._best, np.amax(_f, axis=1)))
+        self._moments = Moments.concatenate(
+            [self._moments, Moments.from_f(_f)])
+        self._n_satisficed = np.concatenate(
+            (self._n_satisficed, np.sum(self._satisfice(_f), axis=1)))
+        self._worst_regret = np.concatenate(
+            (self._worst_regret, np.amin(_f - best_s, axis=1)))
+        self._f.append(_f, axis=0)
+        self._sorted_f.append(np.sort(_f, axis=1), axis=0)
+        self._sorted_regret.append(np.sort(_f - best_s, axis=1), axis=0)
+
+    def maximin(self):
+        """Maximin robustness (see `common_metrics.maximin`)"""
+        return self._worst.copy()
+
+    def maximax(self):
+        """Maximax robustness (see `common_metrics.maximax`)"""
+        return self._best.copy()
+
+    def hurwicz(self, alpha=0.5):
+        """Hurwicz robustness (see `common_metrics.hurwicz`)"""
+        return alpha * self._worst + (1. - alpha) * self._best
+
+    def laplace(self):
+        """Laplace robustness (see `common_metrics.laplace`)"""
+        return self._moments.mean.copy()
+
+    def minimax_regret(self):
+        """Minimax regret robustness (see `common_metrics.minimax_regret`)"""
+        return self._worst_regret.copy()
+
+    def percentile_regret(self, percentile=0.1):
+        """Percentile regret robustness
+
+        See `common_metrics.percentile_regret`.
+        """
+        sorted_regret = self._sorted_regret.array
+        idx = t2.nearest_idxs(sorted_regret.shape[1], percentile)
+        return sorted_regret[:, idx].copy()
+
+    def mean_variance(self):
+        """Mean-variance robustness (see `common_metrics.mean_variance`)"""
+        return t3.f_mean_variance(self._moments)
+
+    def starrs_domain(self):
+        """Starr's domain robustness (see `common_metrics.starrs_domain`)"""
+        return self._n_satisficed / self.shape[1]
+
+    def undesirable_deviations(self):
+        """Undesirable deviations robustness
+
+        See `common_metrics.undesirable_deviations`.
+        """
+        sorted_f = self._sorted_f.array
+        n = sorted_f.shape[1]
+        median_f = np.mean(sorted_f[:, [(n - 1) // 2, n // 2]], axis=1)
+        # The worst half of the regret from the median (see t2.worst_half)
+        _n = int(n / 2. + 0.51)
+        return np.mean(sorted_f[:, :_n], axis=1) - median_f
+
+    def percentile_skew(self):
+        """Percentile skew robustness (see `common_metrics.percentile_skew`)"""
+        return t3.f_skew(self._percentiles(common_metrics.SKEW_PERCENTILES))
+
+    def percentile_kurtosis(self):
+        """Percentile kurtosis robustness
+
+        See `common_metrics.percentile_kurtosis`.
+        """
+        return t3.f_kurtosis(
+            self._percentiles(common_metrics.KURTOSIS_PERCENTILES))
+
+    def _percentiles(self, percentiles):
+        """Selects percentiles from the sorted performance values"""
+        sorted_f = self._sorted_f.array
+        return sorted_f[:, t2.nearest_idxs(sorted_f.shape[1], percentiles)]
+
+    def _satisfice(self, _f):
+        """Checks which values of _f (maximised) meet the threshold"""
+        c = self.threshold if self.maximise else -self.threshold
+        return _f >= c if self.accept_equal else _f > c
+
+
+class _GrowingArray:
+    """A 2D array that can be appended to in amortised constant time"""
+    def __init__(self, array):
+        self._buffer = np.array(array)
+        self.shape = self._buffer.shape
+
+    @property
+    def array(self):
+        """The current values (a view of the buffer)"""
+        return self._buffer[:self.shape[0], :self.shape[1]]
+
+    def append(self, values, axis):
+        """Appends values along axis (0 for rows, 1 for columns)"""
+        shape = list(self.shape)
+        shape[axis] += values.shape[axis]
+        if any(s > b for s, b in zip(shape, self._buffer.shape)):
+            capacity = [
+                max(s, 2 * b) if s > b else b
+                for s, b in zip(shape, self._buffer.shape)]
+            buffer = np.empty(capacity, dtype=self._buffer.dtype)
+            buffer[:self.shape[0], :self.shape[1]] = self.array
+            self._buffer = buffer
+        if axis == 0:
+            self._buffer[self.shape[0]:shape[0], :shape[1]] = values
+        else:
+            self._buffer[:shape[0], self.shape[1]:shape[1]] = values
+        self.shape = tuple(shape)
+
+    def merge(self, values):
+        """Merges sorted values into each (sorted) row, in place.
+
+        The values are appended to the rows, and all of the rows are
+        sorted in one call with a stable sort. For floating point values
+        this is NumPy's timsort, which finds the two sorted runs of each
+        row and merges them, so merging k values into rows of n values
+        moves O(n + k) values per row (new values go after equal old
+        values).
+        """
+        self.append(values, axis=1)
+        self.array.sort(axis=1, kind='stable')
+
+    def replace_values(self, old, new):
+        """Replaces values in each (sorted) row, keeping it sorted.
+
+        Only the values of each row between the first and last of its
+        old and new values' positions are moved.
+
+        Parameters
+        ----------
+        old : numpy.ndarray, shape=(m, c)
+            Sorted values to remove from each row
+        new : numpy.ndarray, shape=(m, c)
+            Sorted values to add to each row
+        """
+        for row, old_values, new_values in zip(self.array, old, new):
+            # The position of each old value, counting repeated values
+            first = np.searchsorted(row, old_values, side='left')
+            repeats = np.arange(old_values.size) - np.searchsorted(
+                old_values, old_values, side='left')
+            old_positions = first + repeats
+            start = min(
+                old_positions[0],
+                np.searchsorted(row, new_values[0], side='left'))
+            stop = max(
+                old_positions[-1] + 1,
+                np.searchsorted(row, new_values[-1], side='right'))
+            window = np.concatenate((
+                np.delete(row[start:stop], old_positions - start),
+                new_values))
+            window.sort()
+            row[start:stop] = window
+
+
+def _prepare(f, maximise):
+    """Transforms f to be maximised, as a float array"""
+    _f = t1.identity(f, maximise=maximise)
+    return np.asarray(_f, dtype=np.result_type(_f, 1.))
+
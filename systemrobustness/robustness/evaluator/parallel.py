@@ -0,0 +1,149 @@
+"""Runs robustness calculations in parallel.
+
+Each task calculates one robustness metric for one block of decision
+alternatives. Tasks are run on a thread pool or a process pool. For
+process pools, the performance values are placed in shared memory so
+that each worker gets a view of them rather than a pickled copy. Cubes
+that are memory-mapped from a file (see `cube_store`) are instead
+opened by each worker from the file.
+"""
+
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
+import numpy as np
+
+from ..metrics.transforms.precision import dtype_policy
+
+
+def run_R_tasks(cube, tasks, executor='thread', n_workers=None):
+    """Runs robustness calculation tasks in parallel.
+
+    Parameters
+    ----------
+    cube : numpy.ndarray, shape=(k, l, s)
+        The performance and threshold values (see `PreparedF`)
+    tasks : list of dict
+        The tasks to run. Each task is a dict including
+        'func': func
+            the robustness metric function
+        'kwargs': dict
+            keyword arguments for `func` (including 'maximise')
+        'f_pos': int
+            the position in `cube` of the performance values
+        'threshold_pos': None or int
+            the position in `cube` of the thresholds, passed to `func`
+            as `t1_kwargs['threshold']`, OR None if not using a
+            threshold column
+        'l_start', 'l_stop': int
+            the block of decision alternatives to calculate R for
+        'dtype_policy': numpy.dtype or None, optional
+            the `dtype_policy` to calculate R with, as workers do not
+            share the caller's policy
+    executor : str or concurrent.futures.Executor, optional
+        'thread' or 'process' to create a pool of that kind, or an
+        existing executor to use.
+        (The default is 'thread').
+    n_workers : int, optional
+        The number of workers if creating a pool.
+        (The default is None, which uses the number of CPUs).
+
+    Returns
+    -------
+    list
+        The result of each task, in the same order as `tasks`
+    """
+    if isinstance(executor, str):
+        assert executor in ['thread', 'process'], (
+            'executor must be "thread", "process" or an Executor')
+        pool_class = (
+            concurrent.futures.ThreadPoolExecutor if executor == 'thread'
+            else concurrent.futures.ProcessPoolExecutor)
+        with pool_class(max_workers=n_workers or os.cpu_count()) as pool:
+            return run_R_tasks(cube, tasks, executor=pool)
+
+    if not isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+        futures = [executor.submit(_run_task, cube, task) for task in tasks]
+        return [future.result() for future in futures]
+
+    if isinstance(cube, np.memmap) and cube.filename is not None:
+        # Workers share the file's pages through the page cache
+        cube_ref = (cube.filename, cube.offset, cube.shape, cube.dtype.str)
+        futures = [
+            executor.submit(_run_memmap_task, cube_ref, task)
+            for task in tasks]
+        return [future.result() for future in futures]
+
+    shm = shared_memory.SharedMemory(create=True, size=max(cube.nbytes, 1))
+    try:
+        shared_cube = np.ndarray(cube.shape, dtype=cube.dtype, buffer=shm.buf)
+        shared_cube[...] = cube
+        del shared_cube
+        cube_ref = (shm.name, cube.shape, cube.dtype.str)
+        futures = [
+            executor.submit(_run_shared_task, cube_ref, task)
+            for task in tasks]
+        return [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def split_alternatives(n_l, n_blocks):
+    """Splits decision alternatives into contiguous blocks.
+
+    Parameters
+    ----------
+    n_l : int
+        Number of decision alternatives
+    n_blocks : int
+        Number of blocks to split them into (at most `n_l`)
+
+    Returns
+    -------
+    list of tuple of int
+        The (start, stop) of each block
+    """
+    n_blocks = max(1, min(n_blocks, n_l))
+    edges = np.linspace(0, n_l, n_blocks + 1).astype(int)
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+def _run_task(cube, task):
+    """Calculates robustness for one task (see `run_R_tasks`)"""
+    rows = slice(task['l_start'], task['l_stop'])
+    kwargs = dict(task['kwargs'])
+    if task['threshold_pos'] is not None:
+        kwargs['t1_kwargs'] = dict(kwargs.get('t1_kwargs') or {})
+        kwargs['t1_kwargs']['threshold'] = cube[task['threshold_pos'], rows]
+    with dtype_policy(task.get('dtype_policy')):
+        return task['func'](cube[task['f_pos'], rows], **kwargs)
+
+
+def _run_shared_task(cube_ref, task):
+    """Calculates robustness for one task, using a shared memory cube"""
+    name, shape, dtype = cube_ref
+    # Pool workers share the resource tracker of the parent process,
+    # which unlinks the shared memory once all tasks are complete.
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        cube = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        # Copy so that no views of the shared memory are returned
+        R = np.array(_run_task(cube, task), copy=True)
+        del cube
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # Views are still held by the traceback of an exception
+            pass
+    return R
+
+
+def _run_memmap_task(cube_ref, task):
+    """Calculates robustness for one task, using a memory-mapped cube"""
+    filename, offset, shape, dtype = cube_ref
+    cube = np.memmap(
+        filename, dtype=np.dtype(dtype), mode='r', offset=offset, shape=shape)
+    # Copy so that no views of the file are returned
+    return np.array(_run_task(cube, task), copy=True)
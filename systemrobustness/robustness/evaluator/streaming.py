@@ -0,0 +1,241 @@
+"""Calculates robustness from performance values stored on disk.
+
+The performance values are read in batches of rows, and robustness is
+calculated for chunks of decision alternatives at a time, so that the
+full table of performance values never needs to be held in memory.
+Only the columns referenced by the `R_dict` are read.
+
+Regret metrics that compare each decision alternative to the best
+decision alternative in each scenario (`t1.regret_from_best_da`) are
+calculated with two passes over the data: the first pass finds the best
+performance in each scenario, and the second calculates robustness.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+from .calc import (
+    f_to_R, get_R_dict_columns, prepare_f_df, needs_best_f, add_best_f,
+    best_f, performance_dtype)
+
+
+def f_to_R_streaming(
+        source,
+        R_dict,
+        chunk_size=1000,
+        batch_rows=1000000,
+        key='df',
+        validate=True,
+        nan_policy='propagate'):
+    """Calculates robustness from performance values stored on disk.
+
+    Gives the same result as `f_to_R`, but only holds the performance
+    values for `chunk_size` decision alternatives in memory at a time.
+
+    The rows for each decision alternative must be stored together
+    (i.e. sorted or grouped by 'l_idx', as when simulations are run one
+    decision alternative at a time), and every decision alternative
+    must be simulated in the same scenarios.
+
+    Parameters
+    ----------
+    source : str or pandas.DataFrame
+        Path to a Parquet ('.parquet', '.pq'), HDF5 ('.h5', '.hdf5';
+        must be written in 'table' format) or CSV ('.csv') file
+        containing the performance values. A pandas.DataFrame is also
+        accepted and is read in the same way.
+        Columns: `['s_idx', 'l_idx', '<f1_name>', '<f2_name>', ...]`
+    R_dict : dict of dict
+        A mapping of robustness metric (`R`) names to information
+        about those robustness metrics (see `f_to_R`)
+    chunk_size : int, optional
+        The number of decision alternatives to calculate robustness for
+        at a time.
+        (The default is 1000).
+    batch_rows : int, optional
+        The number of rows to read from `source` at a time.
+        (The default is 1000000).
+    key : str, optional
+        The key of the table in an HDF5 file.
+        (The default is 'df').
+    validate : bool, optional
+        Whether to check that every (s_idx, l_idx) pair appears exactly
+        once in each chunk.
+        (The default is True).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle missing (s_idx, l_idx) pairs and NaN performance
+        values (see `f_to_R`). Each chunk of decision alternatives must
+        still include every scenario at least once.
+        (The default is 'propagate').
+
+    Returns
+    -------
+    dict
+        The robustness values for each robustness metric in `R_dict`,
+        numpy.ndarray, shape=(l, ), in the order of the sorted decision
+        alternative labels (as for `f_to_R`)
+    """
+    columns = ['s_idx', 'l_idx'] + get_R_dict_columns(R_dict)
+
+    def chunks():
+        batches = _read_batches(source, columns, batch_rows, key)
+        for f_df in _group_alternatives(batches, chunk_size):
+            yield prepare_f_df(
+                f_df,
+                columns=columns[2:],
+                validate=validate,
+                allow_missing=(nan_policy == 'omit'),
+                dtype=performance_dtype(f_df, R_dict))
+
+    # First pass: find the best performance in each scenario for any
+    # regret metrics that require it.
+    best_fs = {}
+    regret_keys = set(
+        (R_dict[R_metric]['f'], R_dict[R_metric]['maximise'])
+        for R_metric in R_dict
+        if needs_best_f(R_dict[R_metric]['func']))
+    s_idxs = None
+    if regret_keys:
+        for prepared in chunks():
+            s_idxs = _check_s_idxs(s_idxs, prepared.s_idxs)
+            for f_metric, maximise in regret_keys:
+                chunk_best_f = best_f(
+                    prepared[f_metric], maximise, nan_policy=nan_policy)
+                if (f_metric, maximise) in best_fs:
+                    chunk_best_f = best_f(
+                        np.stack(
+                            [best_fs[(f_metric, maximise)], chunk_best_f]),
+                        maximise,
+                        nan_policy=nan_policy)
+                best_fs[(f_metric, maximise)] = chunk_best_f
+
+    # Second pass: calculate robustness for each chunk
+    R_chunks = {R_metric: [] for R_metric in R_dict}
+    l_idxs = []
+    for prepared in chunks():
+        s_idxs = _check_s_idxs(s_idxs, prepared.s_idxs)
+        chunk_R_dict = {}
+        for R_metric in R_dict:
+            chunk_R_dict[R_metric] = dict(R_dict[R_metric])
+            if needs_best_f(R_dict[R_metric]['func']):
+                chunk_R_dict[R_metric]['kwargs'] = add_best_f(
+                    R_dict[R_metric]['func'],
+                    R_dict[R_metric]['kwargs'],
+                    best_fs[
+                        (R_dict[R_metric]['f'], R_dict[R_metric]['maximise'])])
+            else:
+                chunk_R_dict[R_metric]['kwargs'] = dict(
+                    R_dict[R_metric]['kwargs'])
+        chunk_R = f_to_R(prepared, chunk_R_dict, nan_policy=nan_policy)
+        for R_metric in R_dict:
+            R_chunks[R_metric].append(np.reshape(chunk_R[R_metric], (-1, )))
+        l_idxs.append(prepared.l_idxs)
+
+    # Put the decision alternatives in the same order as f_to_R
+    order = np.argsort(np.concatenate(l_idxs), kind='stable')
+    R = {
+        R_metric: np.concatenate(R_chunks[R_metric])[order]
+        for R_metric in R_dict}
+    return R
+
+
+def _check_s_idxs(s_idxs, chunk_s_idxs):
+    """Checks that a chunk has the same scenarios as previous chunks"""
+    if s_idxs is None:
+        return chunk_s_idxs
+    assert np.array_equal(s_idxs, chunk_s_idxs), (
+        'Decision alternatives have different scenarios')
+    return s_idxs
+
+
+def _read_batches(source, columns, batch_rows, key):
+    """Yields DataFrames of consecutive rows of source"""
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), batch_rows):
+            yield source[columns].iloc[start:start + batch_rows]
+        return
+    ext = os.path.splitext(source)[1].lower()
+    if ext in ['.parquet', '.pq']:
+        # Optional dependency, only needed for Parquet files
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(source)
+        for batch in parquet_file.iter_batches(
+                batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+    elif ext in ['.h5', '.hdf5', '.hdf']:
+        with pd.HDFStore(source, mode='r') as store:
+            for f_df in store.select(
+                    key, columns=columns, chunksize=batch_rows):
+                yield f_df.reset_index(drop=True)
+    elif ext == '.csv':
+        for f_df in pd.read_csv(
+                source, usecols=columns, chunksize=batch_rows):
+            yield f_df[columns]
+    else:
+        raise ValueError('Unsupported file type: {}'.format(ext))
+
+
+def _group_alternatives(batches, chunk_size):
+    """Regroups batches of rows into chunks of whole decision alternatives.
+
+    Parameters
+    ----------
+    batches : iterable of pandas.DataFrame
+        Consecutive rows of performance values, with the rows of each
+        decision alternative stored together
+    chunk_size : int
+        The number of decision alternatives in each chunk
+
+    Yields
+    ------
+    pandas.DataFrame
+        The rows of up to `chunk_size` decision alternatives
+    """
+    seen = set()
+    # Rows of fewer than chunk_size + 1 decision alternatives, kept as
+    # parts so each row is only concatenated once, into its chunk
+    pending = []
+    n_pending = 0
+    for batch in batches:
+        if len(batch) == 0:
+            continue
+        l_idx = batch['l_idx'].values
+        starts = _alternative_starts(l_idx)
+        if pending and pending[-1]['l_idx'].values[-1] == l_idx[0]:
+            # The last pending decision alternative continues
+            starts = starts[1:]
+        # The last decision alternative may continue in the next batch
+        ends = starts[chunk_size - n_pending::chunk_size]
+        if ends.size == 0:
+            pending.append(batch)
+            n_pending += starts.size
+            continue
+        chunk = pd.concat(pending + [batch.iloc[:ends[0]]])
+        _check_unseen(chunk, seen)
+        yield chunk
+        for start, end in zip(ends[:-1], ends[1:]):
+            chunk = batch.iloc[start:end]
+            _check_unseen(chunk, seen)
+            yield chunk
+        pending = [batch.iloc[ends[-1]:]]
+        n_pending = starts.size - np.searchsorted(starts, ends[-1])
+    if pending:
+        chunk = pd.concat(pending)
+        _check_unseen(chunk, seen)
+        yield chunk
+
+
+def _alternative_starts(l_idx):
+    """Gets the row where each run of a decision alternative starts"""
+    return np.concatenate(
+        ([0], np.flatnonzero(l_idx[1:] != l_idx[:-1]) + 1))
+
+
+def _check_unseen(chunk, seen):
+    """Checks that decision alternatives are not split between chunks"""
+    l_idxs = pd.unique(chunk['l_idx'])
+    starts = _alternative_starts(chunk['l_idx'].values)
+    assert starts.size == l_idxs.size and seen.isdisjoint(l_idxs), (
+        'Rows for each decision alternative must be stored together')
+    seen.update(l_idxs.tolist())
@@ -0,0 +1,85 @@
+"""Tests the on-disk robustness cache"""
+
+import os
+import numpy as np
+import pytest
+from .. import cache, calc
+from ...metrics import common_metrics, dtype_policy
+from .test_streaming import _R_dict, _f_df
+
+_n_calls = 0
+
+
+def _counted_maximin(f, maximise=True):
+    """Maximin that counts how many times it is calculated"""
+    global _n_calls
+    _n_calls += 1
+    return common_metrics.maximin(f, maximise=maximise)
+
+
+def test_evaluate(tmp_path):
+    """Tests that repeated calculations are loaded from the cache"""
+    R_cache = cache.RCache(str(tmp_path))
+    f = np.random.default_rng(2).normal(size=(4, 6))
+    n_calls = _n_calls
+    R = R_cache.evaluate(_counted_maximin, f, maximise=False)
+    assert np.array_equal(R, common_metrics.maximin(f, maximise=False))
+    assert _n_calls == n_calls + 1
+    cached_maximin = R_cache.cached(_counted_maximin)
+    assert np.array_equal(cached_maximin(f, maximise=False), R)
+    assert _n_calls == n_calls + 1
+    # Different arguments or performance values are calculated
+    R_cache.evaluate(_counted_maximin, f, maximise=True)
+    R_cache.evaluate(_counted_maximin, f + 1., maximise=False)
+    assert _n_calls == n_calls + 3
+    R_cache.clear()
+    R_cache.evaluate(_counted_maximin, f, maximise=False)
+    assert _n_calls == n_calls + 4
+
+
+def test_dtype_policy(tmp_path):
+    """Tests that the cache key includes the dtype policy"""
+    R_cache = cache.RCache(str(tmp_path))
+    f = np.random.default_rng(3).normal(size=(4, 6))
+    R = R_cache.evaluate(common_metrics.laplace, f)
+    assert R.dtype == np.float64
+    with dtype_policy(np.float32):
+        R = R_cache.evaluate(common_metrics.laplace, f)
+        assert R.dtype == np.float32
+        assert np.array_equal(R, common_metrics.laplace(f))
+    assert R_cache.evaluate(common_metrics.laplace, f).dtype == np.float64
+
+
+def test_f_to_R_cache(tmp_path):
+    """Tests that cached results are identical to uncached results"""
+    R_cache = cache.RCache(str(tmp_path))
+    prepared = calc.prepare_f_df(_f_df())
+    expected = calc.f_to_R(prepared, _R_dict())
+    for executor in [None, 'thread', None]:
+        R = calc.f_to_R(
+            prepared, _R_dict(), executor=executor, n_workers=2,
+            cache=R_cache)
+        for R_metric in expected:
+            assert np.array_equal(R[R_metric], expected[R_metric])
+    assert len(os.listdir(str(tmp_path))) == len(expected)
+
+
+def test_evict(tmp_path):
+    """Tests that the cache stays within max_bytes"""
+    R_cache = cache.RCache(str(tmp_path), max_bytes=1000)
+    rng = np.random.default_rng(3)
+    for _ in range(10):
+        R_cache.evaluate(common_metrics.laplace, rng.normal(size=(50, 4)))
+    sizes = [
+        os.path.getsize(os.path.join(str(tmp_path), name))
+        for name in os.listdir(str(tmp_path))]
+    assert 0 < sum(sizes) <= 1000
+
+
+def test_describe():
+    """Tests that only reliably described metrics are cached"""
+    assert cache.describe({'b': 1, 'a': 2.}) == cache.describe(
+        {'a': 2., 'b': 1})
+    assert cache.describe(np.arange(3)) != cache.describe(np.arange(1, 4))
+    with pytest.raises(TypeError):
+        cache.describe(lambda f: f)
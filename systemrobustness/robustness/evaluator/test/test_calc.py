@@ -0,0 +1,218 @@
+"""Tests the evaluator calculations"""
+
+import concurrent.futures
+import copy
+import numpy as np
+import pandas as pd
+import pytest
+from .. import calc
+from ...metrics import t1, t2, t3, custom_R_metric, dtype_policy
+from .test_streaming import _R_dict, _f_df
+
+
+def _investment_df():
+    """Returns the investment example performance values"""
+    return pd.DataFrame.from_dict({
+        's_idx': [0, 1, 2, 0, 1, 2, 0, 1, 2],
+        'l_idx': [0, 0, 0, 1, 1, 1, 2, 2, 2],
+        'return': [-4, 4, 12, -2, 3, 8, 3, 2, 1],
+        'critical': [3, 1, 0, 3, 1, 0, 3, 1, 0]})
+
+
+def test_build_f_cube():
+    """Tests the build_f_cube fn"""
+    f_df = pd.DataFrame.from_dict({
+        's_idx': ['wet', 'dry', 'dry', 'wet'],
+        'l_idx': [30, 30, 10, 10],
+        'f': [1.0, 2.0, 3.0, 4.0]})
+    f, s_map, l_map = calc.build_f_cube(f_df, 'f')
+    assert s_map == {'dry': 0, 'wet': 1}
+    assert l_map == {10: 0, 30: 1}
+    expected = np.asarray([
+        [3.0, 4.0],
+        [2.0, 1.0]])
+    assert np.allclose(f, expected)
+
+
+def test_f_to_R_unsorted():
+    """Tests that f_to_R does not depend on the order of rows"""
+    f_df = _investment_df()
+    R_dict = {
+        'Maximin': {
+            'f': 'return',
+            'maximise': True,
+            'threshold': None,
+            'func': custom_R_metric(t1.identity, t2.worst_case, t3.f_mean),
+            'kwargs': {}}}
+    R = calc.f_to_R(f_df, R_dict)
+    shuffled_df = f_df.sample(frac=1.0, random_state=0)
+    R_shuffled = calc.f_to_R(shuffled_df, R_dict)
+    expected = np.asarray(
+        [-4.0, -2.0, 1.0])
+    assert np.allclose(R['Maximin'], expected)
+    assert np.allclose(R_shuffled['Maximin'], expected)
+
+
+def test_get_f_df_details():
+    """Tests the get_f_df_details fn"""
+    f_df = _investment_df()
+    s_idxs, l_idxs = calc.get_f_df_details(f_df)
+    assert np.array_equal(s_idxs, [0, 1, 2])
+    assert np.array_equal(l_idxs, [0, 1, 2])
+    # A missing (s, l) pair
+    with pytest.raises(AssertionError, match='missing'):
+        calc.get_f_df_details(f_df.iloc[1:])
+    # A duplicated (s, l) pair
+    with pytest.raises(AssertionError, match='more than once'):
+        calc.get_f_df_details(pd.concat([f_df, f_df.iloc[:1]]))
+    # Trusted input is not checked
+    s_idxs, l_idxs = calc.get_f_df_details(f_df.iloc[1:], validate=False)
+    assert np.array_equal(s_idxs, [0, 1, 2])
+
+
+def test_prepare_f_df():
+    """Tests f_to_R with prepared performance values"""
+    f_df = _investment_df()
+    prepared = calc.prepare_f_df(f_df)
+    assert prepared.columns == ['return', 'critical']
+    assert prepared.cube.shape == (2, 3, 3)
+    assert prepared.cube.flags['C_CONTIGUOUS']
+    R_dict = {
+        'Starr\'s Domain': {
+            'f': 'return',
+            'maximise': True,
+            'threshold': 'critical',
+            'func': custom_R_metric(t1.satisfice, t2.all_scenarios, t3.f_mean),
+            'kwargs': {}}}
+    R = calc.f_to_R(prepared, R_dict)
+    expected = np.asarray(
+        [2./3., 2./3., 1.])
+    assert np.allclose(R['Starr\'s Domain'], expected)
+    assert np.allclose(
+        calc.f_to_R(f_df, R_dict)['Starr\'s Domain'], expected)
+
+
+def test_prepare_f_df_dtypes():
+    """Tests that each column is converted to floating point"""
+    f_df = _investment_df()
+    f_df['return'] = f_df['return'].astype(np.float32)
+    f_df['failed'] = f_df['return'] < 0.
+    f_df['critical'] = f_df['critical'].astype(np.float64)
+    prepared = calc.prepare_f_df(f_df[['s_idx', 'l_idx', 'failed']])
+    assert prepared.cube.dtype == np.float32
+    prepared = calc.prepare_f_df(f_df, columns=['return', 'failed'])
+    assert prepared.cube.dtype == np.float32
+    assert np.array_equal(
+        prepared['failed'], np.reshape(f_df['failed'], (3, 3)))
+    prepared = calc.prepare_f_df(f_df)
+    assert prepared.cube.dtype == np.float64
+    f_df['critical'] = f_df['critical'].astype('Int64')
+    f_df.loc[0, 'critical'] = pd.NA
+    prepared = calc.prepare_f_df(f_df, columns=['critical'])
+    assert prepared.cube.dtype == np.float64
+    assert np.isnan(prepared['critical'][0, 0])
+    # float32 performance values are not up-cast by float64 thresholds
+    f_df.loc[0, 'critical'] = 3
+    R_dict = {
+        'Starr\'s Domain': {
+            'f': 'return',
+            'maximise': True,
+            'threshold': 'critical',
+            'func': custom_R_metric(t1.satisfice, t2.all_scenarios, t3.f_mean),
+            'kwargs': {}}}
+    R = calc.f_to_R(f_df, R_dict)['Starr\'s Domain']
+    assert R.dtype == np.float32
+    assert np.allclose(R, [2./3., 2./3., 1.])
+
+
+def test_f_to_R_omit_nan():
+    """Tests f_to_R with missing and NaN performance values"""
+    f_df = _investment_df()
+    # Scenario 0 failed for alternative 0, and scenario 2 is missing
+    # for alternative 2
+    f_df.loc[0, 'return'] = np.nan
+    f_df = f_df.drop(index=8)
+    R_dict = {
+        'Laplace': {
+            'f': 'return',
+            'maximise': True,
+            'threshold': None,
+            'func': custom_R_metric(t1.identity, t2.all_scenarios, t3.f_mean),
+            'kwargs': {}}}
+    with pytest.raises(AssertionError, match='missing'):
+        calc.f_to_R(f_df, R_dict)
+    for executor in [None, 'thread']:
+        R, coverage = calc.f_to_R(
+            f_df, R_dict, nan_policy='omit', return_coverage=True,
+            executor=executor)
+        expected = np.asarray(
+            [8.0, 3.0, 2.5])
+        assert np.allclose(R['Laplace'], expected)
+        expected = np.asarray(
+            [2./3., 1.0, 2./3.])
+        assert np.allclose(coverage['Laplace'], expected)
+
+
+def test_f_to_R_reentrant():
+    """Tests that R_dict is not modified, and can be shared by threads"""
+    R_dict = _R_dict()
+    R_dict['Starr\'s Domain']['kwargs'] = {'t1_kwargs': {'accept_equal': False}}
+    original = copy.deepcopy(R_dict)
+    prepared = calc.prepare_f_df(_f_df())
+    expected = calc.f_to_R(prepared, R_dict)
+    for executor in [None, 'thread']:
+        calc.f_to_R(prepared, R_dict, executor=executor, n_workers=2)
+    assert R_dict.keys() == original.keys()
+    for R_metric in R_dict:
+        assert R_dict[R_metric]['kwargs'] == original[R_metric]['kwargs']
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(
+            lambda _: calc.f_to_R(prepared, R_dict), range(8)))
+    for R in results:
+        for R_metric in expected:
+            assert np.array_equal(R[R_metric], expected[R_metric])
+
+
+def test_compact_threshold():
+    """Tests that thresholds are kept in compact broadcastable form"""
+    threshold = np.tile([3., 1., 0.], (4, 1))
+    compact = calc.compact_threshold(threshold, block_size=3)
+    assert compact.shape == (1, 3)
+    assert np.array_equal(np.broadcast_to(compact, (4, 3)), threshold)
+    compact = calc.compact_threshold(threshold.T.copy(), block_size=3)
+    assert compact.shape == (3, 1)
+    assert calc.compact_threshold(np.full((4, 3), 2.)) == 2.
+    threshold[3, 0] = 4.
+    assert calc.compact_threshold(threshold) is threshold
+
+    # The investment example's thresholds depend only on the scenario
+    prepared = calc.prepare_f_df(_investment_df())
+    R_dict = {
+        'Satisficing Regret': {
+            'f': 'return',
+            'maximise': True,
+            'threshold': 'critical',
+            'func': custom_R_metric(
+                t1.satisficing_regret, t2.worst_case, t3.f_mean),
+            'kwargs': {}}}
+    kwargs = calc.metric_kwargs(prepared, R_dict['Satisficing Regret'])
+    assert kwargs['t1_kwargs']['threshold'].shape == (1, 3)
+    expected = np.asarray(
+        [-7.0, -5.0, 0.0])
+    for executor in [None, 'thread']:
+        R = calc.f_to_R(prepared, R_dict, executor=executor, n_workers=2)
+        assert np.allclose(R['Satisficing Regret'], expected)
+
+
+def test_f_to_R_dtype_policy():
+    """Tests that parallel workers use the caller's dtype policy"""
+    prepared = calc.prepare_f_df(_f_df())
+    R_dict = _R_dict()
+    expected = calc.f_to_R(prepared, R_dict)
+    with dtype_policy(np.float32):
+        for executor in [None, 'thread']:
+            R = calc.f_to_R(prepared, R_dict, executor=executor, n_workers=2)
+            for R_metric in R_dict:
+                assert R[R_metric].dtype == np.float32
+                assert np.allclose(
+                    R[R_metric], expected[R_metric], rtol=1e-5, atol=1e-5)
@@ -0,0 +1,61 @@
+"""Tests the memory-mapped cube store"""
+
+import numpy as np
+from .. import calc, cube_store
+from ...metrics import common_metrics
+from .test_streaming import _R_dict, _f_df
+
+
+def test_save_open_cube(tmp_path):
+    """Tests that a saved cube gives the same results as the DataFrame"""
+    path = str(tmp_path / 'f.cube')
+    f_df = _f_df()
+    prepared = calc.prepare_f_df(f_df)
+    cube_store.save_cube(path, f_df)
+    opened = cube_store.open_cube(path)
+    assert isinstance(opened.cube, np.memmap)
+    assert opened.cube.offset % cube_store.ALIGNMENT == 0
+    assert opened.columns == prepared.columns
+    assert np.array_equal(opened.s_idxs, prepared.s_idxs)
+    assert np.array_equal(opened.l_idxs, prepared.l_idxs)
+    assert np.array_equal(opened.cube, prepared.cube)
+
+    expected = calc.f_to_R(prepared, _R_dict())
+    for executor in [None, 'process']:
+        R = calc.f_to_R(
+            opened, _R_dict(), executor=executor, n_workers=2, chunk_size=2)
+        for R_metric in expected:
+            assert np.array_equal(R[R_metric], expected[R_metric])
+            assert not isinstance(R[R_metric], np.memmap)
+
+    # Robustness metrics run on slices of the cube
+    column = prepared.columns[0]
+    assert np.array_equal(
+        common_metrics.laplace(opened[column][1:3]),
+        common_metrics.laplace(prepared[column][1:3]))
+
+    # Each column is converted to floating point
+    f_df['return'] = f_df['return'].astype(np.float32)
+    f_df['failed'] = f_df['cost'] > 0.
+    cube_store.save_cube(path, f_df, columns=['return', 'failed'])
+    opened = cube_store.open_cube(path)
+    assert opened.cube.dtype == np.float32
+    assert np.array_equal(
+        opened['failed'], calc.prepare_f_df(f_df)['failed'])
+
+
+def test_create_cube(tmp_path):
+    """Tests writing a cube in place"""
+    path = str(tmp_path / 'f.cube')
+    prepared = cube_store.create_cube(
+        path, ['f1', 'f2'], ['a', 'b', 'c'], [10, 20], dtype=np.float32)
+    assert np.all(np.isnan(prepared.cube))
+    prepared['f2'][1] = [1., 2., 3.]
+    prepared.cube.flush()
+    del prepared
+    opened = cube_store.open_cube(path)
+    assert opened.cube.dtype == np.dtype('<f4')
+    assert opened.s_idxs.tolist() == ['a', 'b', 'c']
+    assert opened.l_map == {10: 0, 20: 1}
+    assert opened['f2'][1].tolist() == [1., 2., 3.]
+    assert np.all(np.isnan(opened['f1']))
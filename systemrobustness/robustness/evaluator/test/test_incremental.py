@@ -0,0 +1,50 @@
+"""Tests the incremental robustness evaluator"""
+
+import functools
+import numpy as np
+from .. import incremental
+from ...metrics import common_metrics
+
+
+def _check(incremental_R, f, maximise, threshold):
+    """Checks the incremental robustness against common_metrics"""
+    metrics = {
+        'maximin': common_metrics.maximin,
+        'maximax': common_metrics.maximax,
+        'hurwicz': common_metrics.hurwicz,
+        'laplace': common_metrics.laplace,
+        'minimax_regret': common_metrics.minimax_regret,
+        'percentile_regret': common_metrics.percentile_regret,
+        'mean_variance': common_metrics.mean_variance,
+        'undesirable_deviations': common_metrics.undesirable_deviations,
+        'percentile_skew': common_metrics.percentile_skew,
+        'percentile_kurtosis': common_metrics.percentile_kurtosis,
+        'starrs_domain': functools.partial(
+            common_metrics.starrs_domain, threshold=threshold)}
+    assert incremental_R.shape == f.shape
+    for name, metric in metrics.items():
+        R = getattr(incremental_R, name)()
+        expected = metric(f, maximise=maximise)
+        assert np.allclose(R, expected), name
+
+
+def test_incremental_R():
+    """Tests adding scenarios and decision alternatives"""
+    rng = np.random.default_rng(1)
+    for maximise in [True, False]:
+        # Repeated values, so that sorted values are tied
+        f = np.round(rng.normal(size=(4, 5)), 1)
+        incremental_R = incremental.IncrementalR(
+            f, maximise=maximise, threshold=0.2)
+        _check(incremental_R, f, maximise, 0.2)
+        for _ in range(3):
+            new_f = np.round(rng.normal(size=(f.shape[0], 3)), 1)
+            incremental_R.add_scenarios(new_f)
+            f = np.concatenate((f, new_f), axis=1)
+            _check(incremental_R, f, maximise, 0.2)
+            # New decision alternatives that are the best in
+            # some scenarios
+            new_f = np.round(rng.normal(loc=0.5, size=(2, f.shape[1])), 1)
+            incremental_R.add_alternatives(new_f)
+            f = np.concatenate((f, new_f), axis=0)
+            _check(incremental_R, f, maximise, 0.2)
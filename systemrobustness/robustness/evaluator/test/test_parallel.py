@@ -0,0 +1,58 @@
+"""Tests the parallel evaluator"""
+
+import functools
+
+import numpy as np
+from .. import calc
+from ...metrics import common_metrics, custom_R_metric, t1, t2, t3
+from .test_streaming import _R_dict, _f_df
+
+
+def _my_regret(f, maximise=True):
+    """A regret metric that is not known to be calculated in blocks"""
+    return common_metrics.minimax_regret(f, maximise)
+
+
+def test_f_to_R_parallel():
+    """Tests that parallel results are identical to serial results"""
+    prepared = calc.prepare_f_df(_f_df())
+    # Thresholds for each decision alternative
+    threshold = np.linspace(-1., 1., prepared.l_idxs.size)[:, np.newaxis]
+    R_dict = dict(_R_dict(), **{
+        'Starr\'s Domain (kwargs)': {
+            'f': 'return', 'maximise': True, 'threshold': None,
+            'func': common_metrics.starrs_domain,
+            'kwargs': {'threshold': threshold}},
+        'Starr\'s Domain (partial)': {
+            'f': 'return', 'maximise': True, 'threshold': None,
+            'func': functools.partial(
+                common_metrics.starrs_domain, threshold=threshold),
+            'kwargs': {}},
+        'Satisficing regret': {
+            'f': 'cost', 'maximise': False, 'threshold': None,
+            'func': custom_R_metric(
+                t1.satisficing_regret, t2.worst_case, t3.f_mean),
+            'kwargs': {'t1_kwargs': {'threshold': threshold}}}})
+    expected = calc.f_to_R(prepared, R_dict)
+    for executor in ['thread', 'process']:
+        for chunk_size in [None, 1, 3]:
+            R = calc.f_to_R(
+                prepared, R_dict, executor=executor, n_workers=2,
+                chunk_size=chunk_size)
+            for R_metric in expected:
+                assert np.array_equal(R[R_metric], expected[R_metric])
+
+
+def test_unknown_metric():
+    """Tests that metrics that may compare alternatives are not split"""
+    prepared = calc.prepare_f_df(_f_df())
+    R_dict = {'My regret': {
+        'f': 'return', 'maximise': True, 'threshold': None,
+        'func': _my_regret, 'kwargs': {}}}
+    expected = calc.f_to_R(prepared, R_dict)
+    assert not calc.splits_alternatives(_my_regret)
+    for executor in ['thread', 'process']:
+        R = calc.f_to_R(
+            prepared, dict(R_dict, **_R_dict()), executor=executor,
+            n_workers=2, chunk_size=1)
+        assert np.array_equal(R['My regret'], expected['My regret'])
@@ -0,0 +1,73 @@
+"""Tests the streaming evaluator"""
+
+import functools
+import numpy as np
+import pandas as pd
+from .. import calc, streaming
+from ...metrics import t1, t2, t3, custom_R_metric, common_metrics
+
+
+def _R_dict():
+    """Returns robustness metrics, including regret metrics"""
+    return {
+        'Maximin': {
+            'f': 'return',
+            'maximise': True,
+            'threshold': None,
+            'func': custom_R_metric(t1.identity, t2.worst_case, t3.f_mean),
+            'kwargs': {}},
+        'Minimax regret': {
+            'f': 'return',
+            'maximise': True,
+            'threshold': None,
+            'func': custom_R_metric(t1.regret_from_best_da, t2.worst_case, t3.f_mean),
+            'kwargs': {}},
+        'Percentile regret': {
+            'f': 'cost',
+            'maximise': False,
+            'threshold': None,
+            'func': functools.partial(common_metrics.percentile_regret, percentile=0.5),
+            'kwargs': {}},
+        'Starr\'s Domain': {
+            'f': 'return',
+            'maximise': True,
+            'threshold': 'critical',
+            'func': custom_R_metric(t1.satisfice, t2.all_scenarios, t3.f_mean),
+            'kwargs': {}}}
+
+
+def _f_df():
+    """Returns performance values grouped by decision alternative"""
+    rng = np.random.default_rng(0)
+    n_l, n_s = 7, 5
+    return pd.DataFrame.from_dict({
+        's_idx': np.tile(np.arange(n_s), n_l),
+        'l_idx': np.repeat(np.arange(n_l)[::-1] * 10, n_s),
+        'return': rng.normal(size=n_l * n_s),
+        'cost': rng.normal(size=n_l * n_s),
+        'critical': np.tile(rng.normal(size=n_s), n_l),
+        'unused': np.zeros(n_l * n_s)})
+
+
+def test_f_to_R_streaming(tmp_path):
+    """Tests the f_to_R_streaming fn"""
+    f_df = _f_df()
+    expected = calc.f_to_R(f_df, _R_dict())
+    path = str(tmp_path / 'f.csv')
+    f_df.to_csv(path, index=False)
+    for source in [f_df, path]:
+        for chunk_size, batch_rows in [(1, 2), (3, 7), (100, 1000)]:
+            R = streaming.f_to_R_streaming(
+                source, _R_dict(), chunk_size=chunk_size,
+                batch_rows=batch_rows)
+            for R_metric in expected:
+                assert np.allclose(R[R_metric], expected[R_metric])
+
+
+def test_needs_best_f():
+    """Tests the needs_best_f fn"""
+    R_dict = _R_dict()
+    assert not calc.needs_best_f(R_dict['Maximin']['func'])
+    assert calc.needs_best_f(R_dict['Minimax regret']['func'])
+    assert calc.needs_best_f(R_dict['Percentile regret']['func'])
+    assert calc.needs_best_f(common_metrics.minimax_regret)
@@ -13,3 +13,16 @@ from .common_metrics import (
     starrs_domain)
 from .custom_metrics import custom_R_metric, guidance_to_R
 from .transforms import t1, t2, t3
+from .transforms.workspace import Workspace
+from .transforms.order_stats import SortedF
+from .transforms.sketch import QuantileSketch
+from .transforms.moments import Moments
+from .transforms.precision import dtype_policy
+from .fused import use_backend
+from .sketch_metrics import sketch_R
+from .classic_metrics import classic_R
+from .sweeps import (
+    hurwicz_sweep,
+    percentile_regret_sweep,
+    starrs_domain_sweep,
+    reliability_curve)
@@ -0,0 +1,213 @@
+"""Calculates several of the common robustness metrics at once.
+
+Calling each function of `common_metrics` on the same performance values
+repeats their shared work: each transforms f (T1) separately, and the
+percentile and worst-half metrics each sort f again. `classic_R`
+calculates any of the common metrics from one shared pass, with:
+    - f negated (if minimising) and its regret from the best decision
+      alternative found once;
+    - each decision alternative's values sorted once (a `SortedF`), for
+      the median, percentiles and worst half, and the worst- and
+      best-cases selected from them;
+    - the moments of f found once (a `Moments`), for the mean and
+      standard deviation.
+The robustness values are identical to those of `common_metrics`, up to
+floating point rounding.
+"""
+
+import numpy as np
+
+from . import common_metrics
+from .transforms import namespace, t1, t2, t3
+from .transforms.moments import Moments
+from .transforms.order_stats import SortedF
+
+# The metrics calculated by classic_R, in their default order
+CLASSIC_METRICS = [
+    'maximin',
+    'maximax',
+    'hurwicz',
+    'laplace',
+    'minimax_regret',
+    'percentile_regret',
+    'mean_variance',
+    'undesirable_deviations',
+    'percentile_skew',
+    'percentile_kurtosis',
+    'starrs_domain']
+
+# The metrics using the worst- and best-cases, the sorted values and the
+# regret
+_EXTREME_METRICS = ['maximin', 'maximax', 'hurwicz']
+_SORTED_METRICS = [
+    'undesirable_deviations', 'percentile_skew', 'percentile_kurtosis']
+_REGRET_METRICS = ['minimax_regret', 'percentile_regret']
+
+
+def classic_R(
+        f,
+        metrics=None,
+        maximise=True,
+        alpha=0.5,
+        percentile=0.1,
+        best_f=None,
+        threshold=0.0,
+        accept_equal=True,
+        nan_policy='propagate',
+        axis=-1):
+    """Calculates common robustness metrics from one shared pass over f.
+
+    Parameters
+    ----------
+    f : numpy.ndarray, shape=(..., m, n)
+        Performance values, f, for m decision alternatives
+        and n scenarios.
+    metrics : list of str, optional
+        The names of the metrics to calculate, from `CLASSIC_METRICS`
+        (the functions of `common_metrics`).
+        (The default is None, which calculates all of them).
+    maximise : bool, optional
+        Is the performance metric to be maximised or minimised.
+        (The default is True, which implies high values of f are better
+        than low values of f).
+    alpha : float, optional
+        The weight of the worst-case for 'hurwicz'.
+        (The default is 0.5).
+    percentile : float, optional
+        The percentile of the regret for 'percentile_regret'.
+        (The default is 0.1).
+    best_f : np.ndarray, shape=(..., n), optional
+        The best performance value in each scenario for
+        'minimax_regret' and 'percentile_regret' (see
+        `t1.regret_from_best_da`).
+        (The default is None, which uses the best of the m decision
+        alternatives in f).
+    threshold : float or np.ndarray, optional
+        The threshold for 'starrs_domain' (see `t1.satisfice`).
+        (The default is 0.0).
+    accept_equal : bool, optional
+        Whether a value equal to the threshold is satisficed for
+        'starrs_domain'.
+        (The default is True).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the values that are not NaN).
+    axis : int, optional
+        The axis of f that is the scenarios (see
+        `common_metrics.maximin`).
+        (The default is -1).
+
+    Returns
+    -------
+    numpy.ndarray, shape=(..., m, k)
+        The value of each of the k metrics for each of the m decision
+        alternatives, in the order of `metrics`
+
+    Examples
+    --------
+    >>> R = classic_R(f, ['maximin', 'laplace', 'percentile_skew'])
+    >>> R_maximin = R[:, 0]
+    """
+    if metrics is None:
+        metrics = CLASSIC_METRICS
+    unknown = [name for name in metrics if name not in CLASSIC_METRICS]
+    assert not unknown, 'Unknown metrics: {}'.format(unknown)
+    kwargs = {
+        'hurwicz': {'alpha': alpha},
+        'minimax_regret': {'best_f': best_f},
+        'percentile_regret': {'percentile': percentile, 'best_f': best_f},
+        'starrs_domain': {
+            'threshold': threshold, 'accept_equal': accept_equal},
+    }
+    f = common_metrics._scenarios_last(f, axis)
+    xp = namespace.array_namespace(f)
+    if xp is not np:
+        # SortedF and Moments hold NumPy arrays
+        return xp.stack([
+            getattr(common_metrics, name)(
+                f, maximise=maximise, nan_policy=nan_policy,
+                **kwargs.get(name, {}))
+            for name in metrics], axis=-1)
+    # The performance values, to be maximised
+    _f = t1.identity(f, maximise=maximise)
+    batch_shape = _f.shape[:-1]
+    n = _f.shape[-1]
+    calculated = {}
+    # The batches of decision alternatives as one
+    _f_rows = np.reshape(_f, (-1, n))
+    if any(name in metrics for name in _SORTED_METRICS):
+        _f_rows = SortedF(_f_rows, values=np.sort(_f_rows, axis=1))
+        calculated.update(_from_sorted(_f_rows, metrics, nan_policy))
+    if any(name in metrics for name in _EXTREME_METRICS):
+        # Selected from the sorted values, if sorted
+        calculated.update(_from_extremes(_f_rows, alpha, nan_policy))
+    if any(name in metrics for name in _REGRET_METRICS):
+        regret = t1.regret_from_best_da(
+            f, maximise=maximise, best_f=best_f, nan_policy=nan_policy)
+        calculated.update(_from_regret(
+            np.reshape(regret, (-1, n)), metrics, percentile, nan_policy))
+    if 'laplace' in metrics or 'mean_variance' in metrics:
+        moments = Moments.from_f(_f, nan_policy=nan_policy)
+        calculated['laplace'] = t3.f_mean(moments)
+        calculated['mean_variance'] = t3.f_mean_variance(moments)
+    if 'starrs_domain' in metrics:
+        calculated['starrs_domain'] = common_metrics.starrs_domain(
+            f, maximise=maximise, threshold=threshold,
+            accept_equal=accept_equal, nan_policy=nan_policy)
+    return np.stack(
+        [np.reshape(calculated[name], batch_shape) for name in metrics],
+        axis=-1)
+
+
+def _from_extremes(_f, alpha, nan_policy):
+    """Calculates the metrics using the worst- and best-cases"""
+    worst_f = t2.worst_case(_f, nan_policy=nan_policy)
+    best_f = t2.best_case(_f, nan_policy=nan_policy)
+    return {
+        'maximin': t3.f_sum(worst_f, nan_policy=nan_policy),
+        'maximax': t3.f_sum(best_f, nan_policy=nan_policy),
+        'hurwicz': t3.f_w_sum(
+            np.concatenate((worst_f, best_f), axis=-1),
+            weights=np.asarray([alpha, 1. - alpha]),
+            nan_policy=nan_policy),
+    }
+
+
+def _from_sorted(sorted_f, metrics, nan_policy):
+    """Calculates the metrics using the sorted performance values"""
+    R = {}
+    if 'undesirable_deviations' in metrics:
+        # The regret from the median of only the worst half of the values
+        median_f = sorted_f.median(nan_policy=nan_policy)
+        _f = t2.worst_half(sorted_f, nan_policy=nan_policy)
+        R['undesirable_deviations'] = t3.f_sum(
+            _f - median_f[:, np.newaxis], nan_policy=nan_policy)
+    if 'percentile_skew' in metrics:
+        R['percentile_skew'] = t3.f_skew(t2.select_percentiles(
+            sorted_f, common_metrics.SKEW_PERCENTILES, nan_policy=nan_policy))
+    if 'percentile_kurtosis' in metrics:
+        R['percentile_kurtosis'] = t3.f_kurtosis(t2.select_percentiles(
+            sorted_f, common_metrics.KURTOSIS_PERCENTILES,
+            nan_policy=nan_policy))
+    return R
+
+
+def _from_regret(regret, metrics, percentile, nan_policy):
+    """Calculates the metrics using the regret from the best alternative"""
+    R = {}
+    if 'percentile_regret' not in metrics:
+        R['minimax_regret'] = t3.f_sum(
+            t2.worst_case(regret, nan_policy=nan_policy),
+            nan_policy=nan_policy)
+        return R
+    # Sorted in place (so its original order is not kept), as the regret
+    # is not used again
+    regret.sort(axis=1)
+    sorted_regret = SortedF(regret, values=regret)
+    R['minimax_regret'] = sorted_regret.minimum(nan_policy=nan_policy)
+    R['percentile_regret'] = t3.f_sum(t2.select_percentiles(
+        sorted_regret, np.asarray([percentile]), nan_policy=nan_policy),
+        nan_policy=nan_policy)
+    return R
@@ -7,14 +7,31 @@ Castelletti, A., & Westra, S. (2018).
 Robustness metrics: How are they calculated, when should they be used
 and why do they give different results?. Earth's Future, 6(2), 169-191.
 https://doi.org/10.1002/2017EF000649
+
+The classic metrics use single-pass fused kernels if Numba is installed
+(see `fused`), and otherwise chain the T1, T2 and T3 transformations.
+The transformations also calculate robustness from the arrays of other
+libraries supporting the array API standard (see
+`transforms.namespace`), without converting them to NumPy arrays.
 """
 
 import numpy as np
 
-from .transforms import t1, t2, t3
+from . import fused
+from .transforms import namespace, t1, t2, t3
+
+# The percentiles used by percentile_skew and percentile_kurtosis
+SKEW_PERCENTILES = np.asarray([0.1, 0.5, 0.9])
+KURTOSIS_PERCENTILES = np.asarray([0.1, 0.25, 0.75, 0.9])
 
 
-def maximin(f, maximise=True):
+def maximin(
+        f,
+        maximise=True,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        return_index=False):
     """Maximin metric (worst-case scenario)
 
     The maximin (minimax) metric was first used by Wald (1950).
@@ -27,26 +44,63 @@ def maximin(f, maximise=True):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    return_index : bool, optional
+        Whether to also return the scenarios of the performance values
+        that robustness is calculated from (see `t2.worst_case`).
+        (The default is False).
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
+    numpy.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each decision alternative's worst-case
+        (n' = 1), only if `return_index`
     """
-    _f = t1.identity(f, maximise=maximise)
-    _f = t2.worst_case(_f)
-    R = t3.f_sum(_f)
-    return R
+    f = _scenarios_last(f, axis)
+    if not return_index and fused.applies(f, nan_policy, workspace):
+        return fused.maximin(f, maximise=maximise)
+    _f = t1.identity(
+        f,
+        maximise=maximise,
+        nan_policy=nan_policy,
+        out=_buffer(workspace, f, needed=not maximise))
+    _f = t2.worst_case(_f, nan_policy=nan_policy, return_index=return_index)
+    if return_index:
+        _f, scenarios = _f
+    R = t3.f_sum(_f, nan_policy=nan_policy)
+    return (R, scenarios) if return_index else R
 
 
-def maximax(f, maximise=True):
+def maximax(
+        f,
+        maximise=True,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        return_index=False):
     """Maximax metric (best-case scenario)
 
     Maximax is the opposite of the maximin metric (Wald, 1950). It
@@ -59,26 +113,64 @@ def maximax(f, maximise=True):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    return_index : bool, optional
+        Whether to also return the scenarios of the performance values
+        that robustness is calculated from (see `t2.best_case`).
+        (The default is False).
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
+    numpy.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each decision alternative's best-case
+        (n' = 1), only if `return_index`
     """
-    _f = t1.identity(f, maximise=maximise)
-    _f = t2.best_case(_f)
-    R = t3.f_sum(_f)
-    return R
+    f = _scenarios_last(f, axis)
+    if not return_index and fused.applies(f, nan_policy, workspace):
+        return fused.maximax(f, maximise=maximise)
+    _f = t1.identity(
+        f,
+        maximise=maximise,
+        nan_policy=nan_policy,
+        out=_buffer(workspace, f, needed=not maximise))
+    _f = t2.best_case(_f, nan_policy=nan_policy, return_index=return_index)
+    if return_index:
+        _f, scenarios = _f
+    R = t3.f_sum(_f, nan_policy=nan_policy)
+    return (R, scenarios) if return_index else R
 
 
-def hurwicz(f, maximise=True, alpha=0.5):
+def hurwicz(
+        f,
+        maximise=True,
+        alpha=0.5,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        return_index=False):
     """Hurwicz's Optimism-Pessimism Rule
 
     Hurwicz’s optimism-pessimism rule (Hurwicz, 1953) uses a weighted
@@ -100,7 +192,7 @@ def hurwicz(f, maximise=True, alpha=0.5):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
@@ -111,21 +203,59 @@ def hurwicz(f, maximise=True, alpha=0.5):
         The weighting to place on the worst-case scenario.
         (The default is 0.5, which implies an equal weighting of the
         best- and worst-case scenarios).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    return_index : bool, optional
+        Whether to also return the scenarios of the performance values
+        that robustness is calculated from (see `t2.worst_and_best_cases`).
+        (The default is False).
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
+    numpy.ndarray, shape=(..., m, n'), dtype=int
+        The scenarios of each decision alternative's worst- and
+        best-cases (n' = 2), only if `return_index`
     """
+    f = _scenarios_last(f, axis)
+    if not return_index and fused.applies(f, nan_policy, workspace):
+        return fused.hurwicz(f, maximise=maximise, alpha=alpha)
     # Define the weights for the worst- and best-cases.
     weights = np.asarray([alpha, 1. - alpha])
-    _f = t1.identity(f, maximise=maximise)
-    _f = t2.worst_and_best_cases(_f)
-    R = t3.f_w_sum(_f, weights=weights)
-    return R
+    _f = t1.identity(
+        f,
+        maximise=maximise,
+        nan_policy=nan_policy,
+        out=_buffer(workspace, f, needed=not maximise))
+    _f = t2.worst_and_best_cases(
+        _f, nan_policy=nan_policy, return_index=return_index)
+    if return_index:
+        _f, scenarios = _f
+    R = t3.f_w_sum(_f, weights=weights, nan_policy=nan_policy)
+    return (R, scenarios) if return_index else R
 
 
-def laplace(f, maximise=True):
+def laplace(
+        f,
+        maximise=True,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        weights=None):
     """Laplace's Principle of Insufficient Reason
 
     Laplace’s principle of insufficient reason
@@ -143,26 +273,60 @@ def laplace(f, maximise=True):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    weights : np.ndarray, shape=(n, ), optional
+        The probability (or relative frequency) of each scenario, e.g.
+        from `t2.compress_scenarios`.
+        (The default is None, which treats the scenarios as equally
+        likely).
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
-    _f = t1.identity(f, maximise=maximise)
-    _f = t2.all_scenarios(_f)
-    R = t3.f_mean(_f)
+    f = _scenarios_last(f, axis)
+    if weights is None and fused.applies(f, nan_policy, workspace):
+        return fused.laplace(f, maximise=maximise)
+    _f = t1.identity(
+        f,
+        maximise=maximise,
+        nan_policy=nan_policy,
+        out=_buffer(workspace, f, needed=not maximise))
+    _f = t2.all_scenarios(_f, nan_policy=nan_policy)
+    R = t3.f_mean(_f, nan_policy=nan_policy, weights=weights)
     return R
 
 
-def minimax_regret(f, maximise=True):
+def minimax_regret(
+        f,
+        maximise=True,
+        best_f=None,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        return_index=False):
     """Minimax Regret metric
 
     Rather than looking at individual decision alternatives, regret
@@ -186,26 +350,73 @@ def minimax_regret(f, maximise=True):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    best_f : numpy.ndarray, shape=(..., n), optional
+        The best performance value in each scenario across all decision
+        alternatives (see `t1.regret_from_best_da`).
+        (The default is None, which uses the best of the m decision
+        alternatives in f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    return_index : bool, optional
+        Whether to also return the scenarios of the performance values
+        that robustness is calculated from (see `t2.worst_case`).
+        (The default is False).
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
+    numpy.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each decision alternative's greatest regret
+        (n' = 1), only if `return_index`
     """
-    _f = t1.regret_from_best_da(f, maximise=maximise)
-    _f = t2.worst_case(_f)
-    R = t3.f_sum(_f)
-    return R
+    f = _scenarios_last(f, axis)
+    if not return_index and fused.applies(f, nan_policy, workspace):
+        return fused.minimax_regret(f, maximise=maximise, best_f=best_f)
+    _f = t1.regret_from_best_da(
+        f,
+        maximise=maximise,
+        best_f=best_f,
+        nan_policy=nan_policy,
+        out=_buffer(workspace, f))
+    _f = t2.worst_case(_f, nan_policy=nan_policy, return_index=return_index)
+    if return_index:
+        _f, scenarios = _f
+    R = t3.f_sum(_f, nan_policy=nan_policy)
+    return (R, scenarios) if return_index else R
 
 
-def percentile_regret(f, maximise=True, percentile=0.1):
+def percentile_regret(
+        f,
+        maximise=True,
+        percentile=0.1,
+        best_f=None,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        weights=None,
+        return_index=False,
+        weights_kind='probability'):
     """percentile regret metric
 
     This is derived from the 90th percentile minimax regret metric
@@ -230,7 +441,7 @@ def percentile_regret(f, maximise=True, percentile=0.1):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
@@ -242,19 +453,82 @@ def percentile_regret(f, maximise=True, percentile=0.1):
         (The default is 0.1, which implies the use of the 10th
         percentile. That is the f value at which only 10% of f values
         (for a decision alternative) are worse).
+    best_f : numpy.ndarray, shape=(..., n), optional
+        The best performance value in each scenario across all decision
+        alternatives (see `t1.regret_from_best_da`).
+        (The default is None, which uses the best of the m decision
+        alternatives in f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    weights : np.ndarray, shape=(n, ), optional
+        The weight of each scenario, e.g. from `t2.compress_scenarios`
+        (see `weights_kind`).
+        (The default is None, which treats the scenarios as equally
+        likely).
+    return_index : bool, optional
+        Whether to also return the scenarios of the performance values
+        that robustness is calculated from (see `t2.select_percentiles`).
+        (The default is False).
+    weights_kind : {'probability', 'frequency'}, optional
+        Whether the weights are probabilities (or relative
+        frequencies), or the number of times each scenario occurs, e.g.
+        from `t2.compress_scenarios` (see `order_stats.frequencies`).
+        (The default is 'probability').
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
+    numpy.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each decision alternative's percentile of
+        regret (n' = 1), only if `return_index`
     """
-    _f = t1.regret_from_best_da(f, maximise=maximise)
-    _f = t2.select_percentiles(_f, np.asarray([percentile]))
-    R = t3.f_sum(_f)
-    return R
-
-
-def mean_variance(f, maximise=True):
+    f = _scenarios_last(f, axis)
+    if (weights is None and not return_index
+            and fused.applies(f, nan_policy, workspace)):
+        return fused.percentile_regret(
+            f, maximise=maximise, percentile=percentile, best_f=best_f)
+    _f = t1.regret_from_best_da(
+        f,
+        maximise=maximise,
+        best_f=best_f,
+        nan_policy=nan_policy,
+        out=_buffer(workspace, f))
+    _f = t2.select_percentiles(
+        _f,
+        np.asarray([percentile]),
+        nan_policy=nan_policy,
+        overwrite_input=workspace is not None,
+        weights=weights,
+        weights_kind=weights_kind,
+        return_index=return_index)
+    if return_index:
+        _f, scenarios = _f
+    R = t3.f_sum(_f, nan_policy=nan_policy)
+    return (R, scenarios) if return_index else R
+
+
+def mean_variance(
+        f,
+        maximise=True,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        weights=None,
+        weights_kind='probability'):
     """Mean-variance metric
 
     The mean-variance metric (Kwakkel et al., 2016b) is similar to
@@ -275,26 +549,65 @@ def mean_variance(f, maximise=True):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    weights : np.ndarray, shape=(n, ), optional
+        The weight of each scenario, e.g. from `t2.compress_scenarios`
+        (see `weights_kind`).
+        (The default is None, which treats the scenarios as equally
+        likely).
+    weights_kind : {'probability', 'frequency'}, optional
+        Whether the weights are probabilities (or relative
+        frequencies), or the number of times each scenario occurs, e.g.
+        from `t2.compress_scenarios` (see `order_stats.frequencies`).
+        (The default is 'probability').
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
-    _f = t1.identity(f, maximise=maximise)
-    _f = t2.all_scenarios(_f)
-    R = t3.f_mean_variance(_f)
+    f = _scenarios_last(f, axis)
+    if weights is None and fused.applies(f, nan_policy, workspace):
+        return fused.mean_variance(f, maximise=maximise)
+    _f = t1.identity(
+        f,
+        maximise=maximise,
+        nan_policy=nan_policy,
+        out=_buffer(workspace, f, needed=not maximise))
+    _f = t2.all_scenarios(_f, nan_policy=nan_policy)
+    R = t3.f_mean_variance(
+        _f, nan_policy=nan_policy, weights=weights, weights_kind=weights_kind)
     return R
 
 
-def undesirable_deviations(f, maximise=True):
+def undesirable_deviations(
+        f,
+        maximise=True,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        return_index=False):
     """Undesirable deviations metric
 
     The undesirable deviations metric (Kwakkel et al., 2016b) is a
@@ -308,28 +621,67 @@ def undesirable_deviations(f, maximise=True):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    return_index : bool, optional
+        Whether to also return the scenarios of the performance values
+        that robustness is calculated from (see `t2.worst_half`).
+        (The default is False).
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
+    numpy.ndarray, shape=(..., m, n'), dtype=int
+        The scenarios of each decision alternative's worst half of
+        regret (see `t2.worst_half`), only if `return_index`
     """
+    f = _scenarios_last(f, axis)
     # Do identity first, before regret, so that correct percentiles
     # can be determined.
-    _f = t1.regret_from_median(f, maximise=maximise)
-    _f = t2.worst_half(_f)
-    R = t3.f_sum(_f)
-    return R
-
-
-def percentile_skew(f, maximise=True):
+    _f = t1.regret_from_median(
+        f,
+        maximise=maximise,
+        nan_policy=nan_policy,
+        out=_buffer(workspace, f))
+    _f = t2.worst_half(
+        _f, nan_policy=nan_policy, overwrite_input=workspace is not None,
+        return_index=return_index)
+    if return_index:
+        _f, scenarios = _f
+    R = t3.f_sum(_f, nan_policy=nan_policy)
+    return (R, scenarios) if return_index else R
+
+
+def percentile_skew(
+        f,
+        maximise=True,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        weights=None,
+        return_index=False,
+        weights_kind='probability'):
     """A calculation of skew based on percentiles
 
     The percentile-based skewness metric (Voudouris et al., 2014)
@@ -343,29 +695,79 @@ def percentile_skew(f, maximise=True):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    weights : np.ndarray, shape=(n, ), optional
+        The weight of each scenario, e.g. from `t2.compress_scenarios`
+        (see `weights_kind`).
+        (The default is None, which treats the scenarios as equally
+        likely).
+    return_index : bool, optional
+        Whether to also return the scenarios of the performance values
+        that robustness is calculated from (see `t2.select_percentiles`).
+        (The default is False).
+    weights_kind : {'probability', 'frequency'}, optional
+        Whether the weights are probabilities (or relative
+        frequencies), or the number of times each scenario occurs, e.g.
+        from `t2.compress_scenarios` (see `order_stats.frequencies`).
+        (The default is 'probability').
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
+    numpy.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each of the 10th, 50th and 90th
+        percentiles (n' = 3), only if `return_index`
     """
-    _f = t1.identity(f, maximise=maximise)
+    f = _scenarios_last(f, axis)
+    _f = t1.identity(
+        f, maximise=maximise, nan_policy=nan_policy, out=_buffer(workspace, f))
     # This calculation of skew relies on the 10th, 50th and 90th
     # percentiles.
-    percentiles = np.asarray([0.1, 0.5, 0.9])
-    _f = t2.select_percentiles(_f, percentiles)
-    R = t3.f_skew(_f)
-    return R
-
-
-def percentile_kurtosis(f, maximise=True):
+    _f = t2.select_percentiles(
+        _f,
+        SKEW_PERCENTILES,
+        nan_policy=nan_policy,
+        overwrite_input=workspace is not None,
+        weights=weights,
+        weights_kind=weights_kind,
+        return_index=return_index)
+    if return_index:
+        _f, scenarios = _f
+    R = t3.f_skew(_f, nan_policy=nan_policy)
+    return (R, scenarios) if return_index else R
+
+
+def percentile_kurtosis(
+        f,
+        maximise=True,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        weights=None,
+        return_index=False,
+        weights_kind='probability'):
     """A calculation of kurtosis based on percentiles
 
     A variation of Kurtosis was applied by Voudouris et al. (2014) to
@@ -380,29 +782,79 @@ def percentile_kurtosis(f, maximise=True):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    weights : np.ndarray, shape=(n, ), optional
+        The weight of each scenario, e.g. from `t2.compress_scenarios`
+        (see `weights_kind`).
+        (The default is None, which treats the scenarios as equally
+        likely).
+    return_index : bool, optional
+        Whether to also return the scenarios of the performance values
+        that robustness is calculated from (see `t2.select_percentiles`).
+        (The default is False).
+    weights_kind : {'probability', 'frequency'}, optional
+        Whether the weights are probabilities (or relative
+        frequencies), or the number of times each scenario occurs, e.g.
+        from `t2.compress_scenarios` (see `order_stats.frequencies`).
+        (The default is 'probability').
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
+    numpy.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each of the 10th, 25th, 75th and 90th
+        percentiles (n' = 4), only if `return_index`
     """
-    _f = t1.identity(f, maximise=maximise)
+    f = _scenarios_last(f, axis)
+    _f = t1.identity(
+        f, maximise=maximise, nan_policy=nan_policy, out=_buffer(workspace, f))
     # This calculation of skew relies on the 10th, 50th and 90th
     # percentiles.
-    percentiles = np.asarray([0.1, 0.25, 0.75, 0.9])
-    _f = t2.select_percentiles(_f, percentiles)
-    R = t3.f_kurtosis(_f)
-    return R
-
-
-def starrs_domain(f, maximise=True, threshold=0.0, accept_equal=True):
+    _f = t2.select_percentiles(
+        _f,
+        KURTOSIS_PERCENTILES,
+        nan_policy=nan_policy,
+        overwrite_input=workspace is not None,
+        weights=weights,
+        weights_kind=weights_kind,
+        return_index=return_index)
+    if return_index:
+        _f, scenarios = _f
+    R = t3.f_kurtosis(_f, nan_policy=nan_policy)
+    return (R, scenarios) if return_index else R
+
+
+def starrs_domain(
+        f,
+        maximise=True,
+        threshold=0.0,
+        accept_equal=True,
+        nan_policy='propagate',
+        workspace=None,
+        axis=-1,
+        weights=None):
     """Robustness based on proportion of scenarios meeting a threshold
 
     Unlike previous metrics, Starr’s domain criterion (Starr, 1963;
@@ -417,32 +869,87 @@ def starrs_domain(f, maximise=True, threshold=0.0, accept_equal=True):
 
     Parameters
     ----------
-    f : numpy.ndarray, shape=(m, n)
+    f : numpy.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool, optional
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
-    threshold : float, optional
-        A minimum value where f >= threshold to be satisficed
+    threshold : float or numpy.ndarray, optional
+        A minimum value where f >= threshold to be satisficed.
+        Can be an array of shape (n, ) or (1, n) for a value for each
+        scenario, or (m, 1) for each decision alternative
+        (see `t1.satisfice`).
         (The default is 0.0, which implies that any f value above 0 is
         of satisfactory performance).
     accept_equal : bool, optional
         Whether or not an f value equal to the threshold is acceptable.
         (The default is True, which implies a >= comparison, whereas
         False would imply a > comparison).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which counts NaN values as not
+        meeting the threshold. 'omit' calculates robustness from the
+        scenarios that are not NaN).
+    workspace : Workspace, optional
+        Reusable buffers for the transformed performance values
+        (see `Workspace`).
+        (The default is None, which allocates new arrays).
+    axis : int, optional
+        The axis of f that is the scenarios. The decision alternatives
+        are the last of the other axes, and any axes before them are
+        batch axes, e.g. f of shape (k, m, n) gives robustness of
+        shape (k, m) for k sets of scenarios or performance metrics.
+        (The default is -1).
+    weights : np.ndarray, shape=(n, ), optional
+        The probability (or relative frequency) of each scenario, e.g.
+        from `t2.compress_scenarios`.
+        (The default is None, which treats the scenarios as equally
+        likely).
 
     Returns
     -------
-    numpy.ndarray, shape=(m, )
+    numpy.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
+    f = _scenarios_last(f, axis)
+    if weights is None and fused.applies(f, nan_policy, workspace):
+        return fused.starrs_domain(
+            f,
+            maximise=maximise,
+            threshold=threshold,
+            accept_equal=accept_equal)
     _f = t1.satisfice(
         f,
         maximise=maximise,
         threshold=threshold,
-        accept_equal=accept_equal)
-    _f = t2.all_scenarios(_f)
-    R = t3.f_mean(_f)
+        accept_equal=accept_equal,
+        nan_policy=nan_policy,
+        out=_buffer(workspace, f))
+    _f = t2.all_scenarios(_f, nan_policy=nan_policy)
+    R = t3.f_mean(_f, nan_policy=nan_policy, weights=weights)
     return R
+
+
+def _buffer(workspace, f, needed=True):
+    """Gets the workspace buffer for the transformed values of f.
+
+    Returns None (i.e. a new array is allocated if needed) if there is
+    no workspace, or if the transformation does not need a new array.
+    Workspaces hold NumPy arrays, so other libraries' arrays are always
+    transformed to a new array.
+    """
+    if (workspace is None or not needed
+            or namespace.array_namespace(f) is not np):
+        return None
+    return workspace.f_buffer(f)
+
+
+def _scenarios_last(f, axis):
+    """Moves the scenario axis of f to the end, as the transforms expect"""
+    xp = namespace.array_namespace(f)
+    ndim = f.ndim if xp is not np else np.ndim(f)
+    if axis in [-1, ndim - 1]:
+        return f
+    return namespace.moveaxis(xp, f, axis, -1)
@@ -5,7 +5,11 @@ TODO
 
 """
 
-from .transforms import t1, t2, t3
+import functools
+import inspect
+import numpy as np
+
+from .transforms import namespace, t1, t2, t3
 
 
 class custom_R_metric:
@@ -25,12 +29,15 @@ class custom_R_metric:
             maximise=True,
             t1_kwargs=None,
             t2_kwargs=None,
-            t3_kwargs=None):
+            t3_kwargs=None,
+            nan_policy='propagate',
+            workspace=None,
+            axis=-1):
         """Calculate robustness from given values
 
         Parameters
         ----------
-        f : numpy.ndarray, shape=(m, n)
+        f : numpy.ndarray, shape=(..., m, n)
             Performance values, f, for m decision alternatives
             and n scenarios.
         maximise : bool, optional
@@ -39,29 +46,74 @@ class custom_R_metric:
             than low values of f).
         t1_kwargs, t2_kwargs, t3_kwargs : dict, optional
             The keyword arguments required for these transfromations
+        nan_policy : {'propagate', 'omit'}, optional
+            How to handle NaN values in f (e.g. failed simulations).
+            (The default is 'propagate', which leaves NaN handling to
+            the transformations. 'omit' is passed to each
+            transformation, to calculate robustness from the scenarios
+            that are not NaN).
+        workspace : Workspace, optional
+            Reusable buffers for the transformed performance values.
+            The transformed values are written to a buffer if the T1
+            transformation accepts `out`, and sorted in place if the
+            T2 transformation accepts `overwrite_input`.
+            (The default is None, which allocates new arrays).
+        axis : int, optional
+            The axis of f that is the scenarios. The decision
+            alternatives are the last of the other axes, and any axes
+            before them are batch axes, e.g. f of shape (k, m, n) gives
+            robustness of shape (k, m).
+            (The default is -1).
 
         Returns
         -------
-        numpy.ndarray, shape=(m, ) OR float if m=1
+        numpy.ndarray, shape=(..., m) OR float if f is (1, n)
             The robustness value for each of the m decision alternatives
         """
+        xp = namespace.array_namespace(f)
+        if axis not in [-1, (f.ndim if xp is not np else np.ndim(f)) - 1]:
+            f = namespace.moveaxis(xp, f, axis, -1)
         if t1_kwargs is None:
             t1_kwargs = {}
         if t2_kwargs is None:
             t2_kwargs = {}
         if t3_kwargs is None:
             t3_kwargs = {}
+        if nan_policy != 'propagate':
+            t1_kwargs = dict(t1_kwargs, nan_policy=nan_policy)
+            t2_kwargs = dict(t2_kwargs, nan_policy=nan_policy)
+            t3_kwargs = dict(t3_kwargs, nan_policy=nan_policy)
+        if (workspace is not None and xp is np
+                and _accepts(self.t1_func, 'out')):
+            t1_kwargs = dict(t1_kwargs, out=workspace.f_buffer(f))
+            if _accepts(self.t2_func, 'overwrite_input'):
+                t2_kwargs = dict(t2_kwargs, overwrite_input=True)
         transformed_f = self.t1_func(f, maximise=maximise, **t1_kwargs)
         selected_f = self.t2_func(transformed_f, **t2_kwargs)
         R = self.t3_func(selected_f, **t3_kwargs)
-        if R.shape[0] == 1:
+        if 'out' in t1_kwargs and np.shares_memory(R, t1_kwargs['out']):
+            # Don't return a view of the workspace, which is reused
+            R = np.array(R)
+        if R.ndim == 1 and R.shape[0] == 1:
             R = R[0]
         return R
 
 
+def _accepts(func, name):
+    """Checks whether func accepts a keyword argument"""
+    while isinstance(func, functools.partial):
+        func = func.func
+    try:
+        parameters = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+    return name in parameters
+
+
 def callable_transformation(transformation, kwargs):
     """Allows kwargs to be given to transformation before calling it."""
-    func = lambda f: transformation(f, **kwargs)
+    func = lambda f, **extra_kwargs: transformation(
+        f, **kwargs, **extra_kwargs)
     return func
 
 
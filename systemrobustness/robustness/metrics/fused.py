@@ -0,0 +1,305 @@
+"""Contains fused kernels for the classic robustness metrics.
+
+Each function in `common_metrics` chains the T1, T2 and T3
+transformations as separate passes over f, with a temporary array
+between each (e.g. `minimax_regret` builds the full regret matrix to
+take the worst regret of each row). The kernels here calculate the
+same robustness in a single pass over each decision alternative's
+performance values, without the temporary arrays, and in parallel over
+decision alternatives.
+
+The kernels are compiled with Numba if it is installed. `common_metrics`
+uses them automatically (see `use_backend`) for (m, n) float32 or
+float64 arrays when propagating NaN values without a workspace, and
+otherwise uses the NumPy transformations. Without Numba, the kernels
+are plain Python, so the NumPy transformations are always used.
+"""
+
+import contextlib
+import contextvars
+import numpy as np
+
+from .transforms.order_stats import nearest_idxs
+from .transforms.precision import get_dtype_policy, working_dtype
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKENDS = ['auto', 'numba', 'numpy']
+
+_backend = contextvars.ContextVar('backend', default='auto')
+
+prange = range if numba is None else numba.prange
+
+
+def _jit(func):
+    """Compiles func with Numba, if it is installed"""
+    if numba is None:
+        return func
+    return numba.njit(parallel=True, nogil=True, cache=True)(func)
+
+
+@contextlib.contextmanager
+def use_backend(backend):
+    """Selects how `common_metrics` calculates the classic metrics.
+
+    Parameters
+    ----------
+    backend : {'auto', 'numba', 'numpy'}
+        'numba' to use the fused kernels, 'numpy' to use the NumPy
+        transformations, or 'auto' to use the fused kernels if Numba
+        is installed (the default outside of `use_backend`).
+
+    Examples
+    --------
+    >>> with use_backend('numpy'):
+    ...     R = common_metrics.minimax_regret(f)
+    """
+    assert backend in BACKENDS, 'backend must be one of {}'.format(BACKENDS)
+    assert backend != 'numba' or numba is not None, (
+        'The numba backend requires Numba to be installed')
+    token = _backend.set(backend)
+    try:
+        yield backend
+    finally:
+        _backend.reset(token)
+
+
+def get_backend():
+    """Gets the backend selected by `use_backend`.
+
+    Returns
+    -------
+    str
+        'numba' or 'numpy' ('auto' is resolved)
+    """
+    backend = _backend.get()
+    if backend == 'auto':
+        return 'numpy' if numba is None else 'numba'
+    return backend
+
+
+def applies(f, nan_policy='propagate', workspace=None):
+    """Checks whether the fused kernels are used for a calculation.
+
+    Parameters
+    ----------
+    f : numpy.ndarray, shape=(m, n)
+        Performance values, f, for m decision alternatives
+        and n scenarios.
+    nan_policy : {'propagate', 'omit'}, optional
+        How NaN values are handled. The kernels only propagate NaN.
+        (The default is 'propagate').
+    workspace : Workspace, optional
+        The kernels do not need a workspace, so one is only passed for
+        the NumPy transformations.
+        (The default is None).
+
+    Returns
+    -------
+    bool
+        Whether the backend is 'numba' and f and the arguments are
+        supported by the kernels
+    """
+    return (
+        get_backend() == 'numba'
+        and type(f) is np.ndarray
+        and f.ndim == 2
+        and f.dtype in [np.float32, np.float64]
+        and get_dtype_policy() in [None, f.dtype]
+        and nan_policy == 'propagate'
+        and workspace is None)
+
+
+def maximin(f, maximise=True):
+    """Maximin robustness in one pass (see `common_metrics.maximin`)"""
+    worst, _ = _worst_and_best(f, maximise)
+    return _as_result(worst, f)
+
+
+def maximax(f, maximise=True):
+    """Maximax robustness in one pass (see `common_metrics.maximax`)"""
+    _, best = _worst_and_best(f, maximise)
+    return _as_result(best, f)
+
+
+def hurwicz(f, maximise=True, alpha=0.5):
+    """Hurwicz robustness in one pass (see `common_metrics.hurwicz`)"""
+    worst, best = _worst_and_best(f, maximise)
+    return _as_result(alpha * worst + (1. - alpha) * best, f)
+
+
+def laplace(f, maximise=True):
+    """Laplace robustness in one pass (see `common_metrics.laplace`)"""
+    mean = np.empty(f.shape[0])
+    _mean_kernel(f, mean)
+    return _as_result(mean if maximise else -mean, f)
+
+
+def mean_variance(f, maximise=True):
+    """Mean-variance robustness (see `common_metrics.mean_variance`)"""
+    mean = np.empty(f.shape[0])
+    std = np.empty(f.shape[0])
+    _mean_std_kernel(f, mean, std)
+    if not maximise:
+        mean = -mean
+    return _as_result((mean + 1) / (std + 1), f)
+
+
+def starrs_domain(f, maximise=True, threshold=0.0, accept_equal=True):
+    """Starr's domain robustness (see `common_metrics.starrs_domain`)"""
+    threshold = np.broadcast_to(
+        np.asarray(threshold, dtype=np.float64), f.shape)
+    R = np.empty(f.shape[0])
+    _satisficed_kernel(f, threshold, maximise, accept_equal, R)
+    return _as_result(R, f)
+
+
+def minimax_regret(f, maximise=True, best_f=None):
+    """Minimax regret robustness (see `common_metrics.minimax_regret`)"""
+    R = np.empty(f.shape[0])
+    _worst_regret_kernel(f, _best_f(f, maximise, best_f), maximise, R)
+    return _as_result(R, f)
+
+
+def percentile_regret(f, maximise=True, percentile=0.1, best_f=None):
+    """Percentile regret robustness (see `common_metrics.percentile_regret`)"""
+    R = np.empty(f.shape[0])
+    idx = int(nearest_idxs(f.shape[1], np.asarray(percentile)))
+    _percentile_regret_kernel(
+        f, _best_f(f, maximise, best_f), maximise, idx, R)
+    return _as_result(R, f)
+
+
+def _best_f(f, maximise, best_f):
+    """Gets the best performance in each scenario, in the units of f"""
+    if best_f is not None:
+        return np.asarray(best_f, dtype=np.float64)
+    best_f = np.amax(f, axis=0) if maximise else np.amin(f, axis=0)
+    return best_f.astype(np.float64)
+
+
+def _worst_and_best(f, maximise):
+    """Gets the worst and best (maximised) value of each row"""
+    minimum = np.empty(f.shape[0])
+    maximum = np.empty(f.shape[0])
+    _extremes_kernel(f, minimum, maximum)
+    if maximise:
+        return minimum, maximum
+    return -maximum, -minimum
+
+
+def _as_result(R, f):
+    """Rounds robustness to the working type of f"""
+    return R.astype(working_dtype(f.dtype), copy=False)
+
+
+@_jit
+def _extremes_kernel(f, minimum, maximum):
+    """Finds the minimum and maximum of each row, propagating NaN"""
+    for i in prange(f.shape[0]):
+        lo = np.inf
+        hi = -np.inf
+        has_nan = False
+        for j in range(f.shape[1]):
+            value = f[i, j]
+            if value < lo:
+                lo = value
+            if value > hi:
+                hi = value
+            if value != value:
+                has_nan = True
+        if has_nan:
+            lo = np.nan
+            hi = np.nan
+        minimum[i] = lo
+        maximum[i] = hi
+
+
+@_jit
+def _mean_kernel(f, mean):
+    """Finds the mean of each row"""
+    n = f.shape[1]
+    for i in prange(f.shape[0]):
+        total = 0.
+        for j in range(n):
+            total += f[i, j]
+        mean[i] = total / n
+
+
+@_jit
+def _mean_std_kernel(f, mean, std):
+    """Finds the mean and sample standard deviation of each row"""
+    n = f.shape[1]
+    for i in prange(f.shape[0]):
+        # Two passes over the row, which is in the CPU cache
+        total = 0.
+        for j in range(n):
+            total += f[i, j]
+        row_mean = total / n
+        M2 = 0.
+        for j in range(n):
+            deviation = f[i, j] - row_mean
+            M2 += deviation * deviation
+        mean[i] = row_mean
+        std[i] = np.sqrt(M2 / (n - 1)) if n > 1 else np.nan
+
+
+@_jit
+def _satisficed_kernel(f, threshold, maximise, accept_equal, R):
+    """Finds the proportion of each row meeting the threshold"""
+    n = f.shape[1]
+    for i in prange(f.shape[0]):
+        count = 0
+        for j in range(n):
+            # NaN values are not satisficed
+            value = f[i, j]
+            limit = threshold[i, j]
+            if maximise:
+                met = value >= limit if accept_equal else value > limit
+            else:
+                met = value <= limit if accept_equal else value < limit
+            if met:
+                count += 1
+        R[i] = count / n
+
+
+@_jit
+def _worst_regret_kernel(f, best_f, maximise, R):
+    """Finds the worst (negative) regret of each row"""
+    for i in prange(f.shape[0]):
+        worst = np.inf
+        has_nan = False
+        for j in range(f.shape[1]):
+            if maximise:
+                regret = f[i, j] - best_f[j]
+            else:
+                regret = best_f[j] - f[i, j]
+            if regret < worst:
+                worst = regret
+            if regret != regret:
+                has_nan = True
+        R[i] = np.nan if has_nan else worst
+
+
+@_jit
+def _percentile_regret_kernel(f, best_f, maximise, idx, R):
+    """Finds a percentile of the (negative) regret of each row"""
+    n = f.shape[1]
+    for i in prange(f.shape[0]):
+        regret = np.empty(n)
+        has_nan = False
+        for j in range(n):
+            if maximise:
+                regret[j] = f[i, j] - best_f[j]
+            else:
+                regret[j] = best_f[j] - f[i, j]
+            if regret[j] != regret[j]:
+                has_nan = True
+        if has_nan:
+            R[i] = np.nan
+        else:
+            regret.sort()
+            R[i] = regret[idx]
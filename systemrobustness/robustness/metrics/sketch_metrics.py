@@ -0,0 +1,146 @@
+"""Calculates percentile-based robustness in bounded memory.
+
+The performance values are given in chunks of scenarios. Each chunk is
+transformed (T1) and added to a `QuantileSketch` of each decision
+alternative, so that only the sketch and one chunk are held in memory.
+The percentiles (T2) are then selected from the sketch, and aggregated
+(T3) as usual.
+
+Any T1 transformation that is calculated scenario by scenario can be
+used, including `t1.regret_from_best_da` (the best decision alternative
+in each scenario is found from each chunk), but not
+`t1.regret_from_median`.
+"""
+
+import functools
+import numpy as np
+
+from . import common_metrics
+from .custom_metrics import custom_R_metric
+from .transforms import t1, t2, t3
+from .transforms.sketch import QuantileSketch
+
+
+def sketch_R(func, f_chunks, maximise=True, k=1024, **kwargs):
+    """Calculates a percentile-based robustness metric from chunks.
+
+    Parameters
+    ----------
+    func : func
+        `common_metrics.percentile_regret`,
+        `common_metrics.percentile_skew`,
+        `common_metrics.percentile_kurtosis` or a `custom_R_metric`
+        using `t2.select_percentiles` (with `percentiles` given in
+        `t2_kwargs` or a `functools.partial`). May be a
+        `functools.partial` of these.
+    f_chunks : iterable of numpy.ndarray, shape=(m, c)
+        Performance values, f, for the m decision alternatives in
+        chunks of c scenarios (c may differ between chunks).
+    maximise : bool, optional
+        Is the performance metric to be maximised or minimised.
+        (The default is True, which implies high values of f are better
+        than low values of f).
+    k : int, optional
+        The size of the sketch (see `QuantileSketch`).
+        (The default is 1024).
+    **kwargs
+        Keyword arguments for `func`, e.g. `percentile`. Arrays of
+        values for each scenario (e.g. `best_f`) are not supported.
+
+    Returns
+    -------
+    R : numpy.ndarray, shape=(m, )
+        The approximate robustness value for each of the m decision
+        alternatives
+    rank_error : float
+        The maximum rank error of the percentiles, as a fraction of the
+        number of scenarios (see `QuantileSketch.rank_error`)
+
+    Examples
+    --------
+    >>> f_chunks = np.array_split(f, 100, axis=1)
+    >>> R, rank_error = sketch_R(common_metrics.percentile_skew, f_chunks)
+    """
+    t1_func, t1_kwargs, percentiles, t3_func, t3_kwargs = (
+        percentile_metric_parts(func, kwargs))
+    sketch = None
+    for f_chunk in f_chunks:
+        _f = t1_func(f_chunk, maximise=maximise, **t1_kwargs)
+        if sketch is None:
+            sketch = QuantileSketch(np.shape(_f)[0], k=k)
+        sketch.update(_f)
+    assert sketch is not None, 'f_chunks is empty'
+    _f = t2.select_percentiles(sketch, percentiles)
+    R = t3_func(_f, **t3_kwargs)
+    return R, sketch.rank_error
+
+
+def percentile_metric_parts(func, kwargs=None):
+    """Splits a percentile-based robustness metric into its transforms.
+
+    Parameters
+    ----------
+    func : func
+        The robustness metric (see `sketch_R`)
+    kwargs : dict, optional
+        Keyword arguments for `func`
+        (The default is None, i.e. no keyword arguments).
+
+    Returns
+    -------
+    t1_func : func
+        The T1 transformation
+    t1_kwargs : dict
+        Keyword arguments for `t1_func`, other than `maximise`
+    percentiles : numpy.ndarray, shape=(n', )
+        The percentiles selected by the T2 transformation
+    t3_func : func
+        The T3 transformation
+    t3_kwargs : dict
+        Keyword arguments for `t3_func`
+
+    Raises
+    ------
+    ValueError
+        If `func` is not a percentile-based robustness metric.
+    """
+    kwargs = dict(kwargs or {})
+    while isinstance(func, functools.partial):
+        kwargs = dict(func.keywords, **kwargs)
+        func = func.func
+    assert kwargs.pop('nan_policy', 'propagate') == 'propagate', (
+        'NaN values can only be propagated')
+    assert 'best_f' not in kwargs, 'best_f is found from each chunk'
+    if func is common_metrics.percentile_regret:
+        percentiles = np.asarray([kwargs.pop('percentile', 0.1)])
+        parts = (t1.regret_from_best_da, {}, percentiles, t3.f_sum, {})
+    elif func is common_metrics.percentile_skew:
+        parts = (
+            t1.identity, {}, common_metrics.SKEW_PERCENTILES, t3.f_skew, {})
+    elif func is common_metrics.percentile_kurtosis:
+        parts = (
+            t1.identity,
+            {},
+            common_metrics.KURTOSIS_PERCENTILES,
+            t3.f_kurtosis,
+            {})
+    elif isinstance(func, custom_R_metric):
+        t2_func = func.t2_func
+        t2_kwargs = dict(kwargs.pop('t2_kwargs', None) or {})
+        while isinstance(t2_func, functools.partial):
+            t2_kwargs = dict(t2_func.keywords, **t2_kwargs)
+            t2_func = t2_func.func
+        if t2_func is not t2.select_percentiles:
+            raise ValueError(
+                'The T2 transformation must be t2.select_percentiles')
+        parts = (
+            func.t1_func,
+            dict(kwargs.pop('t1_kwargs', None) or {}),
+            np.asarray(t2_kwargs['percentiles']),
+            func.t3_func,
+            dict(kwargs.pop('t3_kwargs', None) or {}))
+    else:
+        raise ValueError(
+            '{!r} is not a percentile-based robustness metric'.format(func))
+    assert not kwargs, 'Unexpected arguments: {}'.format(list(kwargs))
+    return parts
@@ -0,0 +1,352 @@
+"""Calculates robustness metrics over many values of their parameter.
+
+Sensitivity studies calculate `common_metrics.hurwicz`,
+`common_metrics.percentile_regret` and `common_metrics.starrs_domain`
+for many values of alpha, the percentile or the threshold. Each call
+finds the same intermediate values again. The sweeps here find them
+once for all of the parameter values:
+    - `hurwicz_sweep`: the worst- and best-cases, from one pass over f;
+    - `percentile_regret_sweep`: the regret from the best decision
+      alternative, sorted once;
+    - `starrs_domain_sweep`: the performance values, sorted once, so
+      that the number of scenarios satisficed by each threshold is
+      found by a binary search (see `reliability_curve`).
+The robustness values are identical to those of `common_metrics`.
+
+Arrays of other libraries (see `transforms.namespace`) are calculated
+one parameter value at a time.
+"""
+
+import numpy as np
+
+from . import common_metrics
+from .transforms import namespace, t1, t2
+from .transforms.order_stats import SortedF, frequencies
+from .transforms.precision import working_dtype
+
+
+def hurwicz_sweep(
+        f, alphas, maximise=True, nan_policy='propagate', axis=-1):
+    """Hurwicz robustness for each of several values of alpha.
+
+    Parameters
+    ----------
+    f : numpy.ndarray, shape=(..., m, n)
+        Performance values, f, for m decision alternatives
+        and n scenarios.
+    alphas : numpy.ndarray, shape=(p, )
+        The weights of the worst-case (see `common_metrics.hurwicz`)
+    maximise : bool, optional
+        Is the performance metric to be maximised or minimised.
+        (The default is True, which implies high values of f are better
+        than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the values that are not NaN).
+    axis : int, optional
+        The axis of f that is the scenarios (see
+        `common_metrics.maximin`).
+        (The default is -1).
+
+    Returns
+    -------
+    numpy.ndarray, shape=(..., m, p)
+        The robustness value for each of the m decision alternatives
+        with each of the p values of alpha
+    """
+    f = common_metrics._scenarios_last(f, axis)
+    xp = namespace.array_namespace(f)
+    if xp is not np:
+        return _sweep(
+            xp, common_metrics.hurwicz, f, 'alpha', alphas,
+            maximise=maximise, nan_policy=nan_policy)
+    _f = t1.identity(f, maximise=maximise)
+    worst_f = t2.worst_case(_f, nan_policy=nan_policy)
+    best_f = t2.best_case(_f, nan_policy=nan_policy)
+    alphas = np.asarray(alphas, dtype=np.float64)
+    R = worst_f * alphas + best_f * (1. - alphas)
+    return R.astype(working_dtype(_f.dtype), copy=False)
+
+
+def percentile_regret_sweep(
+        f,
+        percentiles,
+        maximise=True,
+        best_f=None,
+        nan_policy='propagate',
+        axis=-1):
+    """Percentile regret robustness for each of several percentiles.
+
+    Parameters
+    ----------
+    f : numpy.ndarray, shape=(..., m, n)
+        Performance values, f, for m decision alternatives
+        and n scenarios.
+    percentiles : numpy.ndarray, shape=(p, )
+        The percentiles of the regret (see
+        `common_metrics.percentile_regret`)
+    maximise : bool, optional
+        Is the performance metric to be maximised or minimised.
+        (The default is True, which implies high values of f are better
+        than low values of f).
+    best_f : np.ndarray, shape=(..., n), optional
+        The best performance value in each scenario (see
+        `t1.regret_from_best_da`).
+        (The default is None, which uses the best of the m decision
+        alternatives in f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN for any decision
+        alternative with a NaN value. 'omit' calculates robustness
+        from the values that are not NaN).
+    axis : int, optional
+        The axis of f that is the scenarios (see
+        `common_metrics.maximin`).
+        (The default is -1).
+
+    Returns
+    -------
+    numpy.ndarray, shape=(..., m, p)
+        The robustness value for each of the m decision alternatives
+        at each of the p percentiles
+    """
+    f = common_metrics._scenarios_last(f, axis)
+    xp = namespace.array_namespace(f)
+    if xp is not np:
+        return _sweep(
+            xp, common_metrics.percentile_regret, f, 'percentile',
+            percentiles, maximise=maximise, best_f=best_f,
+            nan_policy=nan_policy)
+    regret = t1.regret_from_best_da(
+        f, maximise=maximise, best_f=best_f, nan_policy=nan_policy)
+    # The batches of decision alternatives as one, sorted in place (so
+    # their original order is not kept)
+    rows = np.reshape(regret, (-1, regret.shape[-1]))
+    rows.sort(axis=1)
+    R = SortedF(rows, values=rows).quantiles(
+        np.asarray(percentiles), nan_policy=nan_policy)
+    return np.reshape(R, regret.shape[:-1] + (-1, ))
+
+
+def starrs_domain_sweep(
+        f,
+        thresholds,
+        maximise=True,
+        accept_equal=True,
+        nan_policy='propagate',
+        axis=-1,
+        weights=None):
+    """Starr's domain robustness for each of several thresholds.
+
+    Parameters
+    ----------
+    f : numpy.ndarray, shape=(..., m, n)
+        Performance values, f, for m decision alternatives
+        and n scenarios.
+    thresholds : numpy.ndarray, shape=(p, ) or (p, n)
+        The thresholds (see `common_metrics.starrs_domain`), each
+        either the same for all scenarios, or a value for each scenario
+    maximise : bool, optional
+        Is the performance metric to be maximised or minimised.
+        (The default is True, which implies high values of f are better
+        than low values of f).
+    accept_equal : bool, optional
+        Whether or not an f value equal to a threshold is acceptable.
+        (The default is True).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which treats NaN values as not
+        satisficed. 'omit' calculates robustness from the values that
+        are not NaN).
+    axis : int, optional
+        The axis of f that is the scenarios (see
+        `common_metrics.maximin`).
+        (The default is -1).
+    weights : np.ndarray, shape=(n, ), optional
+        The probability (or relative frequency) of each scenario, e.g.
+        from `t2.compress_scenarios`, to find the satisficed fraction
+        of the total weight.
+        (The default is None, which treats the scenarios as equally
+        likely).
+
+    Returns
+    -------
+    numpy.ndarray, shape=(..., m, p)
+        The robustness value for each of the m decision alternatives
+        with each of the p thresholds
+    """
+    f = common_metrics._scenarios_last(f, axis)
+    xp = namespace.array_namespace(f)
+    if xp is not np:
+        return _sweep(
+            xp, common_metrics.starrs_domain, f, 'threshold', thresholds,
+            maximise=maximise, accept_equal=accept_equal,
+            nan_policy=nan_policy, weights=weights)
+    return reliability_curve(
+        f, thresholds, maximise=maximise, accept_equal=accept_equal,
+        nan_policy=nan_policy, weights=weights)
+
+
+def reliability_curve(
+        f,
+        thresholds,
+        maximise=True,
+        accept_equal=True,
+        nan_policy='propagate',
+        weights=None,
+        block_size=1048576):
+    """The fraction of scenarios satisficed, for each of many thresholds.
+
+    The same as the mean of `t1.satisfice` for each threshold (i.e.
+    Starr's domain robustness), without a pass over f for each
+    threshold. For thresholds that are the same for all scenarios, the
+    thresholds are sorted once and every value of f is placed between
+    them by a single binary search, then the (weighted) number of values
+    below each threshold is counted for all of the decision alternatives
+    at once, in O(p log p + mn log p) time. Unweighted values are sorted
+    first (in O(mn log n) time, unless f is a `SortedF`), as sorted
+    values are searched several times faster. Thresholds with a value
+    for each scenario are compared with f in blocks of thresholds, in
+    O(mnp) time.
+
+    Parameters
+    ----------
+    f : numpy.ndarray or SortedF, shape=(..., m, n)
+        Performance values, f, for m decision alternatives
+        and n scenarios. A `SortedF` (which is (m, n)) is not sorted
+        again, e.g. for several curves of the same values.
+    thresholds : numpy.ndarray, shape=(p, ) or (p, n)
+        The thresholds, each either the same for all scenarios, or a
+        value for each scenario (see `t1.satisfice`)
+    maximise : bool, optional
+        Is the performance metric to be maximised or minimised.
+        (The default is True, which implies high values of f are better
+        than low values of f).
+    accept_equal : bool, optional
+        Whether or not an f value equal to a threshold is acceptable.
+        (The default is True).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which treats NaN values as not
+        satisficed. 'omit' calculates the fraction of the values that
+        are not NaN).
+    weights : np.ndarray, shape=(n, ), optional
+        The probability (or relative frequency) of each scenario, e.g.
+        from `t2.compress_scenarios`, to find the satisficed fraction
+        of the total weight.
+        (The default is None, which treats the scenarios as equally
+        likely).
+    block_size : int, optional
+        The number of comparisons in each block, for thresholds with a
+        value for each scenario.
+        (The default is 1048576).
+
+    Returns
+    -------
+    numpy.ndarray, shape=(..., m, p)
+        The fraction of scenarios satisficed by each of the m decision
+        alternatives with each of the p thresholds
+
+    Examples
+    --------
+    >>> thresholds = np.linspace(0., 10., 1000)
+    >>> reliability = reliability_curve(f, thresholds, maximise=False)
+    """
+    assert np.ndim(thresholds) in [1, 2], 'thresholds must be (p, ) or (p, n)'
+    if isinstance(f, SortedF):
+        sorted_f = f
+        _f = f.f
+    else:
+        _f = t1.identity(f)
+        sorted_f = None
+    dtype = working_dtype(_f.dtype)
+    thresholds = np.asarray(thresholds, dtype=dtype)
+    rows = np.reshape(_f, (-1, _f.shape[-1]))
+    if weights is None:
+        # Each scenario counts once
+        scenario_weights = np.ones(rows.shape[1], dtype=int)
+    else:
+        weights = scenario_weights = frequencies(weights)
+    if thresholds.ndim == 2:
+        satisficed = _compare_satisficed(
+            rows, thresholds, maximise, accept_equal, weights, block_size)
+        valid = np.matmul(~np.isnan(rows), scenario_weights)
+    else:
+        if sorted_f is not None:
+            values = sorted_f.values
+            value_weights = (
+                None if weights is None else weights[sorted_f.order])
+        elif weights is None:
+            values = np.sort(rows, axis=1)
+            value_weights = None
+        else:
+            # The values are not sorted, as their weights would need to be
+            values = rows
+            value_weights = np.broadcast_to(weights, rows.shape)
+        satisficed, valid = _search_satisficed(
+            values, thresholds, maximise, accept_equal, value_weights)
+    if nan_policy == 'omit':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            R = satisficed / valid[:, np.newaxis]
+    else:
+        R = satisficed / np.sum(scenario_weights)
+    R = R.astype(dtype, copy=False)
+    return np.reshape(R, _f.shape[:-1] + (-1, ))
+
+
+def _sweep(xp, func, f, name, values, **kwargs):
+    """Calculates a metric for each parameter value, one at a time"""
+    return xp.stack([
+        func(f, **{name: value}, **kwargs)
+        for value in np.asarray(values).tolist()], axis=-1)
+
+
+def _search_satisficed(values, thresholds, maximise, accept_equal, weights):
+    """Finds the weight satisficed by each threshold, by binary search.
+
+    Each value is placed between the sorted thresholds, and the values
+    of all of the rows are counted between each pair of thresholds at
+    once. Returns the weight satisficed and the weight of the values
+    that are not NaN, which are numbers of values if there are no
+    weights.
+    """
+    m, p = values.shape[0], thresholds.size
+    order = np.argsort(thresholds, kind='stable')
+    # The number of thresholds below each value, so that a value is
+    # below the threshold at sorted position j if this is at most j.
+    # Identical to comparing identity(f) with identity(threshold).
+    side = 'right' if maximise == accept_equal else 'left'
+    positions = np.searchsorted(thresholds[order], values, side=side)
+    # NaN values, which are not satisficed, are counted separately
+    positions[np.isnan(values)] = p + 1
+    positions += np.arange(m)[:, np.newaxis] * (p + 2)
+    counts = np.bincount(
+        np.ravel(positions),
+        weights=None if weights is None else np.ravel(weights),
+        minlength=m * (p + 2))
+    cumulative = np.cumsum(np.reshape(counts, (m, p + 2))[:, :p + 1], axis=1)
+    below = np.empty((m, p), dtype=cumulative.dtype)
+    below[:, order] = cumulative[:, :p]
+    valid = cumulative[:, p]
+    if maximise:
+        return valid[:, np.newaxis] - below, valid
+    return below, valid
+
+
+def _compare_satisficed(
+        rows, thresholds, maximise, accept_equal, weights, block_size):
+    """Finds the weight satisficed by each threshold, in blocks"""
+    if maximise:
+        compare = np.greater_equal if accept_equal else np.greater
+    else:
+        compare = np.less_equal if accept_equal else np.less
+    satisficed = np.empty((rows.shape[0], thresholds.shape[0]))
+    n_block = max(1, block_size // max(rows.size, 1))
+    for start in range(0, thresholds.shape[0], n_block):
+        block = compare(rows[:, np.newaxis], thresholds[start:start + n_block])
+        satisficed[:, start:start + n_block] = (
+            np.count_nonzero(block, axis=-1) if weights is None
+            else np.matmul(block, weights))
+    return satisficed
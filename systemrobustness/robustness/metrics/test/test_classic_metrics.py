@@ -0,0 +1,45 @@
+"""Tests calculating the common robustness metrics at once"""
+
+import warnings
+import numpy as np
+from .. import classic_R, common_metrics
+from ..classic_metrics import CLASSIC_METRICS
+
+
+def test_classic_R():
+    """Tests that each metric matches its common_metrics function"""
+    rng = np.random.default_rng(21)
+    f = rng.normal(10., 2., size=(2, 6, 101))
+    f[0, 1, 7] = np.nan
+    f[1, 2, :] = np.nan
+    kwargs = {'alpha': 0.2, 'percentile': 0.3, 'threshold': 9.5}
+    for maximise in [True, False]:
+        for nan_policy in ['propagate', 'omit']:
+            with warnings.catch_warnings():
+                # All-NaN rows
+                warnings.simplefilter('ignore', RuntimeWarning)
+                R = classic_R(
+                    f, maximise=maximise, nan_policy=nan_policy, **kwargs)
+                assert R.shape == (2, 6, len(CLASSIC_METRICS))
+                for i, name in enumerate(CLASSIC_METRICS):
+                    func = getattr(common_metrics, name)
+                    expected = func(
+                        f, maximise=maximise, nan_policy=nan_policy,
+                        **{key: value for key, value in kwargs.items()
+                           if key in func.__code__.co_varnames})
+                    assert np.allclose(
+                        R[..., i], expected, equal_nan=True), name
+
+
+def test_subset():
+    """Tests calculating some of the metrics, in the order given"""
+    rng = np.random.default_rng(22)
+    f = rng.normal(10., 2., size=(50, 8))
+    best_f = np.amax(f, axis=1) + 1.
+    metrics = ['percentile_regret', 'maximin', 'laplace']
+    R = classic_R(f, metrics, maximise=False, best_f=best_f, axis=0)
+    assert R.shape == (8, 3)
+    assert np.allclose(R[:, 0], common_metrics.percentile_regret(
+        f.T, maximise=False, best_f=best_f))
+    assert np.allclose(R[:, 1], common_metrics.maximin(f.T, maximise=False))
+    assert np.allclose(R[:, 2], common_metrics.laplace(f.T, maximise=False))
@@ -0,0 +1,52 @@
+"""Tests the fused kernels for the classic metrics"""
+
+import numpy as np
+import pytest
+from .. import common_metrics, fused
+
+
+def test_fused():
+    """Tests that the fused kernels match the NumPy transformations"""
+    # Without Numba the kernels are not compiled, so are not tested
+    pytest.importorskip('numba')
+    rng = np.random.default_rng(19)
+    f = rng.normal(size=(5, 12))
+    f[1, 3] = np.nan
+    cases = [
+        ('maximin', {}),
+        ('maximax', {}),
+        ('hurwicz', {'alpha': 0.3}),
+        ('laplace', {}),
+        ('mean_variance', {}),
+        ('minimax_regret', {}),
+        ('minimax_regret', {'best_f': np.nanmax(f, axis=0) + 1.}),
+        ('percentile_regret', {'percentile': 0.3}),
+        ('starrs_domain', {'threshold': 0.1, 'accept_equal': False}),
+        ('starrs_domain', {'threshold': rng.normal(size=12)})]
+    for values in [f, f[[0, 2, 3, 4]], f.astype(np.float32)]:
+        for name, kwargs in cases:
+            for maximise in [True, False]:
+                with fused.use_backend('numpy'):
+                    expected = getattr(common_metrics, name)(
+                        values, maximise=maximise, **kwargs)
+                R = getattr(fused, name)(values, maximise=maximise, **kwargs)
+                assert R.dtype == expected.dtype
+                assert np.allclose(R, expected, equal_nan=True, rtol=1e-6)
+
+
+def test_use_backend():
+    """Tests selecting the backend"""
+    f = np.ones((2, 3))
+    with fused.use_backend('numpy'):
+        assert fused.get_backend() == 'numpy'
+        assert not fused.applies(f)
+    if fused.numba is None:
+        assert fused.get_backend() == 'numpy'
+        with pytest.raises(AssertionError, match='Numba'):
+            with fused.use_backend('numba'):
+                pass
+    else:
+        assert fused.get_backend() == 'numba'
+        assert fused.applies(f)
+        assert not fused.applies(f, nan_policy='omit')
+        assert not fused.applies(f[np.newaxis])
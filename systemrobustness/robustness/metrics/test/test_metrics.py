@@ -1,7 +1,8 @@
 """Tests the Robustness metrics"""
 
 import numpy as np
-from .. import common_metrics
+from .. import (
+    common_metrics, custom_R_metric, t1, t2, t3, SortedF, Workspace)
 
 
 def test_maximin():
@@ -193,3 +194,207 @@ def test_starrs_domain():
     expected = np.asarray(
         [1./3., 1./3.])
     assert np.allclose(R, expected)
+
+
+def test_omit_nan():
+    """Tests the metrics with NaN values"""
+    f = np.asarray([
+        [0.99, 1.0, np.nan, 0.5, 0.52],
+        [0.69, 0.6, 0.61, np.nan, 1.0]])
+    complete_f = [
+        np.asarray([[0.99, 1.0, 0.5, 0.52]]),
+        np.asarray([[0.69, 0.6, 0.61, 1.0]])]
+    for metric in [
+            common_metrics.maximin,
+            common_metrics.maximax,
+            common_metrics.hurwicz,
+            common_metrics.laplace,
+            common_metrics.mean_variance,
+            common_metrics.undesirable_deviations,
+            common_metrics.percentile_skew,
+            common_metrics.percentile_kurtosis,
+            common_metrics.starrs_domain]:
+        for maximise in [True, False]:
+            R = metric(f, maximise=maximise, nan_policy='omit')
+            for row in range(2):
+                expected = metric(complete_f[row], maximise=maximise)
+                assert np.allclose(R[row], expected)
+    R = common_metrics.minimax_regret(f, nan_policy='omit')
+    expected = np.asarray(
+        [-0.48, -0.4])
+    assert np.allclose(R, expected)
+
+
+def test_workspace():
+    """Tests that metrics give identical results with a workspace"""
+    rng = np.random.default_rng(4)
+    workspace = Workspace()
+    for f in [rng.normal(size=(6, 9)), rng.normal(size=(3, 8))]:
+        f[1, 2] = np.nan
+        original = np.copy(f)
+        for metric in [
+                common_metrics.maximin,
+                common_metrics.maximax,
+                common_metrics.hurwicz,
+                common_metrics.laplace,
+                common_metrics.minimax_regret,
+                common_metrics.percentile_regret,
+                common_metrics.mean_variance,
+                common_metrics.undesirable_deviations,
+                common_metrics.percentile_skew,
+                common_metrics.percentile_kurtosis,
+                common_metrics.starrs_domain]:
+            for maximise in [True, False]:
+                for nan_policy in ['propagate', 'omit']:
+                    expected = metric(
+                        f, maximise=maximise, nan_policy=nan_policy)
+                    R = metric(
+                        f,
+                        maximise=maximise,
+                        nan_policy=nan_policy,
+                        workspace=workspace)
+                    assert np.array_equal(R, expected, equal_nan=True)
+        assert np.array_equal(f, original, equal_nan=True)
+    # The buffer for the largest f is reused
+    assert workspace.nbytes == 6 * 9 * 8
+    metric = custom_R_metric(t1.regret_from_median, t2.worst_half, t3.f_mean)
+    expected = metric(f, maximise=False)
+    R = metric(f, maximise=False, workspace=workspace)
+    assert np.array_equal(R, expected, equal_nan=True)
+    assert np.array_equal(f, original, equal_nan=True)
+
+
+def test_sorted_f():
+    """Tests that metrics give identical results with a SortedF"""
+    rng = np.random.default_rng(7)
+    f = rng.normal(size=(6, 9))
+    f[1, 2] = np.nan
+    sorted_f = SortedF(f)
+    for metric in [
+            common_metrics.maximin,
+            common_metrics.maximax,
+            common_metrics.hurwicz,
+            common_metrics.laplace,
+            common_metrics.minimax_regret,
+            common_metrics.percentile_regret,
+            common_metrics.mean_variance,
+            common_metrics.undesirable_deviations,
+            common_metrics.percentile_skew,
+            common_metrics.percentile_kurtosis,
+            common_metrics.starrs_domain]:
+        for maximise in [True, False]:
+            for nan_policy in ['propagate', 'omit']:
+                expected = metric(f, maximise=maximise, nan_policy=nan_policy)
+                R = metric(sorted_f, maximise=maximise, nan_policy=nan_policy)
+                assert np.array_equal(R, expected, equal_nan=True)
+
+
+def test_batch():
+    """Tests that stacked performance values are evaluated in one call"""
+    rng = np.random.default_rng(18)
+    f = rng.normal(size=(3, 5, 40))
+    f[1, 2, 7] = np.nan
+    workspace = Workspace()
+    for metric in [
+            common_metrics.maximin,
+            common_metrics.maximax,
+            common_metrics.hurwicz,
+            common_metrics.laplace,
+            common_metrics.minimax_regret,
+            common_metrics.percentile_regret,
+            common_metrics.mean_variance,
+            common_metrics.undesirable_deviations,
+            common_metrics.percentile_skew,
+            common_metrics.percentile_kurtosis,
+            common_metrics.starrs_domain,
+            custom_R_metric(t1.regret_from_median, t2.worst_half, t3.f_mean),
+            custom_R_metric(
+                t1.identity, t2.select_percentiles, t3.f_identity)]:
+        for nan_policy in ['propagate', 'omit']:
+            kwargs = {'maximise': False, 'nan_policy': nan_policy}
+            if isinstance(metric, custom_R_metric) and (
+                    metric.t2_func is t2.select_percentiles):
+                kwargs['t2_kwargs'] = {'percentiles': [0.25]}
+            expected = np.stack([metric(f_k, **kwargs) for f_k in f])
+            R = metric(f, **kwargs)
+            assert R.shape == (3, 5)
+            assert np.allclose(R, expected, equal_nan=True)
+            # Scenarios on another axis
+            R = metric(np.moveaxis(f, -1, 0), axis=0, **kwargs)
+            assert np.allclose(R, expected, equal_nan=True)
+            R = metric(f, workspace=workspace, **kwargs)
+            assert np.allclose(R, expected, equal_nan=True)
+
+
+def test_weights():
+    """Tests robustness from compressed, weighted scenarios"""
+    rng = np.random.default_rng(26)
+    f = np.round(rng.normal(size=(4, 12)), 1)
+    f = f[:, rng.integers(0, 12, size=60)]
+    f[1, f[1] == f[1, 0]] = np.nan
+    compressed_f, weights = t2.compress_scenarios(f)
+    assert compressed_f.shape[1] <= 12
+    for metric in [
+            common_metrics.laplace,
+            common_metrics.percentile_regret,
+            common_metrics.mean_variance,
+            common_metrics.percentile_skew,
+            common_metrics.percentile_kurtosis,
+            common_metrics.starrs_domain]:
+        # Means are the same for any weights_kind
+        kwargs = {'weights_kind': 'frequency'}
+        if metric in [common_metrics.laplace, common_metrics.starrs_domain]:
+            kwargs = {}
+        for nan_policy in ['propagate', 'omit']:
+            R = metric(
+                compressed_f, maximise=False, nan_policy=nan_policy,
+                weights=weights, **kwargs)
+            expected = metric(f, maximise=False, nan_policy=nan_policy)
+            assert np.allclose(R, expected, equal_nan=True), metric.__name__
+    # Equal probabilities are unweighted, and scaled probabilities are
+    # the same
+    assert np.allclose(
+        common_metrics.percentile_regret(f, weights=np.full(60, 1. / 60)),
+        common_metrics.percentile_regret(f), equal_nan=True)
+    for metric in [
+            common_metrics.percentile_regret,
+            common_metrics.mean_variance]:
+        assert np.allclose(
+            metric(compressed_f, weights=weights),
+            metric(compressed_f, weights=weights / 60.), equal_nan=True)
+
+
+def test_return_index():
+    """Tests the scenarios that robustness is calculated from"""
+    f = np.asarray([
+        [0.99, 1.0, 0.5, 0.7],
+        [0.69, 0.6, 0.6, 0.8]])
+    R, idxs = common_metrics.maximin(f, maximise=False, return_index=True)
+    assert np.allclose(R, common_metrics.maximin(f, maximise=False))
+    assert np.all(idxs == [[1], [3]])
+    R, idxs = common_metrics.hurwicz(f, return_index=True)
+    assert np.allclose(R, common_metrics.hurwicz(f))
+    assert np.all(idxs[:, 1] == [1, 3])
+    rng = np.random.default_rng(28)
+    f = rng.normal(size=(2, 3, 30))
+    f[0, 1, 4] = np.nan
+    for metric in [
+            common_metrics.maximin,
+            common_metrics.maximax,
+            common_metrics.minimax_regret,
+            common_metrics.percentile_regret,
+            common_metrics.undesirable_deviations,
+            common_metrics.percentile_skew,
+            common_metrics.percentile_kurtosis]:
+        for nan_policy in ['propagate', 'omit']:
+            R, idxs = metric(
+                f, nan_policy=nan_policy, axis=-1, return_index=True)
+            assert np.allclose(
+                R, metric(f, nan_policy=nan_policy), equal_nan=True)
+            assert idxs.shape[:-1] == R.shape
+    # The scenarios of a SortedF's values
+    R, idxs = common_metrics.percentile_skew(
+        SortedF(f[1]), return_index=True)
+    assert np.allclose(
+        np.take_along_axis(f[1], idxs, axis=1),
+        t2.select_percentiles(f[1], common_metrics.SKEW_PERCENTILES))
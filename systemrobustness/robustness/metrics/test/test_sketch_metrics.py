@@ -0,0 +1,39 @@
+"""Tests percentile-based robustness from sketches"""
+
+import functools
+import numpy as np
+from .. import common_metrics, custom_R_metric, sketch_metrics, t1, t2, t3
+
+
+def test_sketch_R():
+    """Tests that sketches give the exact robustness without compaction"""
+    rng = np.random.default_rng(12)
+    f = rng.normal(size=(4, 2000))
+    custom = custom_R_metric(
+        t1.satisficing_regret,
+        functools.partial(t2.select_percentiles, percentiles=[0.2, 0.8]),
+        t3.f_mean)
+    for maximise in [True, False]:
+        for func, kwargs in [
+                (common_metrics.percentile_regret, {}),
+                (common_metrics.percentile_regret, {'percentile': 0.3}),
+                (common_metrics.percentile_skew, {}),
+                (common_metrics.percentile_kurtosis, {}),
+                (custom, {'t1_kwargs': {'threshold': 0.5}})]:
+            expected = func(f, maximise=maximise, **kwargs)
+            R, rank_error = sketch_metrics.sketch_R(
+                func,
+                np.array_split(f, 9, axis=1),
+                maximise=maximise,
+                k=4096,
+                **kwargs)
+            assert rank_error == 0.
+            assert np.array_equal(R, expected)
+            R, rank_error = sketch_metrics.sketch_R(
+                func,
+                np.array_split(f, 9, axis=1),
+                maximise=maximise,
+                k=128,
+                **kwargs)
+            assert 0. < rank_error < 0.1
+            assert np.allclose(R, expected, atol=0.5)
@@ -0,0 +1,124 @@
+"""Tests the robustness metrics over many values of their parameter"""
+
+import warnings
+import numpy as np
+from .. import (
+    common_metrics,
+    hurwicz_sweep,
+    percentile_regret_sweep,
+    starrs_domain_sweep,
+    reliability_curve,
+    SortedF,
+    t1,
+    t3)
+
+
+def _f():
+    """Gets performance values with missing values and ties"""
+    rng = np.random.default_rng(22)
+    f = np.round(rng.normal(10., 2., size=(2, 5, 60)), 1)
+    f[0, 1, 7] = np.nan
+    f[1, 2, :] = np.nan
+    return f
+
+
+def _check(sweep, metric, name, values, **kwargs):
+    """Checks a sweep against calling the metric for each value"""
+    f = _f()
+    for maximise in [True, False]:
+        for nan_policy in ['propagate', 'omit']:
+            with warnings.catch_warnings():
+                # All-NaN rows
+                warnings.simplefilter('ignore', RuntimeWarning)
+                R = sweep(
+                    f, values, maximise=maximise, nan_policy=nan_policy,
+                    **kwargs)
+                assert R.shape == (2, 5, len(values))
+                for i, value in enumerate(values):
+                    expected = metric(
+                        f, maximise=maximise, nan_policy=nan_policy,
+                        **{name: value}, **kwargs)
+                    assert np.allclose(R[..., i], expected, equal_nan=True)
+
+
+def test_hurwicz_sweep():
+    """Tests the Hurwicz sweep"""
+    _check(
+        hurwicz_sweep, common_metrics.hurwicz, 'alpha',
+        np.linspace(0., 1., 11))
+
+
+def test_percentile_regret_sweep():
+    """Tests the percentile regret sweep"""
+    _check(
+        percentile_regret_sweep, common_metrics.percentile_regret,
+        'percentile', np.linspace(0., 1., 21))
+
+
+def test_starrs_domain_sweep():
+    """Tests the Starr's domain sweep, including thresholds equal to f"""
+    thresholds = np.linspace(6., 14., 81)
+    for accept_equal in [True, False]:
+        _check(
+            starrs_domain_sweep, common_metrics.starrs_domain, 'threshold',
+            thresholds, accept_equal=accept_equal)
+
+
+def test_axis():
+    """Tests sweeping with the scenarios as the first axis"""
+    f = np.random.default_rng(23).normal(size=(40, 3))
+    R = starrs_domain_sweep(f, [-0.5, 0., 0.5], maximise=False, axis=0)
+    assert R.shape == (3, 3)
+    assert np.allclose(
+        R[:, 1], common_metrics.starrs_domain(f.T, maximise=False))
+
+
+def test_reliability_curve():
+    """Tests thresholds for each scenario, and sorting f once"""
+    f = _f()
+    rng = np.random.default_rng(24)
+    thresholds = np.round(rng.normal(10., 2., size=(30, f.shape[-1])), 1)
+    for maximise in [True, False]:
+        for accept_equal in [True, False]:
+            for nan_policy in ['propagate', 'omit']:
+                with warnings.catch_warnings():
+                    # All-NaN rows
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    R = reliability_curve(
+                        f, thresholds, maximise=maximise,
+                        accept_equal=accept_equal, nan_policy=nan_policy,
+                        block_size=1000)
+                    for i, threshold in enumerate(thresholds):
+                        expected = t3.f_mean(t1.satisfice(
+                            f, maximise=maximise, threshold=threshold,
+                            accept_equal=accept_equal,
+                            nan_policy=nan_policy), nan_policy=nan_policy)
+                        assert np.allclose(
+                            R[..., i], expected, equal_nan=True)
+    # A SortedF is not sorted again
+    sorted_f = SortedF(f[0])
+    thresholds = np.linspace(5., 15., 201)
+    assert np.allclose(
+        reliability_curve(sorted_f, thresholds, maximise=False),
+        reliability_curve(f[0], thresholds, maximise=False))
+
+
+def test_weights():
+    """Tests the weighted fraction of scenarios satisficed"""
+    f = _f()
+    weights = np.random.default_rng(25).uniform(size=f.shape[-1])
+    for thresholds in [np.linspace(6., 14., 9), f[0, 0, np.newaxis]]:
+        for maximise in [True, False]:
+            for nan_policy in ['propagate', 'omit']:
+                with warnings.catch_warnings():
+                    # All-NaN rows
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    R = reliability_curve(
+                        f, thresholds, maximise=maximise,
+                        nan_policy=nan_policy, weights=weights)
+                    for i, threshold in enumerate(thresholds):
+                        expected = common_metrics.starrs_domain(
+                            f, maximise=maximise, threshold=threshold,
+                            nan_policy=nan_policy, weights=weights)
+                        assert np.allclose(
+                            R[..., i], expected, equal_nan=True)
@@ -0,0 +1,288 @@
+"""Contains an accumulator of the moments of performance values.
+
+`Moments` holds the count, mean and sums of powers of deviations from
+the mean (M2, and optionally M3 and M4) of each decision alternative's
+values. These are found in one pass over f: f is read in blocks that
+fit in the CPU cache, the moments of each block are found from the
+block's own mean (which is numerically stable), and the blocks are
+merged with the formulas of Chan, Golub & LeVeque (1979) and Pébay
+(2008). The same merge allows moments to be built chunk by chunk (e.g.
+as simulations complete) and combined from separate calculations.
+
+The moment-based T3 transformations (`t3.f_variance`,
+`t3.f_mean_variance`) use `Moments`, and accept one in place of f.
+Moments are accumulated in float64 (see `precision`), so float32
+performance values are only up-cast a block at a time.
+"""
+
+import numpy as np
+
+from .precision import ACCUMULATOR_DTYPE
+
+
+class Moments:
+    """The moments of each decision alternative's performance values.
+
+    Create with `Moments.from_f`, and add more values with `update` or
+    `merge`.
+
+    Parameters
+    ----------
+    count : np.ndarray, shape=(..., m)
+        The number of values of each decision alternative
+    mean : np.ndarray, shape=(..., m)
+        The mean of each decision alternative's values (0 if there are
+        no values)
+    M2, M3, M4 : np.ndarray, shape=(..., m), optional
+        The sum of the squared, cubed and fourth powers of the
+        deviations from the mean. M3 and M4 are None if not required.
+    """
+    def __init__(self, count, mean, M2, M3=None, M4=None):
+        """Initialize the moments
+        """
+        self.count = count
+        self.mean = mean
+        self.M2 = M2
+        self.M3 = M3
+        self.M4 = M4
+
+    @property
+    def order(self):
+        """int: The highest moment held (2 or 4)"""
+        return 2 if self.M3 is None else 4
+
+    @classmethod
+    def from_f(cls, f, order=2, nan_policy='propagate', block_size=65536):
+        """Finds the moments of performance values in one pass.
+
+        Parameters
+        ----------
+        f : np.ndarray, shape=(..., m, n)
+            Transformed performance values, for m decision alternatives
+            and n scenarios, with any leading batch axes.
+        order : {2, 4}, optional
+            The highest moment required.
+            (The default is 2, i.e. the mean and variance).
+        nan_policy : {'propagate', 'omit'}, optional
+            How to handle NaN values in f (e.g. failed simulations).
+            (The default is 'propagate', which gives NaN moments if any
+            value for a decision alternative is NaN. 'omit' uses the
+            values that are not NaN).
+        block_size : int, optional
+            The number of values of f in each block.
+            (The default is 65536, i.e. 512 kB of float64 values).
+
+        Returns
+        -------
+        Moments
+            The moments of each decision alternative's values
+        """
+        assert order in [2, 4]
+        f = np.asarray(f)
+        if f.ndim < 2:
+            f = np.reshape(f, (1, -1))
+        if f.ndim > 2:
+            # The batches of decision alternatives as one
+            moments = cls.from_f(
+                np.reshape(f, (-1, f.shape[-1])), order=order,
+                nan_policy=nan_policy, block_size=block_size)
+            return moments.reshape(f.shape[:-1])
+        m, n = f.shape
+        n_cols = min(n, max(256, block_size // max(m, 1)))
+        n_rows = max(1, block_size // max(n_cols, 1))
+        row_moments = []
+        for row in range(0, m, n_rows):
+            moments = None
+            for col in range(0, n, n_cols):
+                block_moments = _block_moments(
+                    f[row:row + n_rows, col:col + n_cols], order, nan_policy)
+                moments = (
+                    block_moments if moments is None
+                    else moments.merge(block_moments))
+            if moments is None:
+                # No scenarios
+                moments = _block_moments(
+                    f[row:row + n_rows], order, nan_policy)
+            row_moments.append(moments)
+        if len(row_moments) == 1:
+            return row_moments[0]
+        return cls.concatenate(row_moments)
+
+    @classmethod
+    def concatenate(cls, moments):
+        """Joins the moments of different decision alternatives.
+
+        Parameters
+        ----------
+        moments : list of Moments
+            The moments of each group of decision alternatives, with the
+            same order and any batch axes
+
+        Returns
+        -------
+        Moments
+            The moments of all of the decision alternatives, in order
+        """
+        fields = ['count', 'mean', 'M2']
+        if all(item.M3 is not None for item in moments):
+            fields += ['M3', 'M4']
+        return cls(*[
+            np.concatenate(
+                [getattr(item, field) for item in moments], axis=-1)
+            for field in fields])
+
+    def reshape(self, shape):
+        """Gets the moments with the decision alternatives reshaped.
+
+        Parameters
+        ----------
+        shape : tuple of int
+            The new shape, e.g. (k, m) for k batches of m decision
+            alternatives
+
+        Returns
+        -------
+        Moments
+            The moments, as views of these moments
+        """
+        return Moments(*[
+            None if value is None else np.reshape(value, shape)
+            for value in [self.count, self.mean, self.M2, self.M3, self.M4]])
+
+    def update(self, f, nan_policy='propagate'):
+        """Adds performance values in new scenarios.
+
+        Parameters
+        ----------
+        f : np.ndarray, shape=(..., m, c)
+            Transformed performance values, for the m decision
+            alternatives and c new scenarios.
+        nan_policy : {'propagate', 'omit'}, optional
+            How to handle NaN values in f (see `from_f`).
+            (The default is 'propagate').
+
+        Returns
+        -------
+        Moments
+            These moments, updated
+        """
+        return self.merge(
+            Moments.from_f(f, order=self.order, nan_policy=nan_policy))
+
+    def merge(self, other):
+        """Adds the moments of the same decision alternatives' other values.
+
+        Parameters
+        ----------
+        other : Moments
+            The moments of other values
+
+        Returns
+        -------
+        Moments
+            These moments, updated
+        """
+        n_a, n_b = self.count, other.count
+        n = n_a + n_b
+        # Avoid dividing by 0 if neither has values (the numerators are 0)
+        n_safe = np.maximum(n, 1)
+        delta = other.mean - self.mean
+        mean = self.mean + delta * (n_b / n_safe)
+        M2 = self.M2 + other.M2 + np.square(delta) * (n_a * n_b / n_safe)
+        if self.M3 is not None and other.M3 is not None:
+            self.M4 = (
+                self.M4 + other.M4
+                + delta ** 4 * n_a * n_b * (n_a ** 2 - n_a * n_b + n_b ** 2)
+                / n_safe ** 3
+                + 6. * np.square(delta)
+                * (n_a ** 2 * other.M2 + n_b ** 2 * self.M2) / n_safe ** 2
+                + 4. * delta * (n_a * other.M3 - n_b * self.M3) / n_safe)
+            self.M3 = (
+                self.M3 + other.M3
+                + delta ** 3 * n_a * n_b * (n_a - n_b) / n_safe ** 2
+                + 3. * delta * (n_a * other.M2 - n_b * self.M2) / n_safe)
+        else:
+            self.M3 = self.M4 = None
+        self.count, self.mean, self.M2 = n, mean, M2
+        return self
+
+    def variance(self, ddof=1):
+        """Gets the variance of each decision alternative's values.
+
+        Parameters
+        ----------
+        ddof : int, optional
+            Delta degrees of freedom.
+            (The default is 1, i.e. the variance of a sample).
+
+        Returns
+        -------
+        np.ndarray, shape=(..., m)
+            The variance, NaN if there are no more than ddof values
+        """
+        dof = self.count - ddof
+        return np.divide(
+            self.M2, dof, out=np.full(self.M2.shape, np.nan), where=dof > 0)
+
+    def std(self, ddof=1):
+        """Gets the standard deviation of each decision alternative's values.
+
+        Parameters
+        ----------
+        ddof : int, optional
+            Delta degrees of freedom.
+            (The default is 1, i.e. the standard deviation of a sample).
+
+        Returns
+        -------
+        np.ndarray, shape=(..., m)
+            The standard deviation
+        """
+        return np.sqrt(self.variance(ddof=ddof))
+
+    def skewness(self):
+        """Gets the (moment) skewness of each decision alternative's values.
+
+        Returns
+        -------
+        np.ndarray, shape=(..., m)
+            The skewness, g1 = sqrt(n) * M3 / M2^1.5
+        """
+        assert self.M3 is not None, 'Requires moments of order 4'
+        return np.sqrt(self.count) * self.M3 / self.M2 ** 1.5
+
+    def kurtosis(self):
+        """Gets the (moment) excess kurtosis of each decision alternative.
+
+        Returns
+        -------
+        np.ndarray, shape=(..., m)
+            The excess kurtosis, g2 = n * M4 / M2^2 - 3
+        """
+        assert self.M4 is not None, 'Requires moments of order 4'
+        return self.count * self.M4 / np.square(self.M2) - 3.
+
+
+def _block_moments(f, order, nan_policy):
+    """Gets the moments of a block of f, from the block's mean"""
+    if nan_policy == 'omit':
+        count = np.count_nonzero(~np.isnan(f), axis=1)
+        mean = np.nansum(f, axis=1, dtype=ACCUMULATOR_DTYPE) / np.maximum(
+            count, 1)
+        total = np.nansum
+    else:
+        count = np.full(f.shape[0], f.shape[1])
+        mean = np.sum(f, axis=1, dtype=ACCUMULATOR_DTYPE) / max(
+            f.shape[1], 1)
+        total = np.sum
+    # In float64, as mean is float64
+    deviations = f - mean[:, np.newaxis]
+    powers = np.square(deviations)
+    M2 = total(powers, axis=1)
+    if order == 2:
+        return Moments(count, mean, M2)
+    powers *= deviations
+    M3 = total(powers, axis=1)
+    powers *= deviations
+    M4 = total(powers, axis=1)
+    return Moments(count, mean, M2, M3, M4)
@@ -0,0 +1,188 @@
+"""Contains helpers for transforming arrays of any array library.
+
+The transformations use the array API standard
+(https://data-apis.org/array-api/) namespace of f, found from its
+`__array_namespace__` method, so that robustness can be calculated from
+the arrays of other libraries (e.g. JAX or Dask arrays) without
+converting them to NumPy arrays. NumPy is the default, and keeps the
+NumPy-only optimisations (`out` buffers, in-place sorting and
+partitioning, `SortedF`, float64 accumulation and `dtype_policy`).
+
+The standard does not include NaN-aware reductions, medians or
+percentiles, so these are built from the standard's functions here.
+They assume that NaN values are sorted to the end of each row, as by
+NumPy, JAX and Dask.
+"""
+
+import numpy as np
+
+
+def array_namespace(*arrays):
+    """Gets the array API namespace of arrays.
+
+    Parameters
+    ----------
+    *arrays
+        Arrays (or other objects, e.g. floats or lists, which are
+        ignored)
+
+    Returns
+    -------
+    module
+        The namespace of the first array with an `__array_namespace__`
+        method, OR numpy if there are none (e.g. NumPy < 2 arrays)
+    """
+    for x in arrays:
+        if hasattr(x, '__array_namespace__'):
+            return x.__array_namespace__()
+    return np
+
+
+def float_dtype(xp, x):
+    """Gets the floating point type for the transformed values of x"""
+    if x.dtype in [xp.float32, xp.float64]:
+        return x.dtype
+    return xp.float64
+
+
+def astype(xp, x, dtype):
+    """Casts x to dtype"""
+    if xp is np:
+        return x.astype(dtype, copy=False)
+    return xp.astype(x, dtype)
+
+
+def where(xp, condition, x1, x2):
+    """Selects from x1 where condition is True, else x2.
+
+    x1 or x2 may be a Python scalar, which the standard's `where` does
+    not accept.
+    """
+    if not hasattr(x1, 'dtype'):
+        x1 = xp.asarray(x1, dtype=x2.dtype)
+    if not hasattr(x2, 'dtype'):
+        x2 = xp.asarray(x2, dtype=x1.dtype)
+    return xp.where(condition, x1, x2)
+
+
+def concat(xp, arrays, axis=-1):
+    """Joins arrays along an axis"""
+    if xp is np:
+        return np.concatenate(arrays, axis=axis)
+    return xp.concat(arrays, axis=axis)
+
+
+def moveaxis(xp, x, source, destination):
+    """Moves an axis of x to a new position"""
+    if xp is np:
+        return np.moveaxis(x, source, destination)
+    axes = list(range(x.ndim))
+    axes.insert(destination % x.ndim, axes.pop(source % x.ndim))
+    return xp.permute_dims(x, tuple(axes))
+
+
+def count_valid(xp, f, keepdims=False):
+    """Counts the values of each row of f that are not NaN"""
+    return xp.sum(
+        astype(xp, ~xp.isnan(f), xp.int64), axis=-1, keepdims=keepdims)
+
+
+def nan_reduce(xp, func, f, axis=-1, keepdims=False):
+    """Finds the minimum or maximum of f, ignoring NaN values.
+
+    Parameters
+    ----------
+    xp : module
+        The array namespace of f
+    func : {xp.min, xp.max}
+        The reduction
+    f : array, shape=(..., m, n)
+        The values to reduce
+    axis : int, optional
+        The axis to reduce.
+        (The default is -1).
+    keepdims : bool, optional
+        Whether to keep the reduced axis, with length 1.
+        (The default is False).
+
+    Returns
+    -------
+    array
+        The reduced values, NaN if all values are NaN
+    """
+    if xp is np:
+        ufunc = np.fmin if func is np.min else np.fmax
+        return ufunc.reduce(f, axis=axis, keepdims=keepdims)
+    missing = xp.isnan(f)
+    fill = float('inf') if func is xp.min else float('-inf')
+    reduced = func(where(xp, missing, fill, f), axis=axis, keepdims=keepdims)
+    return where(
+        xp, xp.all(missing, axis=axis, keepdims=keepdims), float('nan'),
+        reduced)
+
+
+def select(xp, sorted_f, idxs):
+    """Selects values at positions of each row of sorted values.
+
+    Parameters
+    ----------
+    xp : module
+        The array namespace of sorted_f
+    sorted_f : array, shape=(..., m, n)
+        The values of each row, sorted
+    idxs : array, shape=(..., m, k), dtype=int
+        The positions to select from each row
+
+    Returns
+    -------
+    array, shape=(..., m, k)
+        The selected values
+    """
+    # The standard has no take_along_axis, so match each position
+    positions = xp.arange(sorted_f.shape[-1])
+    matches = idxs[..., xp.newaxis] == positions
+    return xp.sum(
+        where(xp, matches, sorted_f[..., xp.newaxis, :], 0.), axis=-1)
+
+
+def nearest_positions(xp, n, percentiles):
+    """Gets the position of each 'nearest' percentile in n sorted values.
+
+    The same as `order_stats.nearest_idxs`, for arrays of n.
+    """
+    percentiles = xp.asarray(percentiles, dtype=xp.float64)
+    n = astype(xp, n, xp.float64)
+    return astype(xp, xp.round((n - 1.) * percentiles), xp.int64)
+
+
+def median(xp, f, nan_policy='propagate'):
+    """Finds the median of each row of f.
+
+    Parameters
+    ----------
+    xp : module
+        The array namespace of f
+    f : array, shape=(..., m, n)
+        The values
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values (see `SortedF.median`).
+        (The default is 'propagate').
+
+    Returns
+    -------
+    array, shape=(..., m, 1)
+        The median of each row
+    """
+    sorted_f = xp.sort(f, axis=-1)
+    if nan_policy != 'omit':
+        n = f.shape[-1]
+        middle = xp.take(sorted_f, xp.asarray([(n - 1) // 2, n // 2]), axis=-1)
+        median_f = xp.mean(middle, axis=-1, keepdims=True)
+        return where(
+            xp, xp.any(xp.isnan(f), axis=-1, keepdims=True), float('nan'),
+            median_f)
+    # The middle value(s) of the values that are not NaN
+    n = count_valid(xp, f, keepdims=True)
+    middle = select(xp, sorted_f, concat(xp, [(n - 1) // 2, n // 2]))
+    median_f = xp.mean(middle, axis=-1, keepdims=True)
+    return where(xp, n == 0, float('nan'), median_f)
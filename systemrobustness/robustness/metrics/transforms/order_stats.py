@@ -0,0 +1,393 @@
+"""Contains the order statistics of performance values.
+
+Many robustness metrics use order statistics of each decision
+alternative's performance values: the worst- and best-cases, the
+median, percentiles and the worst half of the scenarios. `SortedF`
+sorts the values of each decision alternative once, so that these can
+be selected from the sorted values rather than re-sorting (or
+re-scanning) for each transformation and robustness metric.
+
+The T1 and T2 transformations, and so the robustness metrics, accept a
+`SortedF` in place of f. Transformations that keep the order of each
+decision alternative's values (`t1.identity`, `t1.regret_from_median`)
+return a `SortedF`, and other transformations use the performance
+values in their original order, giving identical results.
+"""
+
+import numpy as np
+
+
+class SortedF:
+    """Performance values with each decision alternative's values sorted.
+
+    Parameters
+    ----------
+    f : np.ndarray, shape=(m, n)
+        Performance values, f, for m decision alternatives
+        and n scenarios.
+
+    Attributes
+    ----------
+    f : np.ndarray, shape=(m, n)
+        The performance values, in their original order
+    values : np.ndarray, shape=(m, n)
+        The performance values of each decision alternative sorted from
+        worst to best, with any NaN values at the end
+    order : np.ndarray, shape=(m, n), dtype=int
+        The scenario of each sorted value, i.e. `values` is
+        `np.take_along_axis(f, order, axis=1)`. If `values` are given
+        without an order, it is only found (by sorting again) if used.
+    n_valid : np.ndarray, shape=(m, ), dtype=int
+        The number of values of each decision alternative that are
+        not NaN
+
+    Examples
+    --------
+    >>> sorted_f = SortedF(f)
+    >>> R_skew = common_metrics.percentile_skew(sorted_f)
+    >>> R_kurtosis = common_metrics.percentile_kurtosis(sorted_f)
+    >>> R_deviations = common_metrics.undesirable_deviations(sorted_f)
+    """
+    def __init__(self, f, values=None, order=None):
+        """Sort the performance values
+        """
+        f = np.asarray(f)
+        if f.ndim != 2:
+            f = np.reshape(f, (1, -1))
+        if order is None and values is None:
+            order = np.argsort(f, axis=1, kind='stable')
+        if values is None:
+            values = np.take_along_axis(f, order, axis=1)
+        self.f = f
+        self.values = values
+        self._order = order
+        # NaN values are sorted to the end, so only rows ending in NaN
+        # are counted
+        self.n_valid = np.full(f.shape[0], f.shape[1])
+        if f.shape[1]:
+            has_nan = np.isnan(values[:, -1])
+            if np.any(has_nan):
+                self.n_valid[has_nan] = np.count_nonzero(
+                    ~np.isnan(values[has_nan]), axis=1)
+
+    def __array__(self, dtype=None, copy=None):
+        """Gets the performance values in their original order"""
+        return self.f if dtype is None else self.f.astype(dtype)
+
+    def __getitem__(self, key):
+        """Indexes the performance values in their original order"""
+        return self.f[key]
+
+    @property
+    def order(self):
+        """np.ndarray: The scenario of each sorted value"""
+        if self._order is None:
+            self._order = np.argsort(self.f, axis=1, kind='stable')
+        return self._order
+
+    @property
+    def shape(self):
+        """tuple: The number of decision alternatives and scenarios"""
+        return self.f.shape
+
+    @property
+    def ndim(self):
+        """int: The number of dimensions (2)"""
+        return self.f.ndim
+
+    @property
+    def dtype(self):
+        """numpy.dtype: The data type of the performance values"""
+        return self.f.dtype
+
+    def minimum(self, nan_policy='propagate'):
+        """Gets the worst value of each decision alternative.
+
+        Parameters
+        ----------
+        nan_policy : {'propagate', 'omit'}, optional
+            How to handle NaN values (see `t2.worst_case`).
+            (The default is 'propagate').
+
+        Returns
+        -------
+        np.ndarray, shape=(m, )
+            The worst value of each decision alternative
+        """
+        return self._mask(self.values[:, 0].copy(), nan_policy)
+
+    def maximum(self, nan_policy='propagate'):
+        """Gets the best value of each decision alternative.
+
+        Parameters
+        ----------
+        nan_policy : {'propagate', 'omit'}, optional
+            How to handle NaN values (see `t2.best_case`).
+            (The default is 'propagate').
+
+        Returns
+        -------
+        np.ndarray, shape=(m, )
+            The best value of each decision alternative
+        """
+        if nan_policy != 'omit':
+            # NaN values are sorted to the end
+            return self.values[:, -1].copy()
+        idxs = self.n_valid[:, np.newaxis] - 1
+        return self._select(idxs)[:, 0]
+
+    def median(self, nan_policy='propagate'):
+        """Gets the median value of each decision alternative.
+
+        The same as `numpy.median` (or `numpy.nanmedian` if omitting
+        NaN values).
+
+        Parameters
+        ----------
+        nan_policy : {'propagate', 'omit'}, optional
+            How to handle NaN values.
+            (The default is 'propagate', which gives NaN if any value
+            of a decision alternative is NaN. 'omit' uses the values
+            that are not NaN).
+
+        Returns
+        -------
+        np.ndarray, shape=(m, )
+            The median value of each decision alternative
+        """
+        n = self._n(nan_policy)[:, np.newaxis]
+        # The middle value, or the mean of the two middle values
+        idxs = np.concatenate(((n - 1) // 2, n // 2), axis=1)
+        return self._mask(np.mean(self._select(idxs), axis=1), nan_policy)
+
+    def quantiles(
+            self,
+            percentiles,
+            nan_policy='propagate',
+            weights=None,
+            return_index=False,
+            weights_kind='probability'):
+        """Gets percentiles of each decision alternative.
+
+        Uses 'nearest' percentiles (see `t2.select_percentiles`), of the
+        values repeated by their frequency if the scenarios are weighted
+        (see `frequencies`).
+
+        Parameters
+        ----------
+        percentiles : np.ndarray, shape=(n', ), dtype=float
+            Which percentiles to select
+        nan_policy : {'propagate', 'omit'}, optional
+            How to handle NaN values (see `t2.select_percentiles`).
+            (The default is 'propagate').
+        weights : np.ndarray, shape=(n, ), optional
+            The weight of each scenario, in the original order.
+            (The default is None, i.e. equally likely scenarios).
+        return_index : bool, optional
+            Whether to also return the scenario of each percentile
+            (see `scenarios`).
+            (The default is False).
+        weights_kind : {'probability', 'frequency'}, optional
+            What the weights are (see `frequencies`).
+            (The default is 'probability').
+
+        Returns
+        -------
+        np.ndarray, shape=(m, n')
+            The selected percentiles of each decision alternative
+        np.ndarray, shape=(m, n'), dtype=int
+            The scenario of each percentile, only if `return_index`
+        """
+        if weights is not None:
+            idxs = self._weighted_idxs(
+                np.reshape(percentiles, -1), weights, weights_kind)
+        else:
+            n = self._n(nan_policy)[:, np.newaxis]
+            idxs = nearest_idxs(n, np.asarray(percentiles))
+        _f = self._mask(self._select(idxs), nan_policy)
+        if return_index:
+            return _f, self.scenarios(idxs, nan_policy=nan_policy)
+        return _f
+
+    def cumulative_weights(self, weights, weights_kind='probability'):
+        """Gets the total weight of the sorted values up to each position.
+
+        Parameters
+        ----------
+        weights : np.ndarray, shape=(n, )
+            The weight of each scenario, in the original order
+        weights_kind : {'probability', 'frequency'}, optional
+            What the weights are (see `frequencies`).
+            (The default is 'probability').
+
+        Returns
+        -------
+        np.ndarray, shape=(m, n + 1)
+            The total frequency (see `frequencies`) of the first i
+            sorted values of each decision alternative at position i,
+            excluding NaN values
+        """
+        sorted_weights = frequencies(weights, weights_kind)[self.order]
+        # NaN values (sorted to the end) have no weight
+        sorted_weights[
+            np.arange(self.shape[1]) >= self.n_valid[:, np.newaxis]] = 0.
+        cumulative = np.zeros((self.shape[0], self.shape[1] + 1))
+        np.cumsum(sorted_weights, axis=1, out=cumulative[:, 1:])
+        return cumulative
+
+    def scenarios(self, idxs, nan_policy='propagate'):
+        """Gets the scenario of the sorted values at positions of each row.
+
+        Parameters
+        ----------
+        idxs : np.ndarray, shape=(m, n'), dtype=int
+            The positions in the sorted values of each decision
+            alternative, e.g. of its percentiles
+        nan_policy : {'propagate', 'omit'}, optional
+            How NaN values were handled when selecting the values at
+            idxs (see `t2.worst_case`).
+            (The default is 'propagate').
+
+        Returns
+        -------
+        np.ndarray, shape=(m, n'), dtype=int
+            The scenario of each selected value. If a decision
+            alternative's values are selected as NaN, they are from a
+            scenario with a NaN value, or -1 if omitting NaN values and
+            it has no values.
+        """
+        idxs = np.clip(idxs, 0, max(self.shape[1] - 1, 0))
+        scenarios = np.take_along_axis(self.order, idxs, axis=1)
+        if nan_policy == 'omit':
+            scenarios[self.n_valid == 0] = -1
+        else:
+            # NaN values are sorted to the end
+            missing = self.n_valid < self.shape[1]
+            scenarios[missing] = self.order[missing, -1:]
+        return scenarios
+
+    def negative(self):
+        """Negates the performance values, keeping them sorted.
+
+        Returns
+        -------
+        SortedF
+            The sorted values of -f
+        """
+        # Reverse the values that are not NaN, keeping NaN at the end
+        positions = np.arange(self.shape[1])
+        n = self.n_valid[:, np.newaxis]
+        idxs = np.where(positions < n, n - 1 - positions, positions)
+        return SortedF(
+            np.negative(self.f),
+            values=np.negative(np.take_along_axis(self.values, idxs, axis=1)),
+            order=np.take_along_axis(self.order, idxs, axis=1))
+
+    def subtract(self, values):
+        """Subtracts a value from each decision alternative's values.
+
+        Parameters
+        ----------
+        values : np.ndarray, shape=(m, 1)
+            The value to subtract from each decision alternative
+
+        Returns
+        -------
+        SortedF
+            The sorted values of f - values
+        """
+        # Subtracting the same value keeps the values sorted
+        return SortedF(
+            np.subtract(self.f, values),
+            values=np.subtract(self.values, values),
+            order=self._order)
+
+    def _n(self, nan_policy):
+        """Gets the number of values to select from for each row"""
+        if nan_policy == 'omit':
+            return self.n_valid
+        return np.full(self.shape[0], self.shape[1])
+
+    def _weighted_idxs(self, percentiles, weights, weights_kind):
+        """Gets the position of each weighted 'nearest' percentile"""
+        cumulative = self.cumulative_weights(weights, weights_kind)
+        # The nearest rank in the values repeated by their frequency, which
+        # is in the first value whose repeats reach past it
+        ranks = nearest_idxs(
+            cumulative[:, -1:], np.asarray(percentiles)).astype(np.float64)
+        # Offset each row past the last, so all rows are searched at once
+        rows = np.arange(self.shape[0])[:, np.newaxis]
+        offsets = rows * (np.max(cumulative, initial=0.) + 1.)
+        idxs = np.searchsorted(
+            np.ravel(cumulative[:, 1:] + offsets), ranks + offsets,
+            side='right') - rows * self.shape[1]
+        return np.minimum(idxs, np.maximum(self.n_valid, 1)[:, np.newaxis] - 1)
+
+    def _select(self, idxs):
+        """Selects the sorted values at positions idxs of each row"""
+        idxs = np.clip(idxs, 0, max(self.shape[1] - 1, 0))
+        return np.take_along_axis(self.values, idxs, axis=1)
+
+    def _mask(self, _f, nan_policy):
+        """Sets rows of _f to NaN if they have a NaN value (or no values)"""
+        if nan_policy == 'omit':
+            missing = self.n_valid == 0
+        else:
+            missing = self.n_valid < self.shape[1]
+        if np.any(missing):
+            _f[missing] = np.nan
+        return _f
+
+
+def frequencies(weights, weights_kind='probability'):
+    """Gets scenario weights as the number of times each scenario occurs.
+
+    Probabilities (or relative frequencies) are rescaled to sum to the
+    number of scenarios, so that equal weights are each one occurrence
+    and weights that are multiples of each other are the same. Like
+    the `fweights` of `numpy.cov`, frequencies (e.g. the counts from
+    `t2.compress_scenarios`) are the number of times each scenario
+    occurs, so that weighted values are the same as the values repeated
+    that many times.
+
+    Parameters
+    ----------
+    weights : np.ndarray, shape=(n, )
+        The weight of each scenario
+    weights_kind : {'probability', 'frequency'}, optional
+        Whether the weights are probabilities (or relative
+        frequencies), or the number of times each scenario occurs.
+        (The default is 'probability').
+
+    Returns
+    -------
+    np.ndarray, shape=(n, ), dtype=float64
+        The frequency of each scenario
+    """
+    assert weights_kind in ['probability', 'frequency'], (
+        'weights_kind must be \'probability\' or \'frequency\'')
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights_kind == 'frequency':
+        return weights
+    return weights * (weights.size / np.sum(weights))
+
+
+def nearest_idxs(n, percentiles):
+    """Gets the index of each percentile in n sorted values.
+
+    Uses the same 'nearest' rounding as `numpy.quantile`.
+
+    Parameters
+    ----------
+    n : int or np.ndarray, dtype=int
+        The number of values
+    percentiles : np.ndarray, shape=(n', ), dtype=float
+        Which percentiles to select (see `t2.select_percentiles`)
+
+    Returns
+    -------
+    np.ndarray, dtype=int
+        The index of each percentile in the sorted values.
+        Broadcast from the shapes of `n` and `percentiles`.
+    """
+    return np.around((n - 1) * percentiles).astype(np.intp)
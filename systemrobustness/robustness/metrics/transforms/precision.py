@@ -0,0 +1,124 @@
+"""Contains the floating point (dtype) policy of the transformations.
+
+By default, the transformations work in the floating point type of the
+performance values: float32 values give float32 transformed values and
+robustness, and are never up-cast to float64 (other types, e.g. ints,
+are transformed in float64). `dtype_policy` sets the type to work in,
+e.g. to calculate robustness from float64 simulation outputs in float32,
+halving the memory and bandwidth used:
+
+>>> with dtype_policy(np.float32):
+...     R = common_metrics.mean_variance(f)
+
+Reductions (the means, sums and moments of `t3`) are accumulated in
+float64 whatever the policy, and the results are then rounded to the
+working type.
+
+Error bounds, with u = 2**-24 (about 6e-8) the unit roundoff of float32:
+    - casting each performance value to float32 has a relative error of
+      at most u;
+    - the T1 transformations (a negation, one subtraction or a
+      comparison) add at most u relative error to each value, so a
+      regret has an absolute error of at most about 2u(|f| + |best f|);
+    - the T2 transformations select values, adding no error;
+    - the T3 means and sums, accumulated in float64, have a relative
+      error of at most about u (their final rounding) as well as the
+      error of their inputs, rather than growing with log2(n)u as for
+      float32 accumulation; and
+    - variances and standard deviations, also accumulated in float64,
+      have a relative error of about u times (1 + |mean| / std) from
+      the rounding of their inputs.
+Robustness values of decision alternatives that differ by less than
+about 1e-6 (relative) should be treated as ties in float32.
+"""
+
+import contextlib
+import contextvars
+import numpy as np
+
+# The type that reductions are accumulated in
+ACCUMULATOR_DTYPE = np.dtype(np.float64)
+
+_policy = contextvars.ContextVar('dtype_policy', default=None)
+
+
+@contextlib.contextmanager
+def dtype_policy(dtype):
+    """Sets the floating point type that the transformations work in.
+
+    Applies to the current thread (or asyncio task). `f_to_R` passes
+    the policy on to its parallel workers.
+
+    Parameters
+    ----------
+    dtype : numpy.dtype or None
+        numpy.float32 or numpy.float64, OR None to work in the type of
+        the performance values (the default policy)
+
+    Examples
+    --------
+    >>> with dtype_policy(np.float32):
+    ...     R = f_to_R(f_df, R_dict)
+    """
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        assert dtype in [np.float32, np.float64], (
+            'dtype must be float32, float64 or None')
+    token = _policy.set(dtype)
+    try:
+        yield dtype
+    finally:
+        _policy.reset(token)
+
+
+def get_dtype_policy():
+    """Gets the floating point type set by `dtype_policy`.
+
+    Returns
+    -------
+    numpy.dtype or None
+        The type that the transformations work in, OR None if they work
+        in the type of the performance values
+    """
+    return _policy.get()
+
+
+def working_dtype(dtype):
+    """Gets the floating point type to transform values of a type in.
+
+    Parameters
+    ----------
+    dtype : numpy.dtype
+        The type of the performance values
+
+    Returns
+    -------
+    numpy.dtype
+        The type set by `dtype_policy`, OR `dtype` if it is a floating
+        point type, OR numpy.float64
+    """
+    policy = _policy.get()
+    if policy is not None:
+        return policy
+    dtype = np.dtype(dtype)
+    return dtype if np.issubdtype(dtype, np.floating) else ACCUMULATOR_DTYPE
+
+
+def as_working(f):
+    """Casts performance values to the type set by `dtype_policy`.
+
+    Parameters
+    ----------
+    f : np.ndarray
+        Performance values
+
+    Returns
+    -------
+    np.ndarray
+        `f` (not copied) if there is no policy or it already has the
+        policy's type, OR a copy of f with the policy's type
+    """
+    policy = _policy.get()
+    if policy is None or f.dtype == policy:
+        return f
+    return f.astype(policy)
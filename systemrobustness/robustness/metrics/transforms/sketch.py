@@ -0,0 +1,235 @@
+"""Contains a mergeable sketch of the quantiles of performance values.
+
+For very large numbers of scenarios, `QuantileSketch` summarises each
+decision alternative's performance values in bounded memory, so that
+percentiles (see `t2.select_percentiles`) can be approximated without
+holding all of the values. Values are added in chunks of scenarios, and
+sketches built separately (e.g. by different processes) can be merged.
+
+The sketch is a deterministic version of the KLL sketch (Karnin, Lang &
+Liberty, 2016; Manku, Rajagopalan & Lindsay, 1998). Values are held in
+levels, where each value at level h stands for 2^h of the original
+values. When a level holds `k` or more values, they are sorted and every
+other value is promoted to the next level. Each such compaction at level
+h changes the rank of any value by at most 2^h, so the sketch keeps an
+exact upper bound of the rank error of its percentiles.
+"""
+
+import numpy as np
+
+from .order_stats import nearest_idxs
+
+
+class QuantileSketch:
+    """A mergeable sketch of the quantiles of each decision alternative.
+
+    Parameters
+    ----------
+    m : int
+        The number of decision alternatives
+    k : int, optional
+        The number of values held at each level before compacting.
+        Larger values of k give a smaller rank error, using more memory
+        (at most about k*log2(n/k) values for each decision alternative).
+        (The default is 1024. See `QuantileSketch.for_error`).
+
+    Attributes
+    ----------
+    n : int
+        The number of performance values (scenarios) added for each
+        decision alternative
+
+    Examples
+    --------
+    >>> sketch = QuantileSketch(f.shape[0])
+    >>> for f_chunk in np.array_split(f, 100, axis=1):
+    ...     sketch.update(f_chunk)
+    >>> p10_p90 = t2.select_percentiles(sketch, [0.1, 0.9])
+    >>> sketch.rank_error
+    """
+    def __init__(self, m, k=1024):
+        """Initialize an empty sketch
+        """
+        assert k >= 2, 'k must be at least 2'
+        self.m = m
+        self.k = k
+        self.n = 0
+        self._levels = []
+        self._parities = []
+        self._error = 0
+        self._nan = np.zeros(m, dtype=bool)
+
+    @classmethod
+    def for_error(cls, m, epsilon, n, chunk_size=None):
+        """Creates a sketch with a rank error of at most epsilon.
+
+        Parameters
+        ----------
+        m : int
+            The number of decision alternatives
+        epsilon : float
+            The largest acceptable rank error, as a fraction of n
+        n : int
+            The number of performance values that will be added for
+            each decision alternative
+        chunk_size : int, optional
+            The number of performance values in each call to `update`.
+            (The default is None, which assumes a single call).
+
+        Returns
+        -------
+        QuantileSketch
+            An empty sketch with the smallest k (a power of 2) giving a
+            rank error of at most `epsilon`
+        """
+        k = 2
+        while k < n and _rank_error(k, n, chunk_size or n) > epsilon * n:
+            k *= 2
+        return cls(m, k=k)
+
+    @property
+    def rank_error(self):
+        """float: The maximum rank error, as a fraction of n.
+
+        The rank of each approximate percentile among the performance
+        values differs from the rank of the exact percentile by at most
+        `rank_error * n`. 0 if the values have not been compacted.
+        """
+        return self._error / self.n if self.n else 0.
+
+    @property
+    def size(self):
+        """int: The number of values held for each decision alternative"""
+        return sum(level.shape[1] for level in self._levels)
+
+    def update(self, f):
+        """Adds performance values in new scenarios.
+
+        Parameters
+        ----------
+        f : np.ndarray, shape=(m, c)
+            Performance values, f, for the m decision alternatives
+            and c new scenarios.
+        """
+        f = np.asarray(f, dtype=np.result_type(np.asarray(f).dtype, 1.))
+        if f.ndim != 2:
+            f = np.reshape(f, (self.m, -1))
+        assert f.shape[0] == self.m
+        self._nan |= np.isnan(f).any(axis=1)
+        self.n += f.shape[1]
+        self._add(0, f)
+        self._compact()
+
+    def merge(self, other):
+        """Adds the performance values summarised by another sketch.
+
+        Parameters
+        ----------
+        other : QuantileSketch
+            A sketch of the same decision alternatives in other
+            scenarios, with the same k
+
+        Returns
+        -------
+        QuantileSketch
+            This sketch, updated
+        """
+        assert other.m == self.m and other.k == self.k
+        for h, level in enumerate(other._levels):
+            self._add(h, level)
+        self.n += other.n
+        self._error += other._error
+        self._nan |= other._nan
+        self._compact()
+        return self
+
+    def negative(self):
+        """Gets a sketch of the negated performance values.
+
+        Returns
+        -------
+        QuantileSketch
+            A sketch of -f, with the same rank error
+        """
+        negative = QuantileSketch(self.m, k=self.k)
+        negative.n = self.n
+        negative._levels = [np.negative(level) for level in self._levels]
+        negative._parities = list(self._parities)
+        negative._error = self._error
+        negative._nan = self._nan.copy()
+        return negative
+
+    def quantiles(self, percentiles):
+        """Gets approximate percentiles of each decision alternative.
+
+        Uses 'nearest' percentiles (see `t2.select_percentiles`), and
+        gives the exact percentiles if `rank_error` is 0.
+
+        Parameters
+        ----------
+        percentiles : np.ndarray, shape=(n', ), dtype=float
+            Which percentiles to select
+
+        Returns
+        -------
+        np.ndarray, shape=(m, n')
+            The approximate percentiles of each decision alternative,
+            NaN if any of its values are NaN
+        """
+        assert self.n > 0, 'No performance values have been added'
+        values = np.concatenate(self._levels, axis=1)
+        weights = np.concatenate([
+            np.full(level.shape[1], 2 ** h)
+            for h, level in enumerate(self._levels)])
+        order = np.argsort(values, axis=1, kind='stable')
+        values = np.take_along_axis(values, order, axis=1)
+        # The rank of the last of the original values at each position
+        ranks = np.cumsum(weights[order], axis=1) - 1
+        idxs = nearest_idxs(self.n, np.asarray(percentiles))
+        positions = np.count_nonzero(
+            ranks[:, :, np.newaxis] < idxs, axis=1)
+        _f = np.take_along_axis(values, positions, axis=1)
+        _f[self._nan] = np.nan
+        return _f
+
+    def _add(self, h, values):
+        """Adds values to level h"""
+        while len(self._levels) <= h:
+            self._levels.append(np.empty((self.m, 0)))
+            self._parities.append(0)
+        self._levels[h] = np.concatenate((self._levels[h], values), axis=1)
+
+    def _compact(self):
+        """Promotes half of the values of each full level"""
+        h = 0
+        while h < len(self._levels):
+            if self._levels[h].shape[1] >= self.k:
+                values = np.sort(self._levels[h], axis=1)
+                n_paired = values.shape[1] - values.shape[1] % 2
+                # Alternate between keeping the lower and upper value of
+                # each pair, so that errors tend to cancel out
+                promoted = values[:, self._parities[h]:n_paired:2]
+                self._parities[h] ^= 1
+                self._levels[h] = values[:, n_paired:]
+                self._error += 2 ** h
+                self._add(h + 1, promoted)
+            h += 1
+
+
+def _rank_error(k, n, chunk_size):
+    """Gets the rank error of a sketch after adding n values in chunks"""
+    sizes = []
+    error = 0
+    for start in range(0, n, chunk_size):
+        sizes = sizes or [0]
+        sizes[0] += min(chunk_size, n - start)
+        h = 0
+        while h < len(sizes):
+            if sizes[h] >= k:
+                if h + 1 == len(sizes):
+                    sizes.append(0)
+                sizes[h + 1] += sizes[h] // 2
+                sizes[h] %= 2
+                error += 2 ** h
+            h += 1
+    return error
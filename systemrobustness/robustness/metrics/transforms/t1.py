@@ -8,12 +8,27 @@ In general, T1 will take one of 3 forms:
 It is expected that after T1, the aim is to maximise performance.
 i.e. Even for the identity transform, if minimising, then values
 will be returned as negative.
+
+Scenarios are the last axis of f and decision alternatives the one
+before it, so that f may have leading batch axes (e.g. shape (k, m, n)
+for k sets of scenarios or performance metrics).
+
+f may be an array of any library supporting the array API standard
+(see `namespace`), in which case the transformed values are arrays of
+the same library and `out` is not supported.
 """
 
+import warnings
+
 import numpy as np
 
+from . import namespace
+from .order_stats import SortedF
+from .precision import as_working, working_dtype
+from .sketch import QuantileSketch
+
 
-def identity(f, maximise=True):
+def identity(f, maximise=True, nan_policy='propagate', out=None):
     """Keeps values the same unless minimising.
 
     If minimising, values are made negative so that the aim
@@ -21,25 +36,43 @@ def identity(f, maximise=True):
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, SortedF or QuantileSketch, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f. NaN values are kept as NaN
+        with either policy. Provided for consistency with other
+        transformations.
+        (The default is 'propagate').
+    out : np.ndarray, shape=(..., m, n), optional
+        An array to write the transformed values to, e.g. a buffer from
+        a `Workspace`. Must have a floating point dtype.
+        (The default is None, which allocates a new array).
 
     Returns
     -------
-    np.ndarray, shape=(m, n)
+    np.ndarray, shape=(..., m, n)
         Transformed performance values, f', for m decision alternatives
         and n scenarios
     """
+    if isinstance(f, (SortedF, QuantileSketch)) and out is None:
+        return f if maximise else f.negative()
     _f = _prepare_f(f)
-    return _f if maximise else -_f
+    if out is None:
+        # Also for arrays of other libraries
+        return _f if maximise else -_f
+    if maximise:
+        np.copyto(out, _f)
+        return out
+    return np.negative(_f, out=out)
 
 
-def regret_from_best_da(f, maximise=True):
+def regret_from_best_da(
+        f, maximise=True, best_f=None, nan_policy='propagate', out=None):
     """T1: Regret from best decision alternative
 
     Returns negative regret, so that from this point on,
@@ -47,28 +80,61 @@ def regret_from_best_da(f, maximise=True):
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    best_f : np.ndarray, shape=(..., n), optional
+        The best performance value in each scenario across all decision
+        alternatives, in the same units as f. Allows f to be a subset
+        of the decision alternatives (e.g. when evaluating in chunks).
+        (The default is None, which uses the best of the m decision
+        alternatives in f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN wherever a NaN
+        is used. 'omit' ignores NaN values when comparing
+        decision alternatives or scenarios, and keeps them as NaN).
+    out : np.ndarray, shape=(..., m, n), optional
+        An array to write the transformed values to, e.g. a buffer from
+        a `Workspace`. Must have a floating point dtype.
+        (The default is None, which allocates a new array).
 
     Returns
     -------
-    np.ndarray, shape=(m, n)
+    np.ndarray, shape=(..., m, n)
         Transformed performance values, f', for m decision alternatives
         and n scenarios
     """
     _f = _prepare_f(f)
-    _f = identity(_f, maximise=maximise)
-    best_decision_alternatives = np.amax(_f, axis=0)
-    regret = _f - best_decision_alternatives
+    xp = namespace.array_namespace(_f)
+    if xp is not np:
+        return _regret_from_best_da(xp, _f, maximise, best_f, nan_policy)
+    # Found in the units of f, so that f is not negated into a copy
+    if best_f is not None:
+        best_decision_alternatives = np.expand_dims(
+            _reference(best_f, _f), -2)
+    elif nan_policy == 'omit':
+        best_decision_alternatives = (
+            np.fmax if maximise else np.fmin).reduce(
+                _f, axis=-2, keepdims=True)
+    else:
+        best_decision_alternatives = (
+            np.amax(_f, axis=-2, keepdims=True) if maximise
+            else np.amin(_f, axis=-2, keepdims=True))
+    # Identical to identity(f) - identity(best_f)
+    if maximise:
+        regret = np.subtract(_f, best_decision_alternatives, out=out)
+    else:
+        regret = np.subtract(best_decision_alternatives, _f, out=out)
     return regret
 
 
-def satisficing_regret(f, threshold, maximise=True):
+def satisficing_regret(
+        f, threshold, maximise=True, nan_policy='propagate', out=None):
     """T1: Satisficing regret
 
     For a given decision alternative, this function compares its performance in
@@ -80,22 +146,32 @@ def satisficing_regret(f, threshold, maximise=True):
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
-    threshold : np.ndarray, shape=(n, ) or float
+    threshold : float or np.ndarray, shape=(n, ), (m, 1) or (..., m, n)
         The values to compare the performance values to. i.e. The
         values you would regret not getting, relative to f.
-        Can be a different value for each scenario or one value
-        across all scenarios.
+        Can be a different value for each scenario, each decision
+        alternative, or both, or one value across all scenarios.
+        Broadcast against f rather than expanded to shape (m, n).
     maximise : bool
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f. NaN values are kept as NaN
+        with either policy. Provided for consistency with other
+        transformations.
+        (The default is 'propagate').
+    out : np.ndarray, shape=(..., m, n), optional
+        An array to write the transformed values to, e.g. a buffer from
+        a `Workspace`. Must have a floating point dtype.
+        (The default is None, which allocates a new array).
 
     Returns
     -------
-    np.ndarray, shape=(m, n)
+    np.ndarray, shape=(..., m, n)
         Transformed performance values, f', for m decision alternatives
         and n scenarios
     """
@@ -104,15 +180,20 @@ def satisficing_regret(f, threshold, maximise=True):
     # This will be a number with the aim to be maximised.
     # If the solution has better performance than the threshold,
     # then it will be a positive number
-    regret = regret_from_values(_f, threshold, maximise=maximise)
+    regret = regret_from_values(_f, threshold, maximise=maximise, out=out)
     # In satisficing regret, we only care about the magnitude of
     # failure IF there is a failure. So any performances that are
     # not failures are zeroed out.
-    regret[regret > 0.] = 0.
+    xp = namespace.array_namespace(regret)
+    if xp is not np:
+        # NaN is kept, as NaN > 0 is False
+        return namespace.where(xp, regret > 0., 0., regret)
+    np.minimum(regret, 0., out=regret)
     return regret
 
 
-def regret_from_values(f, values, maximise=True):
+def regret_from_values(
+        f, values, maximise=True, nan_policy='propagate', out=None):
     """T1: Regret from given values
 
     For a given decision alternative, this function compares its performance in
@@ -122,39 +203,51 @@ def regret_from_values(f, values, maximise=True):
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
-    values : np.ndarray, shape=(n, ) or float
+    values : float or np.ndarray, shape=(n, ), (m, 1) or (..., m, n)
         The values to compare the performance values to. i.e. The
         values you would regret not getting, relative to f.
-        Can be a different value for each scenario or one value
-        across all scenarios.
+        Can be a different value for each scenario, each decision
+        alternative, or both, or one value across all scenarios.
+        Broadcast against f rather than expanded to shape (m, n).
     maximise : bool
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f. NaN values are kept as NaN
+        with either policy. Provided for consistency with other
+        transformations.
+        (The default is 'propagate').
+    out : np.ndarray, shape=(..., m, n), optional
+        An array to write the transformed values to, e.g. a buffer from
+        a `Workspace`. Must have a floating point dtype.
+        (The default is None, which allocates a new array).
 
     Returns
     -------
-    np.ndarray, shape=(m, n)
+    np.ndarray, shape=(..., m, n)
         Transformed performance values, f', for m decision alternatives
         and n scenarios
     """
     _f = _prepare_f(f)
-    if isinstance(values, np.ndarray):
-        v = values
-    else:
-        # If values is not different for each scenario, then we must
-        # put it in the form of one value, repeated
-        v = np.repeat(values, _f.shape[1])
-    regret = np.subtract(_f, v)
+    # A float, or a value for each scenario or decision alternative,
+    # is broadcast
+    xp = namespace.array_namespace(_f)
+    if xp is not np:
+        regret = _f - _reference(values, _f)
+        return regret if maximise else -regret
+    regret = np.subtract(_f, _reference(values, _f), out=out)
     # Take into account whether f is to be minimised or maximised.
-    regret = identity(regret, maximise=maximise)
+    if not maximise:
+        np.negative(regret, out=regret)
     return regret
 
 
-def regret_from_median(f, maximise=True):
+def regret_from_median(
+        f, maximise=True, nan_policy='propagate', out=None):
     """T1: Regret from median values
 
     For a given decision alternative, this function compares its performance in
@@ -167,80 +260,175 @@ def regret_from_median(f, maximise=True):
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray or SortedF, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN wherever a NaN
+        is used. 'omit' ignores NaN values when comparing
+        decision alternatives or scenarios, and keeps them as NaN).
+    out : np.ndarray, shape=(..., m, n), optional
+        An array to write the transformed values to, e.g. a buffer from
+        a `Workspace`. Must have a floating point dtype.
+        (The default is None, which allocates a new array).
 
     Returns
     -------
-    np.ndarray, shape=(m, n)
+    np.ndarray, shape=(..., m, n)
         Transformed performance values, f', for m decision alternatives
         and n scenarios
     """
+    if isinstance(f, SortedF) and out is None:
+        # The regret keeps the order of each decision alternative's values
+        regret = f.subtract(f.median(nan_policy=nan_policy)[:, np.newaxis])
+        return regret if maximise else regret.negative()
     _f = _prepare_f(f)
-    median_f = np.median(_f, axis=1, keepdims=True)
-    regret = np.subtract(_f, median_f)
-    regret = identity(regret, maximise=maximise)
+    xp = namespace.array_namespace(_f)
+    if xp is not np:
+        regret = _f - namespace.median(xp, _f, nan_policy=nan_policy)
+        return regret if maximise else -regret
+    median = np.nanmedian if nan_policy == 'omit' else np.median
+    with warnings.catch_warnings():
+        # Decision alternatives with only NaN values have a NaN median
+        warnings.filterwarnings(
+            'ignore', 'All-NaN slice encountered', RuntimeWarning)
+        if out is None:
+            median_f = median(_f, axis=-1, keepdims=True)
+        else:
+            # Find the median by partitioning out, rather than a copy of f
+            np.copyto(out, _f)
+            median_f = median(
+                out, axis=-1, keepdims=True, overwrite_input=True)
+    regret = np.subtract(_f, median_f, out=out)
+    if not maximise:
+        np.negative(regret, out=regret)
     return regret
 
 
-def satisfice(f, maximise=True, threshold=0.0, accept_equal=True):
+def satisfice(
+        f,
+        maximise=True,
+        threshold=0.0,
+        accept_equal=True,
+        nan_policy='propagate',
+        out=None):
     """Transform performance how many scenarios are satisficed
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     maximise : bool
         Is the performance metric to be maximised or minimised.
         (The default is True, which implies high values of f are better
         than low values of f).
-    threshold : float, optional
-        A minimum value where f >= threshold to be satisficed
+    threshold : float or np.ndarray, optional
+        A minimum value where f >= threshold to be satisficed.
+        Can be an array of shape (n, ) or (1, n) for a value for each
+        scenario, (m, 1) for each decision alternative, or (m, n),
+        which is broadcast against f.
         (The default is 0.0, which implies that any f value above 0 is
         of satisfactory performance).
     accept_equal : bool, optional
         Whether or not an f value equal to the threshold is acceptable.
         (The default is True, which implies a >= comparison, whereas
         False would imply a > comparison).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which treats NaN values as not
+        satisficed. 'omit' keeps them as NaN, so that they can be
+        omitted by later transformations).
+    out : np.ndarray, shape=(..., m, n), optional
+        An array to write the transformed values to, e.g. a buffer from
+        a `Workspace`. Must have a floating point dtype.
+        (The default is None, which allocates a new array).
 
     Returns
     -------
-    np.ndarray, shape=(m, n)
+    np.ndarray, shape=(..., m, n)
         Transformed performance values, f', for m decision alternatives
         and n scenarios
     """
     _f = _prepare_f(f)
-    _f = identity(_f, maximise=maximise)
-    c = threshold if maximise else -threshold
-    _f = _f >= c if accept_equal else _f > c
-    _f = np.where(_f, 1., 0.)
-    return _f
+    xp = namespace.array_namespace(_f)
+    # Identical to comparing identity(f) with identity(threshold)
+    if maximise:
+        compare = xp.greater_equal if accept_equal else xp.greater
+    else:
+        compare = xp.less_equal if accept_equal else xp.less
+    if xp is not np:
+        satisficed = namespace.astype(
+            xp, compare(_f, _reference(threshold, _f)), _f.dtype)
+        if nan_policy == 'omit':
+            satisficed = namespace.where(
+                xp, xp.isnan(_f), float('nan'), satisficed)
+        return satisficed
+    if out is None:
+        out = np.empty(_f.shape, dtype=working_dtype(_f.dtype))
+    # The comparison is cast to 1. (satisficed) or 0. in out
+    satisficed = compare(_f, threshold, out=out)
+    if nan_policy == 'omit':
+        # Keep missing values missing, rather than as failures
+        np.copyto(satisficed, np.nan, where=np.isnan(_f))
+    return satisficed
 
 
 def _prepare_f(f):
     """Ensures f is in the right form for t1 transformations.
 
-    Converts to an np.ndarray if it isn't already.
-    If is of shape (n, ), it converts it to shape (1, n)
+    Converts to an np.ndarray if it isn't already (or an array of
+    another library supporting the array API standard).
+    If is of shape (n, ), it converts it to shape (1, n). Leading batch
+    axes are kept.
+    Casts to the type set by `dtype_policy`, if any (or to the floating
+    point type of other libraries' arrays).
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
 
     Returns
     -------
-    np.ndarray, shape=(m, n)
+    np.ndarray, shape=(..., m, n)
         Performance values, f, for m decision alternatives
         and n scenarios.
     """
+    xp = namespace.array_namespace(f)
+    if xp is not np:
+        if f.ndim < 2:
+            f = xp.reshape(f, (1, -1))
+        return namespace.astype(xp, f, namespace.float_dtype(xp, f))
     _f = f if isinstance(f, np.ndarray) else np.asarray(f)
-    if len(_f.shape) != 2:
+    if len(_f.shape) < 2:
         _f = np.reshape(_f, newshape=(1, -1))
-    return _f
+    return as_working(_f)
+
+
+def _reference(values, _f):
+    """Casts values that f is compared to to the working type of f.
+
+    So that e.g. float64 thresholds do not up-cast float32 values.
+    """
+    xp = namespace.array_namespace(_f)
+    if xp is not np:
+        return xp.asarray(values, dtype=_f.dtype)
+    return np.asarray(values, dtype=working_dtype(_f.dtype))
+
+
+def _regret_from_best_da(xp, _f, maximise, best_f, nan_policy):
+    """`regret_from_best_da` for arrays of other libraries"""
+    if best_f is not None:
+        best = xp.expand_dims(_reference(best_f, _f), axis=-2)
+    elif nan_policy == 'omit':
+        best = namespace.nan_reduce(
+            xp, xp.max if maximise else xp.min, _f, axis=-2, keepdims=True)
+    else:
+        best = (xp.max if maximise else xp.min)(_f, axis=-2, keepdims=True)
+    return _f - best if maximise else best - _f
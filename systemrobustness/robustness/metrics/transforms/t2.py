@@ -1,131 +1,659 @@
 """Contains the T2 transformations (scenario subset selection).
 
 This is related to the level of risk averseness of the decision-maker.
+
+Scenarios are the last axis of f, so that f may have leading batch axes
+(e.g. shape (k, m, n) for k sets of scenarios or performance metrics),
+which are kept in the selected values. `SortedF` and `QuantileSketch`
+are (m, n) only.
+
+f may also be an array of any library supporting the array API standard
+(see `namespace`). Its values are selected by sorting, as partitioning
+and in-place sorting are NumPy-only.
+
+The selections of NumPy arrays can also return the scenario of each
+selected value (`return_index`), found by the same argmin/argmax,
+partition or sort that selects the values.
 """
 
+import functools
+
 import numpy as np
 
+from . import namespace
+from .order_stats import SortedF, nearest_idxs
+from .sketch import QuantileSketch
 
-def all_scenarios(f):
+# Partitioning (introselect) finds a few order statistics of each row
+# in linear time. It is faster than sorting for up to this many order
+# statistics, in rows of at least 16 values per order statistic.
+MAX_PARTITION_KTH = 4
+
+
+def all_scenarios(f, nan_policy='propagate'):
     """Use all scenarios. Provided for completeness.
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n)
         Transformed performance values to be maximised.
         m decision alternatives and n scenarios
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f. NaN values are kept as NaN
+        with either policy. Provided for consistency with other
+        transformations.
+        (The default is 'propagate').
 
     Returns
     -------
-    np.ndarray, shape=(m, n')
+    np.ndarray, shape=(..., m, n')
         The selected n' performance values
         In this case n' = n
     """
     return f
 
 
-def worst_case(f):
+def worst_case(f, nan_policy='propagate', return_index=False):
     """Assume the worst-case scenario for each decision alternative.
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray or SortedF, shape=(..., m, n)
         Transformed performance values to be maximised.
         m decision alternatives and n scenarios
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which selects NaN if any value
+        for a decision alternative is NaN. 'omit' selects from the
+        values that are not NaN).
+    return_index : bool, optional
+        Whether to also return the scenario of each selected value,
+        found in the same pass over f.
+        (The default is False).
 
     Returns
     -------
-    np.ndarray, shape=(m, n')
+    np.ndarray, shape=(..., m, n')
         The selected n' performance values
         In this case n' = 1
+    np.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each selected value, only if `return_index`.
+        A NaN value selected when propagating NaN values is from a
+        scenario with a NaN value, and -1 marks a decision alternative
+        with no values when omitting NaN values.
     """
-    worst_f = np.amin(f, 1, keepdims=True)
+    xp = namespace.array_namespace(f)
+    if return_index:
+        if isinstance(f, SortedF):
+            positions = np.zeros((f.shape[0], 1), dtype=np.intp)
+            return (
+                worst_case(f, nan_policy=nan_policy),
+                f.scenarios(positions, nan_policy=nan_policy))
+        return _arg_extreme(np.argmin, f, np.inf, nan_policy)
+    if isinstance(f, SortedF):
+        worst_f = f.minimum(nan_policy=nan_policy)[:, np.newaxis]
+    elif xp is not np:
+        worst_f = _extreme(xp, xp.min, f, nan_policy)
+    elif nan_policy == 'omit':
+        worst_f = np.fmin.reduce(f, -1, keepdims=True)
+    else:
+        worst_f = np.amin(f, -1, keepdims=True)
     return worst_f
 
 
-def best_case(f):
+def best_case(f, nan_policy='propagate', return_index=False):
     """Assume the best-case scenario for each decision alternative.
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray or SortedF, shape=(..., m, n)
         Transformed performance values to be maximised.
         m decision alternatives and n scenarios
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which selects NaN if any value
+        for a decision alternative is NaN. 'omit' selects from the
+        values that are not NaN).
+    return_index : bool, optional
+        Whether to also return the scenario of each selected value,
+        found in the same pass over f.
+        (The default is False).
 
     Returns
     -------
-    np.ndarray, shape=(m, n')
+    np.ndarray, shape=(..., m, n')
         The selected n' performance values
         In this case n' = 1
+    np.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each selected value, only if `return_index`
+        (see `worst_case`)
     """
-    best_f = np.amax(f, 1, keepdims=True)
+    xp = namespace.array_namespace(f)
+    if return_index:
+        if isinstance(f, SortedF):
+            # The last value that is not NaN
+            positions = f.n_valid[:, np.newaxis] - 1
+            return (
+                best_case(f, nan_policy=nan_policy),
+                f.scenarios(positions, nan_policy=nan_policy))
+        return _arg_extreme(np.argmax, f, -np.inf, nan_policy)
+    if isinstance(f, SortedF):
+        best_f = f.maximum(nan_policy=nan_policy)[:, np.newaxis]
+    elif xp is not np:
+        best_f = _extreme(xp, xp.max, f, nan_policy)
+    elif nan_policy == 'omit':
+        best_f = np.fmax.reduce(f, -1, keepdims=True)
+    else:
+        best_f = np.amax(f, -1, keepdims=True)
     return best_f
 
 
-def worst_and_best_cases(f):
+def worst_and_best_cases(f, nan_policy='propagate', return_index=False):
     """Work with the most extreme worst- and best-case scenarios.
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray or SortedF, shape=(..., m, n)
         Transformed performance values to be maximised.
         m decision alternatives and n scenarios
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which selects NaN if any value
+        for a decision alternative is NaN. 'omit' selects from the
+        values that are not NaN).
+    return_index : bool, optional
+        Whether to also return the scenario of each selected value,
+        found in the same pass over f.
+        (The default is False).
 
     Returns
     -------
-    np.ndarray, shape=(m, n')
+    np.ndarray, shape=(..., m, n')
         The selected n' performance values
         In this case n' = 2
+    np.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each selected value, only if `return_index`
+        (see `worst_case`)
     """
-    worst_f = worst_case(f)
-    best_f = best_case(f)
-    _f = np.concatenate((worst_f, best_f), axis=1)
+    if return_index:
+        worst_f, worst_idxs = worst_case(
+            f, nan_policy=nan_policy, return_index=True)
+        best_f, best_idxs = best_case(
+            f, nan_policy=nan_policy, return_index=True)
+        return (
+            np.concatenate((worst_f, best_f), axis=-1),
+            np.concatenate((worst_idxs, best_idxs), axis=-1))
+    worst_f = worst_case(f, nan_policy=nan_policy)
+    best_f = best_case(f, nan_policy=nan_policy)
+    _f = namespace.concat(
+        namespace.array_namespace(worst_f), [worst_f, best_f], axis=-1)
     return _f
 
 
-def worst_half(f):
+def worst_half(
+        f,
+        nan_policy='propagate',
+        overwrite_input=False,
+        ordered=True,
+        algorithm='auto',
+        return_index=False):
     """Work with the worst half of scenarios
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray or SortedF, shape=(..., m, n)
         Transformed performance values to be maximised.
         m decision alternatives and n scenarios
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which selects NaN if any value
+        for a decision alternative is NaN. 'omit' selects from the
+        values that are not NaN).
+    overwrite_input : bool, optional
+        Whether f may be sorted in place, rather than a copy of f
+        (e.g. if f is a `Workspace` buffer that is not used again).
+        (The default is False).
+    ordered : bool, optional
+        Whether the selected values must be sorted from worst to best.
+        (The default is True. False allows the selected values of each
+        decision alternative in any order, which avoids sorting them
+        after partitioning).
+    algorithm : {'auto', 'sort', 'partition'}, optional
+        How to find the worst half when not omitting NaN values.
+        (The default is 'auto', which partitions unless sorting is
+        faster, see `use_partition`).
+    return_index : bool, optional
+        Whether to also return the scenario of each selected value,
+        found in the same pass over f (by partitioning or sorting the
+        scenarios of each decision alternative rather than its values,
+        so f is not overwritten).
+        (The default is False).
 
     Returns
     -------
-    np.ndarray, shape=(m, n')
+    np.ndarray, shape=(..., m, n')
         The selected n' performance values
         In this case n' = 0.5*n (round up to nearest whole number)
+        If omitting NaN values, n is the number of values that are not
+        NaN for each decision alternative, and rows with fewer than
+        n' values are padded with NaN.
+    np.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each selected value, only if `return_index`.
+        Padding when omitting NaN values is marked by -1.
     """
-    sorted_f = np.sort(f)
-    n = sorted_f.shape[1]  # Num of scenarios
+    xp = namespace.array_namespace(f)
+    if xp is not np:
+        assert not return_index, 'Scenario indices require NumPy arrays'
+        return _worst_half(xp, f, nan_policy)
+    if (nan_policy != 'omit' and not isinstance(f, SortedF)
+            and use_partition(f, 1, algorithm, indirect=return_index)):
+        n = np.shape(f)[-1]  # Num of scenarios
+        _n = int(n / 2. + 0.51)  # Half of the scenarios
+        if return_index:
+            return _arg_worst_half(f, _n, ordered)
+        # NaN values are partitioned to the end, as when sorting
+        _f = _partition(f, _n - 1, overwrite_input)[..., :_n]
+        if ordered:
+            _f = np.sort(_f)
+        return _f
+    if return_index:
+        sorted_f, order = _argsort(f)
+    else:
+        sorted_f = _sort(f, overwrite_input)
+    if nan_policy == 'omit':
+        # NaN values are sorted to the end of each row
+        n = np.count_nonzero(~np.isnan(sorted_f), axis=-1)
+        _n = (n / 2. + 0.51).astype(int)
+        padding = np.arange(np.max(_n, initial=0)) >= _n[..., np.newaxis]
+        _f = sorted_f[..., :padding.shape[-1]].copy()
+        _f[padding] = np.nan
+        if return_index:
+            order = order[..., :padding.shape[-1]].copy()
+            order[padding] = -1
+            return _f, order
+        return _f
+    n = sorted_f.shape[-1]  # Num of scenarios
     _n = int(n / 2. + 0.51)  # Half of the scenarios
-    _f = sorted_f[:, :_n]
+    _f = sorted_f[..., :_n]
+    if return_index:
+        return _f, order[..., :_n]
     return _f
 
 
-def select_percentiles(f, percentiles):
+def select_percentiles(
+        f,
+        percentiles,
+        nan_policy='propagate',
+        overwrite_input=False,
+        algorithm='auto',
+        weights=None,
+        return_index=False,
+        weights_kind='probability'):
     """Select particular percentiles of f for each decision alternative.
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, SortedF or QuantileSketch, shape=(..., m, n)
         Transformed performance values to be maximised.
         m decision alternatives and n scenarios
+        The percentiles of a QuantileSketch are approximate (see
+        `QuantileSketch.rank_error`).
     percentiles : np.ndarray, shape=(n', ), dtype=float
         Which percentile of to select for each decision alternative.
         E.g. [0.2, 0.75] would get the 20th and 75th percentiles for
         each decision alternative. That is to say, the f values for
         each decision alternative where 20% and 75% of values are
         worse.
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which selects NaN if any value
+        for a decision alternative is NaN. 'omit' selects from the
+        values that are not NaN).
+    overwrite_input : bool, optional
+        Whether f may be sorted in place, rather than a copy of f
+        (e.g. if f is a `Workspace` buffer that is not used again).
+        (The default is False).
+    algorithm : {'auto', 'sort', 'partition'}, optional
+        How to find the percentiles when not omitting NaN values.
+        (The default is 'auto', which partitions if there are few
+        percentiles unless sorting is faster, see `use_partition`).
+    weights : np.ndarray, shape=(n, ), optional
+        The weight of each scenario, e.g. from `compress_scenarios`.
+        Each weighted percentile is the 'nearest' percentile of the
+        values repeated by the frequency of their scenario (see
+        `order_stats.frequencies`), which is the unweighted percentile
+        for equal weights.
+        (The default is None, which treats the scenarios as equally
+        likely).
+    return_index : bool, optional
+        Whether to also return the scenario of each selected value,
+        found in the same pass over f (by partitioning or sorting the
+        scenarios of each decision alternative rather than its values,
+        so f is not overwritten).
+        (The default is False).
+    weights_kind : {'probability', 'frequency'}, optional
+        Whether the weights are probabilities (or relative
+        frequencies), or the number of times each scenario occurs
+        (see `order_stats.frequencies`).
+        (The default is 'probability').
 
     Returns
     -------
-    np.ndarray, shape=(m, n')
+    np.ndarray, shape=(..., m, n')
         The selected n' performance values
         n' is given by the percentiles parameter
+    np.ndarray, shape=(..., m, n'), dtype=int
+        The scenario of each selected value, only if `return_index`
+        (see `worst_case`)
     """
-    _f = np.transpose(
-        np.quantile(f, percentiles, axis=1, interpolation='nearest'))
+    xp = namespace.array_namespace(f)
+    if weights is not None:
+        return _select_sorted_percentiles(
+            f, percentiles, nan_policy, weights, return_index, weights_kind)
+    if xp is not np:
+        assert not return_index, 'Scenario indices require NumPy arrays'
+        return _select_percentiles(xp, f, percentiles, nan_policy)
+    if isinstance(f, SortedF):
+        return f.quantiles(
+            percentiles, nan_policy=nan_policy, return_index=return_index)
+    if isinstance(f, QuantileSketch):
+        assert nan_policy != 'omit', 'QuantileSketch does not omit NaN values'
+        assert not return_index, 'QuantileSketch does not keep the scenarios'
+        return f.quantiles(percentiles)
+    if return_index and nan_policy == 'omit':
+        # A single percentile is kept as an axis, as below
+        return _select_sorted_percentiles(
+            f, np.reshape(percentiles, -1), nan_policy, weights, return_index)
+    if nan_policy == 'omit':
+        # NaN values are sorted to the end of each row, so the
+        # percentiles can be selected from the first n values.
+        sorted_f = _sort(f, overwrite_input)
+        n = np.count_nonzero(~np.isnan(sorted_f), axis=-1)
+        idxs = nearest_idxs(n[..., np.newaxis], np.asarray(percentiles))
+        _f = np.take_along_axis(sorted_f, np.clip(idxs, 0, None), axis=-1)
+        _f[n == 0] = np.nan
+        return _f
+    if np.ndim(percentiles) == 1:
+        n = np.shape(f)[-1]
+        idxs = nearest_idxs(n, np.asarray(percentiles))
+        kth = np.unique(idxs)
+        if use_partition(f, kth.size, algorithm, indirect=return_index):
+            # Also partition the last value (the maximum, or NaN if
+            # there are any NaN values) to match numpy.quantile
+            kth = np.union1d(kth, [n - 1])
+            if return_index:
+                return _arg_select(f, kth, idxs)
+            partitioned_f = _partition(f, kth, overwrite_input)
+            _f = partitioned_f[..., idxs]
+            nan_rows = np.isnan(partitioned_f[..., -1])
+            if np.any(nan_rows):
+                _f[nan_rows] = np.nan
+            return _f
+    if return_index:
+        return _select_sorted_percentiles(
+            f, percentiles, nan_policy, weights, return_index)
+    _f = np.quantile(
+        f,
+        percentiles,
+        axis=-1,
+        overwrite_input=overwrite_input,
+        method='nearest')
+    if np.ndim(percentiles) == 1:
+        # The percentiles are the first axis
+        _f = np.moveaxis(_f, 0, -1)
     return _f
+
+
+def compress_scenarios(f, weights=None):
+    """Collapses identical scenarios into one scenario with their weight.
+
+    Robustness from the compressed performance values with the number
+    of times each occurs as their weights (with the `weights` and
+    `weights_kind='frequency'` of e.g. `t2.select_percentiles` and
+    `t3.f_variance`) is the same as from all of the scenarios, so that
+    repeated scenarios are only transformed once. Summed probabilities
+    give the same means and satisficed fractions, but percentiles and
+    variances are of the rescaled probabilities (see
+    `order_stats.frequencies`).
+
+    Parameters
+    ----------
+    f : np.ndarray, shape=(..., m, n)
+        Performance values, f, for m decision alternatives
+        and n scenarios.
+    weights : np.ndarray, shape=(n, ), optional
+        The probability (or relative frequency) of each scenario.
+        (The default is None, which treats the scenarios as equally
+        likely).
+
+    Returns
+    -------
+    f : np.ndarray, shape=(..., m, u)
+        The performance values in the u unique scenarios, in the order
+        they first occur. Scenarios are identical if all of their
+        values are (bit for bit, so NaN values can match).
+    weights : np.ndarray, shape=(u, )
+        The total weight of each unique scenario, OR the number of
+        times it occurs if `weights` is None
+    """
+    f = np.asarray(f)
+    columns = np.reshape(f, (-1, f.shape[-1])).T
+    # As bytes, so that columns are compared bit for bit
+    keys = np.ascontiguousarray(columns).view(
+        np.dtype((np.void, columns.dtype.itemsize * columns.shape[1])))
+    _, first, inverse = np.unique(
+        keys[:, 0] if keys.ndim > 1 else keys,
+        return_index=True,
+        return_inverse=True)
+    # Keep the order that the unique scenarios first occur in
+    order = np.argsort(first)
+    position = np.empty_like(order)
+    position[order] = np.arange(order.size)
+    inverse = position[np.reshape(inverse, -1)]
+    unique_weights = np.bincount(
+        inverse, weights=weights, minlength=order.size)
+    return np.take(f, first[order], axis=-1), unique_weights
+
+
+def use_partition(f, n_kth, algorithm='auto', indirect=False):
+    """Decides whether to partition or sort to find order statistics.
+
+    Partitioning finds `n_kth` order statistics of each row in linear
+    time, rather than O(n log n) for sorting. Sorting is used if there
+    are too many order statistics (see `MAX_PARTITION_KTH`), the rows
+    are short, or numpy sorts f with AVX-512 instructions (which on
+    those CPUs is faster than partitioning, though not for finding the
+    scenario of each value).
+
+    Parameters
+    ----------
+    f : np.ndarray, shape=(..., m, n)
+        The values to find order statistics of
+    n_kth : int
+        The number of order statistics to find in each row
+    algorithm : {'auto', 'sort', 'partition'}, optional
+        'sort' or 'partition' to choose the algorithm, or 'auto'.
+        (The default is 'auto').
+    indirect : bool, optional
+        Whether the scenarios of the order statistics are also found
+        (with `numpy.argpartition` or `numpy.argsort`).
+        (The default is False).
+
+    Returns
+    -------
+    bool
+        Whether to partition
+    """
+    assert algorithm in ['auto', 'sort', 'partition']
+    if algorithm != 'auto':
+        return algorithm == 'partition'
+    n = np.shape(f)[-1]
+    return (
+        0 < n_kth <= MAX_PARTITION_KTH
+        and n >= 16 * n_kth
+        and (indirect or not _vectorised_sort(np.asarray(f).dtype)))
+
+
+def _vectorised_sort(dtype):
+    """Checks whether numpy sorts dtype with AVX-512 instructions"""
+    if dtype.kind not in 'iuf' or dtype.itemsize not in [2, 4, 8]:
+        return False
+    return _has_avx512()
+
+
+@functools.lru_cache(maxsize=None)
+def _has_avx512():
+    """Checks whether numpy sorts with x86-simd-sort on this CPU"""
+    # numpy >= 1.25 sorts 16, 32 and 64 bit types with x86-simd-sort,
+    # and reports the SIMD extensions found on the CPU at runtime
+    if np.lib.NumpyVersion(np.__version__) < '1.25.0':
+        return False
+    try:
+        config = np.show_config(mode='dicts')
+        found = config['SIMD Extensions']['found']
+    except (TypeError, KeyError):
+        return False
+    return 'AVX512_SKX' in found
+
+
+def _partition(f, kth, overwrite_input):
+    """Partitions each row of f, in place if allowed"""
+    if overwrite_input and isinstance(f, np.ndarray):
+        f.partition(kth, axis=-1)
+        return f
+    return np.partition(f, kth, axis=-1)
+
+
+def _sort(f, overwrite_input):
+    """Sorts each row of f, in place if allowed, or if already sorted"""
+    if isinstance(f, SortedF):
+        return f.values
+    if overwrite_input and isinstance(f, np.ndarray):
+        f.sort(axis=-1)
+        return f
+    return np.sort(f)
+
+
+def _argsort(f):
+    """Sorts each row of f, with the scenario of each sorted value"""
+    if isinstance(f, SortedF):
+        return f.values, f.order
+    order = np.argsort(f, axis=-1)
+    return np.take_along_axis(f, order, axis=-1), order
+
+
+def _arg_extreme(arg_func, f, fill, nan_policy):
+    """Selects the worst- or best-case of each row of f, and its scenario"""
+    assert namespace.array_namespace(f) is np, (
+        'Scenario indices require NumPy arrays')
+    f = np.asarray(f)
+    # The first NaN value is selected, as by np.amin and np.amax
+    idxs = np.expand_dims(arg_func(f, axis=-1), -1)
+    _f = np.take_along_axis(f, idxs, axis=-1)
+    nan_rows = np.isnan(_f[..., 0])
+    if nan_policy == 'omit' and np.any(nan_rows):
+        # Only the rows with a NaN value are searched again
+        rows = f[nan_rows]
+        nan = np.isnan(rows)
+        row_idxs = arg_func(np.where(nan, fill, rows), axis=-1)
+        # NaN is still selected for rows with no values (or with only
+        # values equal to fill)
+        missed = nan[np.arange(rows.shape[0]), row_idxs]
+        if np.any(missed):
+            row_idxs[missed] = np.where(
+                np.all(nan[missed], axis=-1), -1,
+                np.argmin(nan[missed], axis=-1))
+        idxs[nan_rows, 0] = row_idxs
+        _f[nan_rows, 0] = rows[np.arange(rows.shape[0]), row_idxs]
+    return _f, idxs
+
+
+def _arg_worst_half(f, _n, ordered):
+    """Partitions the scenarios of each row of f to find its worst half"""
+    # NaN values are partitioned to the end, as when sorting
+    order = np.argpartition(f, _n - 1, axis=-1)[..., :_n]
+    _f = np.take_along_axis(f, order, axis=-1)
+    if ordered:
+        positions = np.argsort(_f, axis=-1)
+        _f = np.take_along_axis(_f, positions, axis=-1)
+        order = np.take_along_axis(order, positions, axis=-1)
+    return _f, order
+
+
+def _arg_select(f, kth, idxs):
+    """Partitions the scenarios of each row of f to select positions idxs"""
+    order = np.argpartition(f, kth, axis=-1)
+    scenarios = order[..., idxs]
+    _f = np.take_along_axis(f, scenarios, axis=-1)
+    # The last value is NaN if there are any NaN values
+    last_f = np.take_along_axis(f, order[..., -1:], axis=-1)
+    nan_rows = np.isnan(last_f[..., 0])
+    if np.any(nan_rows):
+        _f[nan_rows] = np.nan
+        scenarios[nan_rows] = order[nan_rows, -1:]
+    return _f, scenarios
+
+
+def _extreme(xp, func, f, nan_policy):
+    """Selects the minimum or maximum of each row of another library's f"""
+    if nan_policy == 'omit':
+        return namespace.nan_reduce(xp, func, f, keepdims=True)
+    return func(f, axis=-1, keepdims=True)
+
+
+def _worst_half(xp, f, nan_policy):
+    """`worst_half` for arrays of other libraries"""
+    # NaN values are sorted to the end of each row
+    sorted_f = xp.sort(f, axis=-1)
+    if nan_policy != 'omit':
+        return sorted_f[..., :(f.shape[-1] + 1) // 2]
+    _n = (namespace.count_valid(xp, sorted_f) + 1) // 2
+    _f = sorted_f[..., :int(xp.max(_n))] if _n.size else sorted_f
+    padding = xp.arange(_f.shape[-1]) >= _n[..., xp.newaxis]
+    return namespace.where(xp, padding, float('nan'), _f)
+
+
+def _select_percentiles(xp, f, percentiles, nan_policy):
+    """`select_percentiles` for arrays of other libraries"""
+    assert np.ndim(percentiles) <= 1, 'percentiles must be a float or 1D'
+    sorted_f = xp.sort(f, axis=-1)
+    if nan_policy == 'omit':
+        n = namespace.count_valid(xp, sorted_f, keepdims=True)
+        idxs = namespace.nearest_positions(
+            xp, n, np.reshape(percentiles, -1).tolist())
+        _f = namespace.select(
+            xp, sorted_f, namespace.where(xp, idxs < 0, 0, idxs))
+        return namespace.where(xp, n == 0, float('nan'), _f)
+    idxs = nearest_idxs(f.shape[-1], np.reshape(percentiles, -1))
+    _f = xp.take(sorted_f, xp.asarray(idxs.tolist()), axis=-1)
+    nan_rows = xp.any(xp.isnan(f), axis=-1, keepdims=True)
+    _f = namespace.where(xp, nan_rows, float('nan'), _f)
+    # A single percentile is not kept as an axis, as by numpy.quantile
+    return _f[..., 0] if np.ndim(percentiles) == 0 else _f
+
+
+def _select_sorted_percentiles(
+        f, percentiles, nan_policy, weights, return_index,
+        weights_kind='probability'):
+    """`select_percentiles` using the scenario of each sorted value"""
+    assert not isinstance(f, QuantileSketch), (
+        'QuantileSketch does not keep the scenarios')
+    assert namespace.array_namespace(f) is np, (
+        'Scenario weights and indices require NumPy arrays')
+    if isinstance(f, SortedF):
+        sorted_f = f
+    else:
+        # The scenario of each sorted value is needed for its weight
+        # or index, though not in a stable order
+        f = np.asarray(f)
+        rows = np.reshape(f, (-1, f.shape[-1]))
+        sorted_f = SortedF(rows, order=np.argsort(rows, axis=1))
+    selected = sorted_f.quantiles(
+        percentiles, nan_policy=nan_policy, weights=weights,
+        return_index=return_index, weights_kind=weights_kind)
+    # A single percentile is not kept as an axis, as by numpy.quantile
+    key = (Ellipsis, 0) if np.ndim(percentiles) == 0 else Ellipsis
+    selected = tuple(
+        np.reshape(_f, np.shape(f)[:-1] + (-1, ))[key]
+        for _f in (selected if return_index else [selected]))
+    return selected if return_index else selected[0]
@@ -4,152 +4,303 @@ Generally the selected and transformed performance values, f, are
 transformed to an expected value of performance.
 
 However, supplementary metrics may consider the variance in f,
-or higher-order moments of f.
+or higher-order moments of f. The moment-based transformations draw
+from a `Moments` accumulator, found in one pass over f, and also accept
+a `Moments` in place of f (e.g. built chunk by chunk).
+
+Means, sums and moments are accumulated in float64, and robustness is
+returned in the working type of f (see `precision.dtype_policy`).
+
+Scenarios are the last axis of f, so that f may have leading batch axes
+(e.g. shape (k, m, n) gives robustness of shape (k, m)).
+
+f may also be an array of any library supporting the array API standard
+(see `namespace`), which is reduced in its own type by that library.
 """
 
 import numpy as np
 
+from . import namespace
+from .moments import Moments
+from .order_stats import frequencies
+from .precision import ACCUMULATOR_DTYPE, working_dtype
+
+# The number of scenarios in each block of a weighted sum
+W_SUM_BLOCK = 4096
 
-def f_identity(f):
+
+def f_identity(f, nan_policy='propagate'):
     """Identity transform included for completeness.
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, 1)
+    f : np.ndarray, shape=(..., m, 1)
         Transformed performance values to be maximised.
         m decision alternatives and n scenarios
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f. Provided for consistency with
+        other transformations; NaN values are always propagated.
+        (The default is 'propagate').
 
     Returns
     -------
-    np.ndarray, shape=(m, )
+    np.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
-    R = np.reshape(f, newshape=(-1, ))
+    xp = namespace.array_namespace(f)
+    if xp is not np:
+        return xp.reshape(f, f.shape[:-1] if f.ndim > 2 else (-1, ))
+    # Keep any leading batch axes
+    R = np.reshape(f, newshape=np.shape(f)[:-1] if np.ndim(f) > 2 else (-1, ))
     return R
 
 
-def f_mean(f):
+def f_mean(f, nan_policy='propagate', weights=None):
     """Calculate robustness as mean of f
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n) OR Moments
         Transformed performance values to be maximised.
-        m decision alternatives and n scenarios
+        m decision alternatives and n scenarios, OR their moments
+        (which were found with a nan_policy)
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN if any value
+        for a decision alternative is NaN. 'omit' uses the values
+        that are not NaN).
+    weights : np.ndarray, shape=(n, ), optional
+        The probability (or relative frequency) of each scenario, e.g.
+        from `t2.compress_scenarios`.
+        (The default is None, which treats the scenarios as equally
+        likely).
 
     Returns
     -------
-    np.ndarray, shape=(m, )
+    np.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
-    R = np.mean(f, axis=1)
-    return R
+    xp = namespace.array_namespace(f)
+    if weights is not None:
+        R = _weighted_mean(f, weights, nan_policy)
+    elif isinstance(f, Moments):
+        # NaN, rather than 0, if all values were omitted
+        R = np.where(f.count > 0, f.mean, np.nan)
+    elif xp is not np:
+        return _sum(xp, f, nan_policy) / _count(xp, f, nan_policy)
+    elif nan_policy == 'omit':
+        R = np.nanmean(f, axis=-1, dtype=ACCUMULATOR_DTYPE)
+    else:
+        R = np.mean(f, axis=-1, dtype=ACCUMULATOR_DTYPE)
+    return _as_result(R, f)
 
 
-def f_range(f):
+def f_range(f, nan_policy='propagate'):
     """Calculate robustness as range of f
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n)
         Transformed performance values to be maximised.
         m decision alternatives and n scenarios
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN if any value
+        for a decision alternative is NaN. 'omit' uses the values
+        that are not NaN).
 
     Returns
     -------
-    np.ndarray, shape=(m, )
+    np.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
-    max_f = np.max(f, axis=1)
-    min_f = np.min(f, axis=1)
+    xp = namespace.array_namespace(f)
+    if nan_policy == 'omit':
+        max_f = namespace.nan_reduce(xp, xp.max, f)
+        min_f = namespace.nan_reduce(xp, xp.min, f)
+    else:
+        max_f = xp.max(f, axis=-1)
+        min_f = xp.min(f, axis=-1)
     R = max_f - min_f
     return R
 
 
-def f_sum(f):
+def f_sum(f, nan_policy='propagate'):
     """Calculate robustness as sum of f (/ n_scenarios)
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n)
         Transformed performance values to be maximised.
         m decision alternatives and n scenarios
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN if any value
+        for a decision alternative is NaN. 'omit' uses the values
+        that are not NaN).
 
     Returns
     -------
-    np.ndarray, shape=(m, )
+    np.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
-    R = np.sum(f, axis=1) / f.shape[1]
-    return R
+    xp = namespace.array_namespace(f)
+    if xp is not np:
+        return _sum(xp, f, nan_policy) / _count(xp, f, nan_policy)
+    if nan_policy == 'omit':
+        # Normalise by the number of values that are not NaN
+        R = np.nansum(f, axis=-1, dtype=ACCUMULATOR_DTYPE) / np.count_nonzero(
+            ~np.isnan(f), axis=-1)
+    else:
+        R = np.sum(f, axis=-1, dtype=ACCUMULATOR_DTYPE) / f.shape[-1]
+    return _as_result(R, f)
 
 
-def f_w_sum(f, weights):
+def f_w_sum(f, weights, nan_policy='propagate'):
     """Calculate robustness as weighted sum of f
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n)
         Transformed performance values to be maximised.
         m decision alternatives and n scenarios
     weights : np.ndarray, shape=(n, )
         Weights to apply to each scenario
         E.g. for n=3, you could use
         weights = [0.5, 0.25, 0.25]
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN if any value
+        for a decision alternative is NaN. 'omit' uses the values
+        that are not NaN, with their weights rescaled to the same
+        total).
 
     Returns
     -------
-    np.ndarray, shape=(m, )
+    np.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
-    R = np.matmul(f, weights)
-    return R
+    xp = namespace.array_namespace(f)
+    if xp is not np:
+        weights = xp.asarray(weights, dtype=f.dtype)
+        if nan_policy != 'omit':
+            return xp.matmul(f, weights)
+        valid = xp.isnan(f)
+        R = xp.matmul(namespace.where(xp, valid, 0., f), weights)
+        return R * xp.sum(weights) / xp.matmul(
+            namespace.astype(xp, ~valid, f.dtype), weights)
+    weights = np.asarray(weights, dtype=ACCUMULATOR_DTYPE)
+    if nan_policy == 'omit':
+        valid = ~np.isnan(f)
+        R = _matmul(np.where(valid, f, 0.), weights)
+        R = R * np.sum(weights) / np.matmul(valid, weights)
+    else:
+        R = _matmul(f, weights)
+    return _as_result(R, f)
 
 
-def f_variance(f):
+def f_variance(
+        f,
+        nan_policy='propagate',
+        weights=None,
+        weights_kind='probability'):
     """Calculate robustness as variance of f
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n) OR Moments
         Transformed performance values to be maximised.
-        m decision alternatives and n scenarios
+        m decision alternatives and n scenarios, OR their moments
+        (which were found with a nan_policy)
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN if any value
+        for a decision alternative is NaN. 'omit' uses the values
+        that are not NaN).
+    weights : np.ndarray, shape=(n, ), optional
+        The weight of each scenario, e.g. from `t2.compress_scenarios`.
+        The variance is of the values repeated by the frequency of
+        their scenario (see `order_stats.frequencies`), with ddof=1.
+        (The default is None, which treats the scenarios as equally
+        likely).
+    weights_kind : {'probability', 'frequency'}, optional
+        Whether the weights are probabilities (or relative
+        frequencies), or the number of times each scenario occurs.
+        (The default is 'probability').
 
     Returns
     -------
-    np.ndarray, shape=(m, )
+    np.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
+    xp = namespace.array_namespace(f)
+    if xp is not np and weights is None:
+        return _variance(xp, f, nan_policy)
+    if weights is not None:
+        _, R = _weighted_mean_variance(f, weights, nan_policy, weights_kind)
+        return _as_result(R, f)
     # Calculate variance with ddof=1
     # (variance of sample, not population)
-    R = np.var(f, axis=1, ddof=1)
-    return R
+    R = _moments(f, nan_policy).variance(ddof=1)
+    return _as_result(R, f)
 
 
-def f_mean_variance(f):
+def f_mean_variance(
+        f,
+        nan_policy='propagate',
+        weights=None,
+        weights_kind='probability'):
     """Calculate robustness as a combination of mean and variance of f
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, n)
+    f : np.ndarray, shape=(..., m, n) OR Moments
         Transformed performance values to be maximised.
-        m decision alternatives and n scenarios
+        m decision alternatives and n scenarios, OR their moments
+        (which were found with a nan_policy)
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f (e.g. failed simulations).
+        (The default is 'propagate', which returns NaN if any value
+        for a decision alternative is NaN. 'omit' uses the values
+        that are not NaN).
+    weights : np.ndarray, shape=(n, ), optional
+        The weight of each scenario, e.g. from `t2.compress_scenarios`.
+        The variance is of the values repeated by the frequency of
+        their scenario (see `order_stats.frequencies`), with ddof=1.
+        (The default is None, which treats the scenarios as equally
+        likely).
+    weights_kind : {'probability', 'frequency'}, optional
+        Whether the weights are probabilities (or relative
+        frequencies), or the number of times each scenario occurs.
+        (The default is 'probability').
 
     Returns
     -------
-    np.ndarray, shape=(m, )
+    np.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
-    mean_f = f_mean(f)
-    # Calculate variance with ddof=1
-    # (std deviation of sample, not population)
-    std_dev_f = np.std(f, axis=1, ddof=1)
+    xp = namespace.array_namespace(f)
+    if xp is not np and weights is None:
+        mean_f = _sum(xp, f, nan_policy) / _count(xp, f, nan_policy)
+        std_dev_f = xp.sqrt(_variance(xp, f, nan_policy))
+        return (mean_f + 1.) / (std_dev_f + 1.)
+    if weights is not None:
+        mean_f, variance_f = _weighted_mean_variance(
+            f, weights, nan_policy, weights_kind)
+        std_dev_f = np.sqrt(variance_f)
+    else:
+        # The mean and standard deviation from the same pass over f
+        moments = _moments(f, nan_policy)
+        mean_f = moments.mean
+        # Calculate variance with ddof=1
+        # (std deviation of sample, not population)
+        std_dev_f = moments.std(ddof=1)
     # +1 is to ensure no divide by 0
     R = np.divide((mean_f + 1), (std_dev_f + 1))
-    return R
+    return _as_result(R, f)
 
 
-def f_skew(f, reverse=False):
+def f_skew(f, reverse=False, nan_policy='propagate'):
     """Calculate robustness as the skew of f
 
     It assumes that it is best to have most values skewed towards
@@ -157,7 +308,7 @@ def f_skew(f, reverse=False):
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, 3)
+    f : np.ndarray, shape=(..., m, 3)
         Transformed performance values to be maximised.
         m decision alternatives and 3 scenarios.
         Those 3 scenarios must be (in order) the 10th, 50th and 90th
@@ -169,16 +320,20 @@ def f_skew(f, reverse=False):
         larger tail of higher-performance values.
         (The default is False, which implies it is best to have a skew
         towards high f with a larger tail towards low f).
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f. Provided for consistency with
+        other transformations; NaN values are always propagated.
+        (The default is 'propagate').
 
     Returns
     -------
-    np.ndarray, shape=(m, )
+    np.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
     # p10 < p50 < p90
-    p10 = f[:, 0]
-    p50 = f[:, 1]
-    p90 = f[:, 2]
+    p10 = f[..., 0]
+    p50 = f[..., 1]
+    p90 = f[..., 2]
     # If p50 is closer to p90 than p10, most of the values are
     # skewed towards the higher-performance end of f
     # i.e. If p50 > mu50, most values of f are skewed higher
@@ -187,31 +342,125 @@ def f_skew(f, reverse=False):
     else:
         R = ((p90 + p10) / 2.) - p50
     normaliser = (p90 - p10) / 2.
-    R = np.divide(R, normaliser)
+    R = R / normaliser
     return R
 
 
-def f_kurtosis(f):
+def f_kurtosis(f, nan_policy='propagate'):
     """Calculate robustness as the kurtosis of f
 
     Parameters
     ----------
-    f : np.ndarray, shape=(m, 4)
+    f : np.ndarray, shape=(..., m, 4)
         Transformed performance values.
         m decision alternatives and 4 scenarios.
         Those 4 scenarios must be (in order) the 10th, 25th, 75th and
         90th percentiles, where the 10th percentile, q10, is f where
         only 10% of f is worse than q10.
+    nan_policy : {'propagate', 'omit'}, optional
+        How to handle NaN values in f. Provided for consistency with
+        other transformations; NaN values are always propagated.
+        (The default is 'propagate').
 
     Returns
     -------
-    np.ndarray, shape=(m, )
+    np.ndarray, shape=(..., m)
         The robustness value for each of the m decision alternatives
     """
     # p10 < p25 < p75 < p90
-    p10 = f[:, 0]
-    p25 = f[:, 1]
-    p75 = f[:, 2]
-    p90 = f[:, 3]
-    R = np.divide((p90 - p10), (p75 - p25))
+    p10 = f[..., 0]
+    p25 = f[..., 1]
+    p75 = f[..., 2]
+    p90 = f[..., 3]
+    R = (p90 - p10) / (p75 - p25)
     return R
+
+
+def _sum(xp, f, nan_policy):
+    """Sums each row of another library's f"""
+    if nan_policy == 'omit':
+        f = namespace.where(xp, xp.isnan(f), 0., f)
+    # Older versions of the standard summed float32 in float64
+    return xp.sum(f, axis=-1, dtype=f.dtype)
+
+
+def _count(xp, f, nan_policy):
+    """Counts the values of each row of another library's f to reduce"""
+    if nan_policy == 'omit':
+        return namespace.astype(xp, namespace.count_valid(xp, f), f.dtype)
+    return float(f.shape[-1])
+
+
+def _variance(xp, f, nan_policy):
+    """Finds the variance (ddof=1) of each row of another library's f"""
+    if nan_policy != 'omit':
+        return xp.var(f, axis=-1, correction=1)
+    count = _count(xp, f, nan_policy)
+    mean = _sum(xp, f, nan_policy) / count
+    deviations = f - mean[..., xp.newaxis]
+    M2 = _sum(xp, deviations * deviations, nan_policy)
+    return namespace.where(xp, count > 1., M2 / (count - 1.), float('nan'))
+
+
+def _weighted_mean(f, weights, nan_policy):
+    """Finds the weighted mean of each row of f, in float64"""
+    assert not isinstance(f, Moments), 'Moments are not weighted'
+    assert namespace.array_namespace(f) is np, (
+        'Scenario weights require NumPy arrays')
+    weights = np.asarray(weights, dtype=ACCUMULATOR_DTYPE)
+    if nan_policy == 'omit':
+        valid = ~np.isnan(f)
+        total = _matmul(np.where(valid, f, 0.), weights)
+        with np.errstate(invalid='ignore'):
+            return total / np.matmul(valid, weights)
+    return _matmul(f, weights) / np.sum(weights)
+
+
+def _weighted_mean_variance(f, weights, nan_policy, weights_kind):
+    """Finds the weighted mean and variance of each row of f, in float64.
+
+    The variance has ddof=1 for the frequency of each scenario (as
+    `numpy.cov` with `fweights`), so is the variance of the values
+    repeated by their frequency.
+    """
+    mean = _weighted_mean(f, weights, nan_policy)
+    weights = frequencies(weights, weights_kind)
+    deviations = f - mean[..., np.newaxis]
+    if nan_policy == 'omit':
+        valid = ~np.isnan(f)
+        deviations[~valid] = 0.
+        total = np.matmul(valid, weights)
+    else:
+        total = np.sum(weights)
+    M2 = np.matmul(np.square(deviations), weights)
+    dof = total - 1.
+    variance = np.divide(
+        M2, dof, out=np.full(M2.shape, np.nan), where=dof > 0)
+    return mean, variance
+
+
+def _moments(f, nan_policy):
+    """Gets the moments of f, unless f is already moments"""
+    if isinstance(f, Moments):
+        return f
+    return Moments.from_f(f, nan_policy=nan_policy)
+
+
+def _matmul(f, weights):
+    """Multiplies f by float64 weights, up-casting a block at a time"""
+    f = np.asarray(f)
+    if f.dtype == ACCUMULATOR_DTYPE:
+        return np.matmul(f, weights)
+    R = np.zeros(f.shape[:-1], dtype=ACCUMULATOR_DTYPE)
+    for start in range(0, f.shape[-1], W_SUM_BLOCK):
+        stop = start + W_SUM_BLOCK
+        R += np.matmul(f[..., start:stop].astype(ACCUMULATOR_DTYPE),
+                       weights[start:stop])
+    return R
+
+
+def _as_result(R, f):
+    """Rounds robustness accumulated in float64 to the working type of f"""
+    dtype = working_dtype(
+        f.mean.dtype if isinstance(f, Moments) else np.asarray(f).dtype)
+    return R.astype(dtype, copy=False)
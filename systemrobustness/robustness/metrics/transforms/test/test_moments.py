@@ -0,0 +1,81 @@
+"""Tests the moments accumulator"""
+
+import numpy as np
+from .. import moments, t3
+
+
+def _check(_moments, f):
+    """Checks the moments against numpy"""
+    mean = np.mean(f, axis=1)
+    deviations = f - mean[:, np.newaxis]
+    assert np.array_equal(_moments.count, np.full(f.shape[0], f.shape[1]))
+    assert np.allclose(_moments.mean, mean)
+    assert np.allclose(_moments.variance(), np.var(f, axis=1, ddof=1))
+    assert np.allclose(_moments.std(ddof=0), np.std(f, axis=1))
+    if _moments.order == 4:
+        m2 = np.mean(deviations ** 2, axis=1)
+        assert np.allclose(
+            _moments.skewness(), np.mean(deviations ** 3, axis=1) / m2 ** 1.5)
+        assert np.allclose(
+            _moments.kurtosis(),
+            np.mean(deviations ** 4, axis=1) / m2 ** 2 - 3.)
+
+
+def test_moments():
+    """Tests the moments of f in one pass and in chunks"""
+    rng = np.random.default_rng(15)
+    f = rng.gamma(2., size=(5, 3000)) + 1e6
+
+    for order in [2, 4]:
+        # Several blocks of scenarios
+        _check(moments.Moments.from_f(f, order=order, block_size=1000), f)
+        # Several blocks of decision alternatives
+        _check(moments.Moments.from_f(f, order=order, block_size=256), f)
+
+        chunked = moments.Moments.from_f(f[:, :7], order=order)
+        for f_chunk in np.array_split(f[:, 7:], 9, axis=1):
+            chunked.update(f_chunk)
+        _check(chunked, f)
+
+        merged = moments.Moments.from_f(f[:, :1000], order=order).merge(
+            moments.Moments.from_f(f[:, 1000:], order=order))
+        _check(merged, f)
+
+        joined = moments.Moments.concatenate([
+            moments.Moments.from_f(f[:2], order=order),
+            moments.Moments.from_f(f[2:], order=order)])
+        _check(joined, f)
+
+
+def test_omit_nan():
+    """Tests the moments of f with NaN values"""
+    f = np.array([
+        [1., np.nan, 3., 4.],
+        [np.nan, np.nan, np.nan, np.nan],
+        [2., 2., np.nan, 5.]])
+
+    _moments = moments.Moments.from_f(f, nan_policy='propagate')
+    assert np.all(np.isnan(_moments.mean))
+
+    _moments = moments.Moments.from_f(f[:, :2], nan_policy='omit').update(
+        f[:, 2:], nan_policy='omit')
+    assert np.array_equal(_moments.count, [3, 0, 3])
+    assert np.allclose(_moments.mean[[0, 2]], np.nanmean(f[[0, 2]], axis=1))
+    variance = _moments.variance()
+    assert np.isnan(variance[1])
+    assert np.allclose(
+        variance[[0, 2]], np.nanvar(f[[0, 2]], axis=1, ddof=1))
+
+
+def test_t3():
+    """Tests the T3 transformations with moments in place of f"""
+    rng = np.random.default_rng(16)
+    f = rng.normal(size=(4, 100))
+    _moments = moments.Moments.from_f(f[:, :50]).update(f[:, 50:])
+
+    assert np.allclose(t3.f_mean(_moments), t3.f_mean(f))
+    assert np.allclose(t3.f_variance(_moments), np.var(f, axis=1, ddof=1))
+    assert np.allclose(
+        t3.f_mean_variance(_moments),
+        (np.mean(f, axis=1) + 1) / (np.std(f, axis=1, ddof=1) + 1))
+    assert np.allclose(t3.f_mean_variance(_moments), t3.f_mean_variance(f))
@@ -0,0 +1,135 @@
+"""Tests robustness from the arrays of a strict array API library"""
+
+import warnings
+import numpy as np
+import pytest
+from .. import namespace, t1, t2, t3
+from ... import common_metrics, custom_R_metric
+
+METRICS = [
+    (common_metrics.maximin, {}),
+    (common_metrics.maximax, {}),
+    (common_metrics.hurwicz, {'alpha': 0.3}),
+    (common_metrics.laplace, {}),
+    (common_metrics.minimax_regret, {}),
+    (common_metrics.percentile_regret, {'percentile': 0.3}),
+    (common_metrics.mean_variance, {}),
+    (common_metrics.undesirable_deviations, {}),
+    (common_metrics.percentile_skew, {}),
+    (common_metrics.percentile_kurtosis, {}),
+    (common_metrics.starrs_domain, {'threshold': 9.}),
+]
+
+
+def strict_namespace():
+    """Gets a strict implementation of the array API standard"""
+    try:
+        import array_api_strict
+        return array_api_strict
+    except ImportError:
+        with warnings.catch_warnings():
+            # numpy.array_api warns that it is experimental
+            warnings.simplefilter('ignore')
+            return pytest.importorskip('numpy.array_api')
+
+
+def _to_numpy(x):
+    """Converts an array of any library to a NumPy array"""
+    return np.from_dlpack(x)
+
+
+def test_array_namespace():
+    """Tests finding the namespace of arrays"""
+    xp = strict_namespace()
+    assert namespace.array_namespace(np.ones(3)) is np
+    assert namespace.array_namespace(1., [1., 2.]) is np
+    assert namespace.array_namespace(1., xp.ones(3)) is xp
+
+
+def test_metrics():
+    """Tests the common metrics give the same robustness natively"""
+    xp = strict_namespace()
+    rng = np.random.default_rng(5)
+    f = rng.normal(10., 2., size=(2, 4, 50))
+    f_xp = xp.asarray(f)
+    for metric, kwargs in METRICS:
+        for maximise in [True, False]:
+            R = metric(f_xp, maximise=maximise, **kwargs)
+            assert namespace.array_namespace(R) is xp
+            assert R.shape == (2, 4)
+            expected = metric(f, maximise=maximise, **kwargs)
+            assert np.allclose(_to_numpy(R), expected), metric.__name__
+        # With the scenarios as the first axis
+        R = metric(
+            xp.permute_dims(f_xp, (2, 0, 1)), axis=0, **kwargs)
+        assert np.allclose(_to_numpy(R), metric(f, **kwargs))
+
+
+def test_nan_policy():
+    """Tests propagating and omitting NaN values natively"""
+    xp = strict_namespace()
+    rng = np.random.default_rng(6)
+    f = rng.normal(10., 2., size=(5, 41))
+    f[1, 3] = np.nan
+    f[2, :] = np.nan
+    f_xp = xp.asarray(f)
+    for metric, kwargs in METRICS:
+        for nan_policy in ['propagate', 'omit']:
+            with warnings.catch_warnings():
+                # All-NaN rows
+                warnings.simplefilter('ignore', RuntimeWarning)
+                expected = metric(f, nan_policy=nan_policy, **kwargs)
+                R = metric(f_xp, nan_policy=nan_policy, **kwargs)
+            assert np.allclose(
+                _to_numpy(R), expected, equal_nan=True), metric.__name__
+
+
+def test_transforms():
+    """Tests the transformations with other arguments natively"""
+    xp = strict_namespace()
+    rng = np.random.default_rng(7)
+    f = rng.normal(10., 2., size=(3, 20))
+    f[0, 5] = np.nan
+    f_xp = xp.asarray(f)
+    for nan_policy in ['propagate', 'omit']:
+        for transform, kwargs in [
+                (t1.regret_from_median, {}),
+                (t1.regret_from_values, {'values': f[:, :1]}),
+                (t1.satisficing_regret, {'threshold': f[1]}),
+                (t1.satisfice, {'threshold': 10., 'accept_equal': False}),
+                (t1.regret_from_best_da, {'best_f': np.amax(f, axis=0)})]:
+            expected = transform(f, nan_policy=nan_policy, **kwargs)
+            _f = transform(f_xp, nan_policy=nan_policy, **kwargs)
+            assert np.allclose(_to_numpy(_f), expected, equal_nan=True)
+        for transform in [t2.worst_half, t2.worst_and_best_cases]:
+            expected = transform(f, nan_policy=nan_policy)
+            _f = transform(f_xp, nan_policy=nan_policy)
+            assert np.allclose(_to_numpy(_f), expected, equal_nan=True)
+        for percentiles in [0.5, [0.1, 0.9]]:
+            expected = t2.select_percentiles(
+                f, percentiles, nan_policy=nan_policy)
+            _f = t2.select_percentiles(f_xp, percentiles, nan_policy=nan_policy)
+            assert np.allclose(_to_numpy(_f), expected, equal_nan=True)
+        for transform, kwargs in [
+                (t3.f_sum, {}),
+                (t3.f_range, {}),
+                (t3.f_variance, {}),
+                (t3.f_w_sum, {'weights': np.linspace(0., 0.1, 20)})]:
+            expected = transform(f, nan_policy=nan_policy, **kwargs)
+            R = transform(f_xp, nan_policy=nan_policy, **kwargs)
+            assert np.allclose(_to_numpy(R), expected, equal_nan=True)
+
+
+def test_custom_metric():
+    """Tests a custom metric natively, and that a workspace is not used"""
+    xp = strict_namespace()
+    f = np.asarray([
+        [0.99, 1.0, 0.5, 0.7],
+        [0.69, 0.6, 0.6, 0.8]])
+    R_metric = custom_R_metric(t1.identity, t2.worst_half, t3.f_mean)
+    R = R_metric(xp.asarray(f), maximise=False)
+    assert namespace.array_namespace(R) is xp
+    assert np.allclose(_to_numpy(R), R_metric(f, maximise=False))
+    # float32 values are kept float32
+    R = common_metrics.laplace(xp.asarray(f, dtype=xp.float32))
+    assert R.dtype == xp.float32
@@ -0,0 +1,82 @@
+"""Tests the order statistics of performance values"""
+
+import numpy as np
+from .. import order_stats, t1, t2
+
+
+def _f_with_nan():
+    """Returns performance values with ties and NaN values"""
+    rng = np.random.default_rng(6)
+    f = np.round(rng.normal(size=(5, 8)), 1)
+    f[1, [2, 5]] = np.nan
+    f[3] = np.nan
+    return f
+
+
+def test_sorted_f():
+    """Tests the order statistics against numpy"""
+    f = _f_with_nan()
+    sorted_f = order_stats.SortedF(f)
+    assert np.array_equal(sorted_f.values, np.sort(f), equal_nan=True)
+    assert np.array_equal(
+        np.take_along_axis(f, sorted_f.order, axis=1),
+        sorted_f.values,
+        equal_nan=True)
+    assert sorted_f.n_valid.tolist() == [8, 6, 8, 0, 8]
+    assert np.asarray(sorted_f) is f
+    percentiles = np.asarray([0., 0.1, 0.5, 0.9, 1.])
+    for s_f, _f in [
+            (sorted_f, f),
+            (sorted_f.negative(), -f),
+            (sorted_f.subtract(np.ones((5, 1))), f - 1.)]:
+        assert np.array_equal(s_f.values, np.sort(_f), equal_nan=True)
+        assert np.array_equal(
+            s_f.minimum(), np.amin(_f, axis=1), equal_nan=True)
+        assert np.array_equal(
+            s_f.maximum(), np.amax(_f, axis=1), equal_nan=True)
+        assert np.array_equal(
+            s_f.median(), np.median(_f, axis=1), equal_nan=True)
+        with np.testing.suppress_warnings() as sup:
+            sup.filter(RuntimeWarning)
+            assert np.array_equal(
+                s_f.minimum(nan_policy='omit'),
+                np.fmin.reduce(_f, axis=1),
+                equal_nan=True)
+            assert np.array_equal(
+                s_f.maximum(nan_policy='omit'),
+                np.fmax.reduce(_f, axis=1),
+                equal_nan=True)
+            assert np.array_equal(
+                s_f.median(nan_policy='omit'),
+                np.nanmedian(_f, axis=1),
+                equal_nan=True)
+        for nan_policy in ['propagate', 'omit']:
+            assert np.array_equal(
+                s_f.quantiles(percentiles, nan_policy=nan_policy),
+                t2.select_percentiles(_f, percentiles, nan_policy=nan_policy),
+                equal_nan=True)
+
+
+def test_transforms():
+    """Tests that the transformations accept a SortedF"""
+    f = _f_with_nan()
+    sorted_f = order_stats.SortedF(f)
+    values = sorted_f.values.copy()
+    for nan_policy in ['propagate', 'omit']:
+        for maximise in [True, False]:
+            _f = t1.regret_from_median(
+                sorted_f, maximise=maximise, nan_policy=nan_policy)
+            expected = t1.regret_from_median(
+                f, maximise=maximise, nan_policy=nan_policy)
+            assert isinstance(_f, order_stats.SortedF)
+            assert np.array_equal(np.asarray(_f), expected, equal_nan=True)
+            for t2_func in [
+                    t2.worst_case,
+                    t2.best_case,
+                    t2.worst_and_best_cases,
+                    t2.worst_half]:
+                assert np.array_equal(
+                    t2_func(_f, nan_policy=nan_policy),
+                    t2_func(expected, nan_policy=nan_policy),
+                    equal_nan=True)
+    assert np.array_equal(sorted_f.values, values, equal_nan=True)
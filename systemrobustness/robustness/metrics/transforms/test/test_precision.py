@@ -0,0 +1,60 @@
+"""Tests the floating point (dtype) policy"""
+
+import numpy as np
+from .. import precision, t1, t3
+from ... import common_metrics
+
+METRICS = [
+    common_metrics.maximin,
+    common_metrics.hurwicz,
+    common_metrics.laplace,
+    common_metrics.minimax_regret,
+    common_metrics.percentile_regret,
+    common_metrics.mean_variance,
+    common_metrics.undesirable_deviations,
+    common_metrics.percentile_skew,
+    common_metrics.starrs_domain]
+
+
+def test_dtype_policy():
+    """Tests robustness in float32, without up-casting"""
+    rng = np.random.default_rng(17)
+    f = rng.normal(10., 2., size=(4, 1000))
+    f32 = f.astype(np.float32)
+    assert precision.get_dtype_policy() is None
+    for metric in METRICS:
+        R = metric(f, maximise=False)
+        assert R.dtype == np.float64
+        # float32 values are never up-cast
+        R32 = metric(f32, maximise=False)
+        assert R32.dtype == np.float32
+        assert np.allclose(R32, R, rtol=1e-5, atol=1e-5)
+        with precision.dtype_policy(np.float32):
+            assert metric(f, maximise=False).dtype == np.float32
+        with precision.dtype_policy(np.float64):
+            assert metric(f32, maximise=False).dtype == np.float64
+    assert precision.get_dtype_policy() is None
+
+
+def test_transforms():
+    """Tests the working type of the transformations"""
+    f32 = np.asarray([[1., 2., 3.], [4., 5., 7.]], dtype=np.float32)
+    thresholds = np.asarray([1.5, 2.5, 3.5])
+    assert t1.satisfice(f32, threshold=2.).dtype == np.float32
+    assert t1.satisficing_regret(f32, thresholds).dtype == np.float32
+    assert t1.regret_from_best_da(
+        f32, best_f=np.amax(f32, axis=0).astype(np.float64)).dtype == (
+            np.float32)
+    assert t1.satisfice(np.asarray([[1, 2]]), threshold=2).dtype == (
+        np.float64)
+    assert t3.f_w_sum(f32, np.asarray([0.5, 0.25, 0.25])).dtype == (
+        np.float32)
+
+    # Reductions are accumulated in float64
+    f32 = np.full((1, 2 ** 20), 0.1, dtype=np.float32)
+    expected = np.float64(np.float32(0.1))
+    assert np.isclose(t3.f_sum(f32)[0], expected, rtol=1e-7, atol=0.)
+    assert np.isclose(
+        t3.f_w_sum(f32, np.full(2 ** 20, 2. ** -20))[0], expected,
+        rtol=1e-7, atol=0.)
+    assert np.isclose(t3.f_variance(f32)[0], 0., atol=1e-12)
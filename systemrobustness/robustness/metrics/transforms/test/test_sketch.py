@@ -0,0 +1,79 @@
+"""Tests the quantile sketch"""
+
+import numpy as np
+from .. import sketch, t1, t2
+
+
+def _check_ranks(_f, f, percentiles, rank_error):
+    """Checks that the percentiles are within the rank error"""
+    sorted_f = np.sort(f)
+    n = f.shape[1]
+    idxs = np.around((n - 1) * np.asarray(percentiles))
+    for row in range(f.shape[0]):
+        lo = np.searchsorted(sorted_f[row], _f[row], side='left')
+        hi = np.searchsorted(sorted_f[row], _f[row], side='right') - 1
+        assert np.all(lo - rank_error * n <= idxs)
+        assert np.all(idxs <= hi + rank_error * n)
+
+
+def test_quantile_sketch():
+    """Tests the percentiles of a sketch"""
+    rng = np.random.default_rng(9)
+    f = rng.normal(size=(3, 5000))
+    percentiles = [0., 0.1, 0.25, 0.5, 0.75, 0.9, 1.]
+
+    # No compaction gives the exact percentiles
+    exact = sketch.QuantileSketch(3, k=10000)
+    for f_chunk in np.array_split(f, 7, axis=1):
+        exact.update(f_chunk)
+    assert exact.rank_error == 0.
+    assert np.array_equal(
+        t2.select_percentiles(exact, percentiles),
+        t2.select_percentiles(f, percentiles))
+
+    for chunks in [1, 50]:
+        approx = sketch.QuantileSketch(3, k=64)
+        for f_chunk in np.array_split(f, chunks, axis=1):
+            approx.update(f_chunk)
+        assert approx.n == 5000
+        assert 0. < approx.rank_error < 0.2
+        assert approx.size < 64 * 8
+        _check_ranks(
+            approx.quantiles(percentiles), f, percentiles, approx.rank_error)
+        negative = t1.identity(approx, maximise=False)
+        _check_ranks(
+            t2.select_percentiles(negative, percentiles),
+            -f,
+            percentiles,
+            negative.rank_error)
+
+
+def test_merge():
+    """Tests merging sketches of different scenarios"""
+    rng = np.random.default_rng(10)
+    f = rng.exponential(size=(2, 3000))
+    f[1, 5] = np.nan
+    percentiles = [0.1, 0.5, 0.9]
+    sketches = []
+    for f_chunk in np.array_split(f, 3, axis=1):
+        sketches.append(sketch.QuantileSketch(2, k=128))
+        sketches[-1].update(f_chunk)
+    merged = sketches[0].merge(sketches[1]).merge(sketches[2])
+    assert merged.n == 3000
+    _f = merged.quantiles(percentiles)
+    assert np.all(np.isnan(_f[1]))
+    _check_ranks(_f[:1], f[:1], percentiles, merged.rank_error)
+
+
+def test_for_error():
+    """Tests choosing k for a rank error"""
+    rng = np.random.default_rng(11)
+    f = rng.normal(size=(2, 20000))
+    for epsilon in [0.05, 0.01]:
+        _sketch = sketch.QuantileSketch.for_error(
+            2, epsilon, 20000, chunk_size=1000)
+        for f_chunk in np.array_split(f, 20, axis=1):
+            _sketch.update(f_chunk)
+        assert 0. < _sketch.rank_error <= epsilon
+        _check_ranks(
+            _sketch.quantiles([0.1, 0.9]), f, [0.1, 0.9], _sketch.rank_error)
@@ -1,5 +1,7 @@
 """Tests the T1 transformations"""
 
+import warnings
+
 import numpy as np
 from .. import t1
 
@@ -32,6 +34,10 @@ def test_regret_from_best_da():
         [-0.3, -0.4, 0.0],
         [0.0, 0.0, -0.1]])
     assert np.allclose(regret, expected)
+    # Test for a subset of decision alternatives
+    regret = t1.regret_from_best_da(
+        f[1:], maximise=False, best_f=np.amin(f, axis=0))
+    assert np.allclose(regret, expected[1:])
 
 
 def test_regret_from_values():
@@ -102,6 +108,14 @@ def test_satisficing_regret():
         [0.0, -0.1, 0.0],
         [-0.5, 0.0, 0.0]])
     assert np.allclose(regret, expected)
+    # Test for a threshold for each decision alternative
+    thresholds = np.asarray(
+        [[0.9], [1.0]])
+    regret = t1.satisficing_regret(f, thresholds, maximise=True)
+    expected = np.asarray([
+        [0.0, 0.0, -0.4],
+        [0.0, -0.4, -0.4]])
+    assert np.allclose(regret, expected)
 
 
 def test_regret_from_median():
@@ -163,3 +177,59 @@ def test_satisfice():
         [1.0, 0.0, 0.0],
         [1.0, 0.0, 0.0]])
     assert np.allclose(_f, expected)
+
+
+def test_satisfice_omit_nan():
+    """Tests the satisfice fn with NaN values"""
+    f = np.asarray([
+        [0.5, np.nan, 1.0],
+        [0.6, 0.65, 0.69]])
+    _f = t1.satisfice(f, threshold=0.65)
+    expected = np.asarray([
+        [0.0, 0.0, 1.0],
+        [0.0, 1.0, 1.0]])
+    assert np.allclose(_f, expected)
+    _f = t1.satisfice(f, threshold=0.65, nan_policy='omit')
+    expected[0, 1] = np.nan
+    assert np.allclose(_f, expected, equal_nan=True)
+
+
+def test_regret_from_median_all_nan():
+    """Tests regret_from_median omitting NaN values with no valid values"""
+    f = np.asarray([
+        [np.nan, np.nan, np.nan],
+        [0.6, np.nan, 0.7]])
+    expected = np.asarray([
+        [np.nan, np.nan, np.nan],
+        [-0.05, np.nan, 0.05]])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        _f = t1.regret_from_median(f, nan_policy='omit')
+        assert np.allclose(_f, expected, equal_nan=True)
+        _f = t1.regret_from_median(f, nan_policy='omit', out=np.empty_like(f))
+        assert np.allclose(_f, expected, equal_nan=True)
+
+
+def test_out():
+    """Tests writing the transformations to out"""
+    rng = np.random.default_rng(5)
+    f = rng.normal(size=(4, 6))
+    f[0, 1] = np.nan
+    threshold = rng.normal(size=(6, ))
+    for maximise in [True, False]:
+        for func, kwargs in [
+                (t1.identity, {}),
+                (t1.regret_from_best_da, {}),
+                (t1.regret_from_best_da, {'nan_policy': 'omit'}),
+                (t1.regret_from_values, {'values': 0.2}),
+                (t1.regret_from_values, {'values': threshold}),
+                (t1.satisficing_regret, {'threshold': threshold}),
+                (t1.regret_from_median, {}),
+                (t1.regret_from_median, {'nan_policy': 'omit'}),
+                (t1.satisfice, {'threshold': 0.1}),
+                (t1.satisfice, {'threshold': 0.1, 'nan_policy': 'omit'})]:
+            expected = func(f, maximise=maximise, **kwargs)
+            out = np.empty_like(f)
+            _f = func(f, maximise=maximise, out=out, **kwargs)
+            assert _f is out
+            assert np.array_equal(_f, expected, equal_nan=True)
@@ -74,3 +74,166 @@ def percentiles():
         [0.5, 1.0],
         [0.6, 0.69]])
     assert np.allclose(_f, expected)
+
+
+def test_omit_nan():
+    """Tests the selection of scenarios with NaN values"""
+    f = np.asarray([
+        [0.99, np.nan, 0.5, 0.2],
+        [0.69, 0.6, 0.6, 0.2],
+        [np.nan, np.nan, np.nan, np.nan]])
+    _f = t2.worst_and_best_cases(f, nan_policy='omit')
+    expected = np.asarray([
+        [0.2, 0.99],
+        [0.2, 0.69],
+        [np.nan, np.nan]])
+    assert np.allclose(_f, expected, equal_nan=True)
+    _f = t2.worst_half(f, nan_policy='omit')
+    expected = np.asarray([
+        [0.2, 0.5],
+        [0.2, 0.6],
+        [np.nan, np.nan]])
+    assert np.allclose(_f, expected, equal_nan=True)
+    percentiles = np.asarray([0.1, 0.25, 0.5, 0.75, 0.9])
+    _f = t2.select_percentiles(f, percentiles, nan_policy='omit')
+    for row in range(2):
+        valid = f[row, ~np.isnan(f[row])]
+        expected = np.quantile(valid, percentiles, method='nearest')
+        assert np.allclose(_f[row], expected)
+    assert np.all(np.isnan(_f[2]))
+
+
+def test_partition():
+    """Tests that partitioning gives the same result as sorting"""
+    rng = np.random.default_rng(8)
+    for n in [1, 2, 7, 64, 101]:
+        f = np.round(rng.normal(size=(4, n)), 1)
+        f[1, n // 2] = np.nan
+        for percentiles in [
+                [0.5], [0.1, 0.9], [0., 0.1, 0.5, 1.], [0.1, 0.25, 0.75, 0.9]]:
+            expected = t2.select_percentiles(
+                f, percentiles, algorithm='sort')
+            for overwrite_input in [False, True]:
+                _f = t2.select_percentiles(
+                    np.copy(f),
+                    percentiles,
+                    overwrite_input=overwrite_input,
+                    algorithm='partition')
+                assert np.array_equal(_f, expected, equal_nan=True)
+        expected = t2.worst_half(f, algorithm='sort')
+        _f = t2.worst_half(f, algorithm='partition')
+        assert np.array_equal(_f, expected, equal_nan=True)
+        _f = t2.worst_half(f, ordered=False, algorithm='partition')
+        assert np.array_equal(np.sort(_f), expected, equal_nan=True)
+    assert not t2.use_partition(f, 1, algorithm='sort')
+    assert t2.use_partition(f, 9, algorithm='partition')
+    assert not t2.use_partition(f, t2.MAX_PARTITION_KTH + 1)
+
+
+def test_batch():
+    """Tests selecting from stacked performance values"""
+    rng = np.random.default_rng(18)
+    f = rng.normal(size=(2, 3, 64))
+    f[0, 1, 5] = np.nan
+    for nan_policy in ['propagate', 'omit']:
+        for algorithm in ['sort', 'partition']:
+            _f = t2.select_percentiles(
+                f, [0.1, 0.5], nan_policy=nan_policy, algorithm=algorithm)
+            expected = np.stack([
+                t2.select_percentiles(f_k, [0.1, 0.5], nan_policy=nan_policy)
+                for f_k in f])
+            assert np.array_equal(_f, expected, equal_nan=True)
+            _f = t2.worst_half(f, nan_policy=nan_policy, algorithm=algorithm)
+            expected = np.stack([
+                t2.worst_half(f_k, nan_policy=nan_policy) for f_k in f])
+            assert np.array_equal(_f, expected, equal_nan=True)
+        _f = t2.worst_and_best_cases(f, nan_policy=nan_policy)
+        assert _f.shape == (2, 3, 2)
+
+
+def test_weights():
+    """Tests weighted percentiles against repeating scenarios"""
+    rng = np.random.default_rng(24)
+    f = np.round(rng.normal(size=(3, 40)), 1)
+    f[1, 4] = np.nan
+    counts = rng.integers(0, 4, size=40)
+    counts[4] = 1
+    repeated_f = np.repeat(f, counts, axis=1)
+    percentiles = np.linspace(0., 1., 21)
+    for nan_policy in ['propagate', 'omit']:
+        R = t2.select_percentiles(
+            f, percentiles, nan_policy=nan_policy, weights=counts,
+            weights_kind='frequency')
+        expected = t2.select_percentiles(
+            repeated_f, percentiles, nan_policy=nan_policy)
+        assert np.allclose(R, expected, equal_nan=True)
+        # Equal probabilities are unweighted
+        expected = t2.select_percentiles(f, percentiles, nan_policy=nan_policy)
+        for weight in [0.3, 1., 2.]:
+            R = t2.select_percentiles(
+                f, percentiles, nan_policy=nan_policy,
+                weights=np.full(40, weight))
+            assert np.allclose(R, expected, equal_nan=True)
+        # Scaled probabilities are the same
+        expected = t2.select_percentiles(
+            f, percentiles, nan_policy=nan_policy, weights=counts)
+        for scale in [0.1, 2., 1. / counts.sum()]:
+            R = t2.select_percentiles(
+                f, percentiles, nan_policy=nan_policy, weights=counts * scale)
+            assert np.array_equal(R, expected, equal_nan=True)
+
+
+def test_compress_scenarios():
+    """Tests collapsing identical scenarios"""
+    f = np.asarray([
+        [1., 2., 1., 3., np.nan, 2.],
+        [4., 5., 4., 6., np.nan, 5.]])
+    compressed_f, weights = t2.compress_scenarios(f)
+    assert np.array_equal(compressed_f, f[:, [0, 1, 3, 4]], equal_nan=True)
+    assert np.array_equal(weights, [2, 2, 1, 1])
+    _, probabilities = t2.compress_scenarios(
+        f, weights=np.asarray([0.1, 0.2, 0.3, 0.1, 0.1, 0.2]))
+    assert np.allclose(probabilities, [0.4, 0.4, 0.1, 0.1])
+    # The robustness is the same as from all of the scenarios
+    percentiles = np.asarray([0.1, 0.25, 0.5, 0.9])
+    for nan_policy in ['propagate', 'omit']:
+        assert np.allclose(
+            t2.select_percentiles(
+                compressed_f, percentiles, nan_policy=nan_policy,
+                weights=weights, weights_kind='frequency'),
+            t2.select_percentiles(f, percentiles, nan_policy=nan_policy),
+            equal_nan=True)
+
+
+def test_return_index():
+    """Tests the scenario of each selected value"""
+    rng = np.random.default_rng(27)
+    f = np.round(rng.normal(size=(2, 3, 40)), 1)
+    f[0, 1, 7] = np.nan
+    f[1, 2, :] = np.nan
+    for nan_policy in ['propagate', 'omit']:
+        for transform, kwargs in [
+                (t2.worst_case, {}),
+                (t2.best_case, {}),
+                (t2.worst_and_best_cases, {}),
+                (t2.worst_half, {'algorithm': 'sort'}),
+                (t2.worst_half, {'algorithm': 'partition'}),
+                (t2.select_percentiles, {'percentiles': [0.1, 0.9]}),
+                (t2.select_percentiles, {
+                    'percentiles': [0.25], 'algorithm': 'partition'}),
+                (t2.select_percentiles, {
+                    'percentiles': [0.5], 'weights': np.arange(40.)})]:
+            _f, idxs = transform(
+                f, nan_policy=nan_policy, return_index=True, **kwargs)
+            expected = transform(f, nan_policy=nan_policy, **kwargs)
+            assert np.allclose(_f, expected, equal_nan=True)
+            assert idxs.shape == _f.shape
+            # Each value is from its scenario, or NaN from a scenario
+            # with a NaN value (or no scenario)
+            scenario_f = np.take_along_axis(f, np.clip(idxs, 0, None), -1)
+            assert np.all(np.where(
+                np.isnan(_f), np.isnan(scenario_f) | (idxs == -1),
+                scenario_f == _f))
+        assert np.all(t2.worst_case(
+            f, nan_policy=nan_policy, return_index=True)[1][1, 2] == (
+                -1 if nan_policy == 'omit' else 0))
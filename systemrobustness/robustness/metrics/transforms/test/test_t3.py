@@ -96,3 +96,62 @@ def test_f_kurtosis():
     expected = np.asarray(
         [1.06382978723404, 5.0])
     assert np.allclose(R, expected)
+
+
+def test_omit_nan():
+    """Tests the aggregation of f with NaN values"""
+    f = np.asarray([
+        [0.99, 1.0, np.nan, 0.5],
+        [0.69, 0.6, 0.6, np.nan]])
+    complete_f = np.asarray([
+        [0.99, 1.0, 0.5],
+        [0.69, 0.6, 0.6]])
+    for t3_func in [t3.f_mean, t3.f_range, t3.f_sum, t3.f_variance, t3.f_mean_variance]:
+        R = t3_func(f, nan_policy='omit')
+        assert np.allclose(R, t3_func(complete_f))
+        assert np.all(np.isnan(t3_func(f)))
+    f = np.asarray([
+        [0.99, np.nan],
+        [0.69, 0.6]])
+    R = t3.f_w_sum(f, np.asarray([0.75, 0.25]), nan_policy='omit')
+    expected = np.asarray(
+        [0.99, 0.6675])
+    assert np.allclose(R, expected)
+
+
+def test_weights():
+    """Tests weighted means and variances"""
+    rng = np.random.default_rng(25)
+    f = rng.normal(size=(3, 30))
+    f[1, 4] = np.nan
+    counts = rng.integers(1, 4, size=30)
+    repeated_f = np.repeat(f, counts, axis=1)
+    R = t3.f_mean(f, weights=counts)
+    assert np.allclose(R, np.mean(repeated_f, axis=1), equal_nan=True)
+    R = t3.f_mean(f, nan_policy='omit', weights=counts / counts.sum())
+    assert np.allclose(R, np.nanmean(repeated_f, axis=1))
+    # As numpy.cov with frequency weights, and so unweighted for equal
+    # weights
+    R = t3.f_variance(
+        f, nan_policy='omit', weights=counts, weights_kind='frequency')
+    for i in [0, 2]:
+        assert np.isclose(R[i], np.cov(f[i], fweights=counts))
+        assert np.isclose(R[i], np.var(repeated_f[i], ddof=1))
+    for weight in [0.5, 1., 2.]:
+        assert np.allclose(
+            t3.f_variance(f, weights=np.full(30, weight)), t3.f_variance(f),
+            equal_nan=True)
+    assert np.allclose(
+        t3.f_mean_variance(f, weights=np.ones(30)), t3.f_mean_variance(f),
+        equal_nan=True)
+    assert np.allclose(
+        t3.f_mean_variance(f, weights=counts, weights_kind='frequency'),
+        t3.f_mean_variance(repeated_f), equal_nan=True)
+    # Scaled probabilities are the same
+    R = t3.f_variance(f, nan_policy='omit', weights=counts)
+    for scale in [0.1, 3., 1. / counts.sum()]:
+        assert np.allclose(
+            t3.f_variance(f, nan_policy='omit', weights=counts * scale), R)
+        assert np.allclose(
+            t3.f_mean_variance(f, weights=counts * scale),
+            t3.f_mean_variance(f, weights=counts), equal_nan=True)
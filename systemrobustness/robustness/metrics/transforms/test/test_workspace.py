@@ -0,0 +1,19 @@
+"""Tests the workspace of reusable buffers"""
+
+import numpy as np
+from .. import workspace
+
+
+def test_workspace():
+    """Tests that buffers are reused"""
+    _workspace = workspace.Workspace()
+    buffer = _workspace.f_buffer(np.zeros((3, 4)))
+    assert buffer.shape == (3, 4) and buffer.dtype == np.float64
+    smaller = _workspace.f_buffer(np.zeros((2, 5)))
+    assert smaller.shape == (2, 5)
+    assert np.shares_memory(buffer, smaller)
+    assert _workspace.f_buffer(np.zeros(5, dtype=np.float32)).shape == (1, 5)
+    assert _workspace.f_buffer(np.zeros(3, dtype=int)).dtype == np.float64
+    assert _workspace.nbytes == 12 * 8 + 5 * 4
+    _workspace.clear()
+    assert _workspace.nbytes == 0
@@ -0,0 +1,88 @@
+"""Contains a workspace of reusable buffers for the transformations.
+
+The T1 transformations return arrays the size of f. When calculating
+robustness many times (e.g. for many chunks of decision alternatives,
+or many robustness metrics), the transformed values can be written to
+the same buffer each time instead of allocating new arrays.
+"""
+
+import numpy as np
+
+from .precision import working_dtype
+
+
+class Workspace:
+    """Reusable buffers for robustness calculations.
+
+    Pass to `custom_R_metric` or the functions in `common_metrics`
+    (`workspace=...`), which write the transformed performance values
+    to a buffer of the workspace. Buffers grow to the largest size
+    requested and are then reused. A workspace must not be shared by
+    calculations running at the same time (e.g. use one per thread).
+
+    Examples
+    --------
+    >>> workspace = Workspace()
+    >>> for f in chunks:
+    ...     R = common_metrics.percentile_regret(f, workspace=workspace)
+    """
+    def __init__(self):
+        """Initialize an empty workspace
+        """
+        self._buffers = {}
+
+    def get(self, name, shape, dtype=np.float64):
+        """Gets a buffer, allocating it only if it is too small.
+
+        Parameters
+        ----------
+        name : str
+            The name of the buffer
+        shape : tuple of int
+            The shape of the buffer
+        dtype : numpy.dtype, optional
+            The data type of the buffer.
+            (The default is numpy.float64).
+
+        Returns
+        -------
+        numpy.ndarray
+            An uninitialised C-contiguous array of `shape`. Only valid
+            until the same buffer is requested again.
+        """
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        buffer = self._buffers.get((name, dtype))
+        if buffer is None or buffer.size < size:
+            buffer = np.empty(size, dtype=dtype)
+            self._buffers[(name, dtype)] = buffer
+        return buffer[:size].reshape(shape)
+
+    def f_buffer(self, f):
+        """Gets the buffer for transformed values of f.
+
+        Parameters
+        ----------
+        f : np.ndarray, shape=(..., m, n)
+            Performance values, f, for m decision alternatives
+            and n scenarios.
+
+        Returns
+        -------
+        np.ndarray, shape=(..., m, n)
+            A floating point buffer, of the working type of f (see
+            `precision.working_dtype`), for the output of the T1
+            transformations
+        """
+        f = np.asarray(f)
+        shape = f.shape if f.ndim >= 2 else (1, f.size)
+        return self.get('f', shape, working_dtype(f.dtype))
+
+    @property
+    def nbytes(self):
+        """int: The total size of the buffers"""
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def clear(self):
+        """Releases the buffers"""
+        self._buffers.clear()